@@ -0,0 +1,72 @@
+"""Benchmark reading a marked mesh with `XDMFFile.read` against the binary `MeshCache`.
+
+The mesh is a unit cube with cell and facet markers. "cold" reads the xdmf files and fills
+the cache, "hit" reads the cached entry.
+
+    python3 benchmarks/mesh_cache.py --N 64 --repeats 3
+"""
+
+import argparse
+import tempfile
+
+import dolfin as df
+
+from pathlib import Path
+from time import perf_counter
+
+from typing import (
+    Dict,
+)
+
+from postutils import save_mesh
+
+from postutils.mesh_cache import (
+    MeshCache,
+    read_xdmf_mesh,
+)
+
+
+def benchmark(N: int, repeats: int) -> Dict[str, float]:
+    """Return the best time of each way to read the mesh, and the number of cells."""
+    mesh = df.UnitCubeMesh(N, N, N)
+    cell_function = df.MeshFunction("size_t", mesh, 3, 0)
+    df.CompiledSubDomain("x[0] > 0.5").mark(cell_function, 1)
+    facet_function = df.MeshFunction("size_t", mesh, 2, 0)
+    df.CompiledSubDomain("near(x[2], 0) && on_boundary").mark(facet_function, 1)
+
+    results = {"cells": mesh.num_cells()}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        directory = Path(tmpdirname)
+        save_mesh(directory, "cube", mesh=mesh, cell_function=cell_function, facet_function=facet_function)
+        filenames = (directory / "cube.xdmf", directory / "cube_cf.xdmf", directory / "cube_ff.xdmf")
+
+        timings = {"xdmf": [], "cold": [], "hit": []}
+        for repeat in range(repeats):
+            tick = perf_counter()
+            read_xdmf_mesh(*filenames)
+            timings["xdmf"].append(perf_counter() - tick)
+
+            cache = MeshCache(directory / f"cache_{repeat}")
+            tick = perf_counter()
+            cache.load(*filenames)
+            timings["cold"].append(perf_counter() - tick)
+
+            tick = perf_counter()
+            cache.load(*filenames)
+            timings["hit"].append(perf_counter() - tick)
+
+        results.update({label: min(times) for label, times in timings.items()})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--N", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    df.set_log_level(100)
+    results = benchmark(args.N, args.repeats)
+    print(f"{results['cells']} cells")
+    for label in ("xdmf", "cold", "hit"):
+        print(f"{label:<8}{results[label]:>10.3f} s{results['xdmf']/results[label]:>8.1f}x")
@@ -0,0 +1,73 @@
+"""Benchmark the setup and per-step evaluation cost of `PointField` against the number of ranks.
+
+Run with an increasing number of processes, e.g.
+
+    for n in 1 2 4 8; do mpirun -n $n python3 benchmarks/point_field.py --num-probes 10000; done
+"""
+
+import argparse
+import tempfile
+
+import numpy as np
+import dolfin as df
+
+from pathlib import Path
+from time import perf_counter
+
+from typing import (
+    Dict,
+)
+
+from postfields import PointField
+from postspec import FieldSpec
+
+
+def benchmark(N: int, num_probes: int, num_steps: int) -> Dict[str, float]:
+    """Return the setup time and mean evaluation time of `num_probes` random probes."""
+    mesh = df.UnitCubeMesh(N, N, N)
+    function_space = df.FunctionSpace(mesh, "CG", 1)
+    function = df.interpolate(df.Expression("x[0] + x[1]*x[2]", degree=1), function_space)
+    points = np.random.RandomState(42).uniform(0.01, 0.99, size=(num_probes, 3))
+
+    comm = df.MPI.comm_world
+    tmpdirname = None
+    if df.MPI.rank(comm) == 0:
+        tmpdirname = tempfile.mkdtemp()
+    tmpdirname = comm.bcast(tmpdirname, root=0)
+
+    point_field = PointField("probes", FieldSpec(), points)
+    point_field.path = Path(tmpdirname)
+
+    df.MPI.barrier(comm)
+    tick = perf_counter()
+    point_field.before_first_compute(function)
+    setup_time = df.MPI.max(comm, perf_counter() - tick)
+
+    df.MPI.barrier(comm)
+    tick = perf_counter()
+    for _ in range(num_steps):
+        values = point_field.compute(function)
+    step_time = df.MPI.max(comm, perf_counter() - tick)/num_steps
+
+    max_error = 0.0
+    if df.MPI.rank(comm) == 0:
+        exact = points[:, 0] + points[:, 1]*points[:, 2]
+        max_error = float(np.max(np.abs(values[:, 0] - exact)))
+    return {"setup s": setup_time, "step ms": 1e3*step_time, "max error": max_error}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--N", type=int, default=32)
+    parser.add_argument("--num-probes", type=int, default=1000)
+    parser.add_argument("--num-steps", type=int, default=100)
+    args = parser.parse_args()
+
+    df.set_log_level(100)
+    result = benchmark(args.N, args.num_probes, args.num_steps)
+    if df.MPI.rank(df.MPI.comm_world) == 0:
+        print(
+            f"ranks: {df.MPI.size(df.MPI.comm_world)}, probes: {args.num_probes}, "
+            f"setup: {result['setup s']:.3f} s, step: {result['step ms']:.3f} ms, "
+            f"max error: {result['max error']:.2e}"
+        )
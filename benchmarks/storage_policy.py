@@ -0,0 +1,116 @@
+"""Benchmark the bytes written and the write/read throughput of each storage policy.
+
+The data is a travelling wave on a bidomain-like function space (v, u_e) on a unit cube.
+
+    python3 benchmarks/storage_policy.py --N 32 --num-steps 50
+"""
+
+import argparse
+import tempfile
+
+import numpy as np
+import dolfin as df
+
+from pathlib import Path
+from time import perf_counter
+
+from typing import (
+    Dict,
+    Iterator,
+    Tuple,
+)
+
+from postfields.hdf5_series import (
+    HDF5SeriesWriter,
+    HDF5SeriesReader,
+)
+
+from postfields.storage_policy import StoragePolicy
+
+
+POLICIES = {
+    "float64": StoragePolicy(),
+    "float64 gzip": StoragePolicy(compression="gzip", compression_level=4),
+    "float32": StoragePolicy(storage_dtype="float32"),
+    "float32 lzf": StoragePolicy(storage_dtype="float32", compression="lzf"),
+    "float16 gzip": StoragePolicy(storage_dtype="float16", compression="gzip", compression_level=4),
+    "quantised 1e-3 gzip": StoragePolicy(quantisation_error=1e-3, compression="gzip", compression_level=4),
+}
+
+
+def bidomain_frames(N: int, num_steps: int) -> Iterator[Tuple[np.ndarray, Tuple[int, int], int]]:
+    """Yield the local dofs, ownership range and global size of a travelling wave.
+
+    The function space is a mixed (v, u_e) CG1 space.
+    """
+    mesh = df.UnitCubeMesh(N, N, N)
+    element = df.FiniteElement("CG", mesh.ufl_cell(), 1)
+    function_space = df.FunctionSpace(mesh, df.MixedElement((element, element)))
+    first_dof, last_dof = function_space.dofmap().ownership_range()
+    x = function_space.tabulate_dof_coordinates()[:last_dof - first_dof, 0]
+
+    is_v = np.zeros(x.size, dtype=bool)
+    is_v[function_space.sub(0).dofmap().dofs() - first_dof] = True
+
+    for step in range(num_steps):
+        front = (step + 1)/num_steps
+        v = -80 + 60*(1 - np.tanh((x - front)/0.05))
+        values = np.where(is_v, v, 0.05*v)
+        yield values, function_space.dofmap().ownership_range(), function_space.dim()
+
+
+def benchmark(N: int, num_steps: int) -> Dict[str, Dict[str, float]]:
+    """Return bytes written, write and read throughput and max error for each policy."""
+    frames = list(bidomain_frames(N, num_steps))
+    raw_bytes = sum(values.nbytes for values, _, _ in frames)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        for label, policy in POLICIES.items():
+            filename = Path(tmpdirname) / f"{label.replace(' ', '_')}.hdf5"
+
+            tick = perf_counter()
+            writer = HDF5SeriesWriter(
+                filename,
+                "v",
+                frames[0][2],
+                frames[0][1],
+                comm=df.MPI.comm_world,
+                policy=policy
+            )
+            for timestep, (values, _, _) in enumerate(frames):
+                writer.write(timestep, float(timestep), values)
+            writer.close()
+            write_time = perf_counter() - tick
+
+            tick = perf_counter()
+            max_error = 0.0
+            with HDF5SeriesReader(filename, "v") as reader:
+                for index, (values, local_range, _) in enumerate(frames):
+                    max_error = max(max_error, np.max(np.abs(reader.read(index, local_range) - values)))
+            read_time = perf_counter() - tick
+
+            results[label] = {
+                "MB": filename.stat().st_size/2**20,
+                "write MB/s": raw_bytes/2**20/write_time,
+                "read MB/s": raw_bytes/2**20/read_time,
+                "max error": max_error,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--N", type=int, default=32)
+    parser.add_argument("--num-steps", type=int, default=50)
+    args = parser.parse_args()
+
+    df.set_log_level(100)
+    results = benchmark(args.N, args.num_steps)
+    if df.MPI.rank(df.MPI.comm_world) == 0:
+        print(f"{'policy':<22}{'MB':>10}{'write MB/s':>14}{'read MB/s':>14}{'max error':>12}")
+        for label, result in results.items():
+            print(
+                f"{label:<22}{result['MB']:>10.2f}{result['write MB/s']:>14.1f}"
+                f"{result['read MB/s']:>14.1f}{result['max error']:>12.2e}"
+            )
@@ -7,5 +7,6 @@ from .loader import Loader
 from .load_plain_text import (
     read_point_metadata,
     read_point_values,
+    read_sampled_values,
     load_times,
 )
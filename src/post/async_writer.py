@@ -0,0 +1,151 @@
+"""Write fields in a background thread so that I/O overlaps with the solver."""
+
+import queue
+import logging
+import threading
+
+import numpy as np
+import dolfin as df
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from postfields.field_base import FieldBaseClass
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StagingPool:
+    """A pool of reusable numpy buffers with a cap on the total allocated memory."""
+
+    def __init__(self, max_bytes: int) -> None:
+        """Store the memory cap.
+
+        Arguments:
+            max_bytes: Upper bound on the memory held by the buffers. A single buffer larger
+                than the cap is still allowed, so that the pipeline cannot deadlock.
+        """
+        self._max_bytes = max_bytes
+        self._allocated_bytes = 0
+        self._free: Dict[int, List[np.ndarray]] = {}
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int, stop: threading.Event = None) -> Optional[np.ndarray]:
+        """Return a float64 buffer of length `size`. Blocks until memory is available.
+
+        Arguments:
+            size: The number of elements.
+            stop: Give up waiting and return None once this event is set.
+        """
+        nbytes = 8*size
+        with self._condition:
+            while True:
+                free_buffers = self._free.get(size)
+                if free_buffers:
+                    return free_buffers.pop()
+                if self._allocated_bytes == 0 or self._allocated_bytes + nbytes <= self._max_bytes:
+                    self._allocated_bytes += nbytes
+                    return np.empty(size, dtype="f8")
+                if self._evict_free_buffer():
+                    continue
+                if stop is None:
+                    self._condition.wait()
+                elif stop.is_set():
+                    return None
+                else:
+                    self._condition.wait(timeout=0.1)
+
+    def release(self, buffer: np.ndarray) -> None:
+        """Return `buffer` to the pool."""
+        with self._condition:
+            self._free.setdefault(buffer.size, []).append(buffer)
+            self._condition.notify_all()
+
+    def _evict_free_buffer(self) -> bool:
+        """Drop an idle buffer of another size to make room. Return False if there are none."""
+        for buffers in self._free.values():
+            if buffers:
+                self._allocated_bytes -= buffers.pop().nbytes
+                return True
+        return False
+
+
+class AsyncWriter:
+    """Copy the local dofs into staging buffers and let a writer thread store them.
+
+    The writer thread calls `FieldBaseClass.store` with a scratch function holding the
+    staged values. It is serial only: in parallel the backends are collective, and MPI
+    forbids collectives on one communicator from two threads at once.
+    """
+
+    def __init__(self, queue_depth: int = 4, staging_bytes: int = 2**30) -> None:
+        """Start the writer thread.
+
+        Arguments:
+            queue_depth: The maximum number of staged writes waiting for the writer thread.
+            staging_bytes: The maximum memory used for the staging buffers.
+        """
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self._pool = StagingPool(staging_bytes)
+        self._scratch: Dict[str, df.Function] = {}
+        self._error: Exception = None
+        self._thread = threading.Thread(target=self._run, name="xalpost-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, field: FieldBaseClass, timestep: int, time: float, data: df.Function) -> None:
+        """Stage a copy of the local dofs of `data` and return without waiting for the write."""
+        self._raise_error()
+        if field.name not in self._scratch:
+            self._scratch[field.name] = data.copy(deepcopy=True)
+
+        vector = data.vector()
+        buffer = self._pool.acquire(vector.local_size())
+        try:
+            local_values = df.as_backend_type(vector).vec().array_r      # No copy
+        except AttributeError:
+            local_values = vector.get_local()
+        np.copyto(buffer, local_values)
+        self._queue.put((field, int(timestep), float(time), buffer))
+
+    def flush(self) -> None:
+        """Block until all staged writes are stored."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Flush and stop the writer thread."""
+        self._queue.join()
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _run(self) -> None:
+        """Drain the queue. Exceptions are kept and raised in the main thread."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            field, timestep, time, buffer = item
+            try:
+                if self._error is None:
+                    scratch = self._scratch[field.name]
+                    scratch.vector().set_local(buffer)
+                    scratch.vector().apply("insert")
+                    field.store(timestep, time, scratch)
+            except Exception as e:
+                LOGGER.error(f"Could not store {field.name} at timestep {timestep}: {e}")
+                self._error = e
+            finally:
+                self._pool.release(buffer)
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -11,6 +11,13 @@ from typing import (
 
 from collections import namedtuple
 
+from postfields.probe_file import read_probe_file
+
+from .time_index import (
+    TimeIndex,
+    TIME_INDEX_FILENAME,
+)
+
 
 TimestepTuple = namedtuple("TimestepTuple", ["timestep", "time"])
 
@@ -27,8 +34,14 @@ def read_point_metadata(*, path: Path, name: str) -> Any:
 def read_point_values(*, path: Path) -> np.ndarray:
     """Read the data from a single probe.
 
+    Binary probe files (`.bin`) are memory mapped, text files are parsed. Each row holds the
+    time followed by the values of the probes.
+
     TODO: Integrate this into the loader.
     """
+    path = Path(path)
+    if path.suffix == ".bin":
+        return read_probe_file(path)
     with path.open("r") as if_handle:
         data = np.array([
             np.fromiter(line.strip().split(","), dtype="f8") for line in if_handle.readlines()
@@ -36,9 +49,32 @@ def read_point_values(*, path: Path) -> np.ndarray:
     return data
 
 
+def read_sampled_values(*, path: Path, name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Read the times and the values of a `SliceField` or `LineField`.
+
+    The values are reshaped to (timesteps,) + sample shape + (components,).
+
+    Arguments:
+        path: The casedir.
+        name: The name of the field.
+    """
+    _path = Path(path) / name
+    with open(_path / f"metadata_{name}.yaml", "r") as if_handle:
+        metadata = yaml.load(if_handle, Loader=yaml.Loader)
+    data = read_point_values(path=_path / f"probes_{name}.bin")
+    values = data[:, 1:].reshape(data.shape[0], *metadata["sample_shape"], -1)
+    return data[:, 0], values
+
+
 def load_times(path: Path) -> TimestepTuple:
-    """Read the timesteps and times and return them as numpy arrays."""
+    """Read the timesteps and times and return them as numpy arrays.
+
+    The binary time index is used if present, otherwise `times.txt` is parsed.
+    """
     _path = Path(path)      # To be sure
+    if (_path / TIME_INDEX_FILENAME).exists():
+        time_index = TimeIndex(_path)
+        return TimestepTuple(time_index.timesteps, time_index.times)
     try:
         with open(_path / "times.txt", "r") as if_handle:
             data = if_handle.read().split()
@@ -4,6 +4,9 @@ import h5py
 import dolfin
 import logging
 
+from xml.etree import ElementTree
+from collections import OrderedDict
+
 import numpy as np
 import dolfin as df
 
@@ -12,29 +15,64 @@ from postspec import (
     FieldSpec,
 )
 
-from postutils import load_metadata
+from postutils import (
+    load_metadata,
+    get_part_filenames,
+    MeshStore,
+    MeshCache,
+    load_mesh_reference,
+)
 
 from postfields import (
     Field,
 )
 
+from postfields.hdf5_series import (
+    HDF5SeriesReader,
+    SHARED_SERIES_FILENAME,
+)
+
 from pathlib import Path
 
 from typing import (
     Dict,
     Any,
+    List,
     Iterable,
     Tuple,
     Iterator,
+    NamedTuple,
+    Optional,
 )
 
 from .baseclass import PostProcessorBaseClass
 from .load_plain_text import load_times
+from .prefetch import FramePrefetcher
+from .snapshot import (
+    list_snapshots,
+    read_snapshot,
+)
+from .time_index import (
+    TimeIndex,
+    TIME_INDEX_FILENAME,
+)
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+class FieldIndex(NamedTuple):
+    """The saved frames of a field, in the order they were saved.
+
+    `locators` holds the row of each frame for "hdf5_series", the file and dataset path for
+    "hdf5", and the file and counter for "checkpoint".
+    """
+    backend: str
+    timesteps: np.ndarray
+    times: np.ndarray
+    locators: List[Any]
+
+
 class Loader(PostProcessorBaseClass):
     """Class for loading meshes and functions."""
 
@@ -42,31 +80,86 @@ class Loader(PostProcessorBaseClass):
         """Store saver specifications."""
         super().__init__(spec)
         self.mesh = None
+        self._time_index: Optional[TimeIndex] = None
+        self._field_indices: Dict[Tuple[str, str], FieldIndex] = {}
+        self._series_readers: Dict[str, HDF5SeriesReader] = {}
+        self._open_files: Dict[Tuple[str, str], Tuple[Path, Any]] = {}     # The last file of each field
+        # Least recently used first
+        self._function_spaces: "OrderedDict[Any, dolfin.FunctionSpace]" = OrderedDict()     # By UFL element
+        self._mesh_functions: "OrderedDict[Tuple[str, Optional[Path]], dolfin.MeshFunction]" = OrderedDict()
 
     # TODO: @property?
     def set_mesh(self, mesh: df.Mesh) -> None:
         self.mesh = mesh
+        self._function_spaces.clear()
+        self._mesh_functions.clear()
 
     def load_mesh(self, name: str = None) -> dolfin.mesh:
-        """Load and return the mesh stored as xdmf."""
+        """Load and return the mesh.
+
+        The mesh is read from the mesh store if the casedir has a mesh reference, and from
+        `mesh.xdmf` otherwise. If `name` is given, `{name}.xdmf` is read. With
+        `LoaderSpec.use_mesh_cache`, the xdmf file is read through a `postutils.MeshCache`.
+        """
         if self.mesh is None:
-            self.mesh = df.Mesh()
+            reference = load_mesh_reference(self._casedir)
+            if name is None and reference is not None:
+                mesh_store = MeshStore.from_reference(reference, self._casedir)
+                if self._spec.use_mesh_cache:
+                    self.mesh, _, _ = MeshCache().load(mesh_store.mesh_filename(reference["mesh"]))
+                else:
+                    self.mesh = mesh_store.load(reference["mesh"])
+                return self.mesh
+
             if name is None:
                 mesh_name = self._casedir / Path("mesh.xdmf")
             else:
                 mesh_name = self._casedir / Path(f"{name}.xdmf")
+            if self._spec.use_mesh_cache:
+                self.mesh, _, _ = MeshCache().load(mesh_name)
+                return self.mesh
+
+            self.mesh = df.Mesh()
             with df.XDMFFile(str(mesh_name)) as infile:
                 infile.read(self.mesh)
         return self.mesh
 
+    def load_field_mesh(self, name: str) -> dolfin.Mesh:
+        """Load and return the mesh of a field with its own mesh, e.g. a `BoundaryField`."""
+        directory = self._casedir / name
+        reference = load_mesh_reference(directory)
+        if reference is not None:
+            return MeshStore.from_reference(reference, directory).load(reference["mesh"])
+
+        mesh = df.Mesh()
+        with df.XDMFFile(str(directory / "boundary_mesh.xdmf")) as infile:
+            infile.read(mesh)
+        return mesh
+
     def load_mesh_function(self, name: str, directory: Path = None) -> dolfin.MeshFunction:
         """Lead and return a mesh function.
 
-        There are two options, 'cell_function' or 'facet_function'.
+        There are two options, 'cell_function' or 'facet_function'. Mesh functions listed in
+        the mesh reference are read from hdf5, the others from `{name}.xdmf`. The mesh
+        function is cached, so the same object is returned until it is dropped from the cache.
 
         Arguments:
             name: Either 'cell_function' or 'facet_function'.
+            directory: Read `{name}.xdmf` from `directory` rather than the casedir.
         """
+        key = (name, None if directory is None else Path(directory))
+        if key in self._mesh_functions:
+            self._mesh_functions.move_to_end(key)
+            return self._mesh_functions[key]
+
+        mesh_function = self._read_mesh_function(name, directory)
+        self._mesh_functions[key] = mesh_function
+        if len(self._mesh_functions) > self._spec.cache_size:
+            self._mesh_functions.popitem(last=False)
+        return mesh_function
+
+    def _read_mesh_function(self, name: str, directory: Path = None) -> dolfin.MeshFunction:
+        """Read a mesh function. See `load_mesh_function`."""
         # TODO: I could use Enum rather than hard-coding names
         msg = "Meshfunctions are stored as 'cell_function' or 'facet_function'."
         # if not name in ("cell_function", "facet_function"):
@@ -74,6 +167,15 @@ class Loader(PostProcessorBaseClass):
 
         self.load_mesh()        # Method tests if mesh is already loaded
 
+        reference = load_mesh_reference(self._casedir)
+        if directory is None and reference is not None and name in reference.get("mesh_functions", {}):
+            mf_reference = reference["mesh_functions"][name]
+            mesh_function = df.MeshFunction("size_t", self.mesh, mf_reference["dim"])
+            filename = self._casedir / mf_reference["filename"]
+            with df.HDF5File(self.mesh.mpi_comm(), str(filename), "r") as infile:
+                infile.read(mesh_function, f"/{name}")
+            return mesh_function
+
         dimension = self.mesh.geometry().dim()      # if cell function
         if name == "facet_function" or name[-3:] == "_ff":
             dimension -= 1      # dimension is one less
@@ -93,6 +195,29 @@ class Loader(PostProcessorBaseClass):
         # cell_function = df.MeshFunction("size_t", self.mesh, mvc)
         return cell_function
 
+    def load_snapshot(
+            self,
+            data_dict: Dict[str, dolfin.Function],
+            timestep: Optional[int] = None
+    ) -> Tuple[int, float]:
+        """Assign the values of a snapshot to the functions in `data_dict`.
+
+        The functions must be defined on the same mesh partition as when the snapshot was
+        written, i.e. with the same number of processes.
+
+        Arguments:
+            data_dict: The functions to restore, keyed by field name.
+            timestep: The timestep of the snapshot. Defaults to the newest snapshot.
+
+        Returns the timestep and time of the snapshot.
+        """
+        snapshots = list_snapshots(self._casedir)
+        if timestep is not None:
+            snapshots = [path for path in snapshots if int(path.name.split("_")[-1]) == int(timestep)]
+        if len(snapshots) == 0:
+            raise FileNotFoundError(f"Could not find a complete snapshot in {self._casedir}")
+        return read_snapshot(snapshots[-1], data_dict)
+
     def load_metadata(self, name) -> Dict[str, str]:
         """Read the metadata associated with a field name."""
         return load_metadata(self._casedir / Path("{name}/metadata_{name}.yaml".format(name=name)))
@@ -110,115 +235,582 @@ class Loader(PostProcessorBaseClass):
         Optionally, return the corresponding time.
         """
         metadata = self.load_metadata(name)
+        backend = "hdf5_series" if "hdf5_series" in metadata["save_as"] else "hdf5"
+        v_func = dolfin.Function(self._function_space(vector))
+        yield from self._iterate_frames(name, backend, v_func, timestep_iterable)
 
-        _timestep_iterable = timestep_iterable
-        timestep_iterable, time_iterable = self.load_time()
-        time_iterable = np.unique(time_iterable)
-        if _timestep_iterable is None:
-            _timestep_iterable = np.unique(timestep_iterable)
-        if self.mesh is None:
-            self.mesh = self.load_mesh()
+    def field_index(self, name: str, backend: str = None) -> FieldIndex:
+        """Return the index of the frames of `name`, built on the first call.
 
-        element_tuple = (
-            dolfin.interval,
-            dolfin.triangle,
-            dolfin.tetrahedron
+        Arguments:
+            name: The name of the field.
+            backend: One of "hdf5_series", "hdf5" or "checkpoint". Defaults to "hdf5_series"
+                if the field was saved as such, and "hdf5" otherwise.
+        """
+        if backend is None:
+            save_as = self.load_metadata(name)["save_as"]
+            backend = "hdf5_series" if "hdf5_series" in save_as else "hdf5"
+        key = (name, backend)
+        if key in self._field_indices:
+            return self._field_indices[key]
+
+        if backend == "hdf5_series":
+            reader = self._series_reader(name)
+            index = FieldIndex(backend, reader.timesteps, reader.times, list(range(len(reader))))
+        else:
+            metadata = self.load_metadata(name)
+            frames = self._hdf5_frames(name) if backend == "hdf5" else self._checkpoint_frames(name)
+            timesteps, times = self._saved_timesteps(name, metadata, len(frames))
+            num_frames = min(len(frames), timesteps.size)
+            index = FieldIndex(backend, timesteps[:num_frames], times[:num_frames], frames[:num_frames])
+        self._field_indices[key] = index
+        return index
+
+    def get_field(
+            self,
+            name: str,
+            timestep: int,
+            vector: bool = False,
+            backend: str = None
+    ) -> Tuple[float, dolfin.Function]:
+        """Return the time and the field `name` saved at `timestep`.
+
+        Raises `KeyError` if the field was not saved at `timestep`.
+        """
+        index = self.field_index(name, backend)
+        position = int(np.searchsorted(index.timesteps, timestep))
+        if position == index.timesteps.size or index.timesteps[position] != int(timestep):
+            raise KeyError(f"Field {name} was not saved at timestep {timestep}")
+        function = dolfin.Function(self._field_function_space(name, index.backend, vector))
+        self._read_frame(name, index, position, function)
+        return float(index.times[position]), function
+
+    def get_field_at_time(
+            self,
+            name: str,
+            time: float,
+            vector: bool = False,
+            backend: str = None
+    ) -> Tuple[float, dolfin.Function]:
+        """Return the field `name` saved closest to `time`, and the time it was saved at."""
+        index = self.field_index(name, backend)
+        if index.times.size == 0:
+            raise KeyError(f"Field {name} has no saved frames")
+        position = int(np.searchsorted(index.times, time))
+        if position == index.times.size or (
+                position > 0 and time - index.times[position - 1] <= index.times[position] - time
+        ):
+            position -= 1
+        function = dolfin.Function(self._field_function_space(name, index.backend, vector))
+        self._read_frame(name, index, position, function)
+        return float(index.times[position]), function
+
+    def load_field_range(
+            self,
+            name: str,
+            start_time: float = None,
+            stop_time: float = None,
+            stride: int = 1,
+            vector: bool = False,
+            backend: str = None
+    ) -> Iterator[Tuple[float, dolfin.Function]]:
+        """Iterate over every `stride`th frame of `name` saved in [`start_time`, `stop_time`).
+
+        The same function is updated and yielded for each frame. The file is closed when the
+        iterator is exhausted or closed.
+        """
+        index = self.field_index(name, backend)
+        first = 0 if start_time is None else int(np.searchsorted(index.times, start_time, "left"))
+        last = index.times.size if stop_time is None else int(np.searchsorted(index.times, stop_time, "left"))
+        function = dolfin.Function(self._field_function_space(name, index.backend, vector))
+        try:
+            for position in range(first, last, stride):
+                self._read_frame(name, index, position, function)
+                yield float(index.times[position]), function
+        finally:
+            self._close_field_file(name, index.backend)
+
+    def prefetch_field(
+            self,
+            name: str,
+            timestep_iterable: Iterable[int] = None,
+            vector: bool = False,
+            backend: str = None,
+            read_ahead: int = 4,
+            max_bytes: int = 2**30
+    ) -> FramePrefetcher:
+        """Read the frames of `name` ahead in a background thread.
+
+        Unlike `load_field`, each frame has its own buffer, which is reused only after the
+        frame is released. The prefetcher opens its own files, and closes them when it stops.
+        It is serial only, as the reads in parallel are collective and would run concurrently
+        with the collectives of the main thread.
+
+            with loader.prefetch_field("v", read_ahead=8) as frames:
+                for frame in frames:
+                    with frame:
+                        frame.copy_to(v)
+
+        Arguments:
+            name: The name of the field.
+            timestep_iterable: Only read these timesteps. Defaults to all.
+            vector: Load the field into a vector function space.
+            backend: See `field_index`. Use "checkpoint" to read the checkpoints.
+            read_ahead: The maximum number of frames read ahead.
+            max_bytes: The maximum memory used for the frame buffers.
+        """
+        if dolfin.MPI.size(dolfin.MPI.comm_world) > 1:
+            raise ValueError("prefetch_field is only supported in serial")
+        index = self.field_index(name, backend)
+        positions = range(index.timesteps.size)
+        if timestep_iterable is not None:
+            requested_timesteps = set(map(int, timestep_iterable))
+            positions = [i for i, timestep in enumerate(index.timesteps) if timestep in requested_timesteps]
+        function = dolfin.Function(self._field_function_space(name, index.backend, vector))
+
+        # Not shared with the loader, which the main thread keeps using
+        open_files: Dict[Tuple[str, str], Tuple[Path, Any]] = {}
+        if index.backend == "hdf5_series":
+            open_files[(name, index.backend)] = (None, self._open_series_reader(name))
+
+        def close_files() -> None:
+            for _, fieldfile in open_files.values():
+                fieldfile.close()
+            open_files.clear()
+
+        return FramePrefetcher(
+            lambda position, scratch: self._read_frame(name, index, position, scratch, open_files),
+            function,
+            positions,
+            index.timesteps,
+            index.times,
+            read_ahead=read_ahead,
+            max_bytes=max_bytes,
+            close_files=close_files,
         )
 
-        if vector:
-            element = dolfin.VectorElement(
-                "CG",
-                element_tuple[self.mesh.geometry().dim() - 1],
-                1
-            )
-        else:
-            element = dolfin.FiniteElement(
-                "CG",
-                element_tuple[self.mesh.geometry().dim() - 1],        # zero indexed
-                1
-            )
-
-        V_space = dolfin.FunctionSpace(self.mesh, element)
-        v_func = dolfin.Function(V_space)
-
-        filename = self._casedir / name / f"{name}.hdf5"
-
-        h5file = h5py.File(str(filename), "r")
-        data_group = h5file[name]
-        h5_timestep_list = sorted(list(
-            map(lambda x: int(x.split("_")[-1]), filter(lambda x: "vector_" in x, data_group.keys()))
-        ))
-
-        saved_h5_index = 0
-        with dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), "r") as fieldfile:
-            # from IPython import embed; embed()
-            # assert False
-            for savad_timestep_index, timestep in enumerate(_timestep_iterable):
-                if timestep < int(metadata["start_timestep"]):
+    def _iterate_frames(
+            self,
+            name: str,
+            backend: str,
+            function: dolfin.Function,
+            timestep_iterable: Iterable[int] = None
+    ) -> Iterator[Tuple[float, dolfin.Function]]:
+        """Read the frames of `name` into `function`, optionally only `timestep_iterable`.
+
+        The file is closed when the iterator is exhausted or closed.
+        """
+        index = self.field_index(name, backend)
+        requested_timesteps = None
+        if timestep_iterable is not None:
+            requested_timesteps = set(map(int, timestep_iterable))
+        try:
+            for position, (timestep, time) in enumerate(zip(index.timesteps, index.times)):
+                if requested_timesteps is not None and timestep not in requested_timesteps:
                     continue
-                if timestep % int(metadata["stride_timestep"]) != 0:
+                self._read_frame(name, index, position, function)
+                yield time, function
+        finally:
+            self._close_field_file(name, index.backend)
+
+    def _read_frame(
+            self,
+            name: str,
+            index: FieldIndex,
+            position: int,
+            function: dolfin.Function,
+            open_files: Dict[Tuple[str, str], Tuple[Path, Any]] = None
+    ) -> None:
+        """Read frame `position` of `index` into `function`.
+
+        The last used file of each field is kept open, until the iterator reading it finishes
+        or `close` is called.
+
+        Arguments:
+            name: The name of the field.
+            index: The index of the frames of `name`.
+            position: The position of the frame in `index`.
+            function: The function to read into.
+            open_files: The files kept open, by field and backend. Defaults to the loader's.
+                The reader of an "hdf5_series" must already be in it.
+        """
+        locator = index.locators[position]
+        if index.backend == "hdf5_series":
+            if open_files is None:
+                reader = self._series_reader(name)
+            else:
+                _, reader = open_files[(name, index.backend)]
+            vector = function.vector()
+            vector.set_local(reader.read(locator, vector.local_range()))
+            vector.apply("insert")
+            return
+
+        if open_files is None:
+            open_files = self._open_files
+        filename, dataset = locator
+        open_filename, fieldfile = open_files.get((name, index.backend), (None, None))
+        if open_filename != filename:
+            if fieldfile is not None:
+                fieldfile.close()
+            if index.backend == "hdf5":
+                fieldfile = dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), "r")
+            else:
+                fieldfile = dolfin.XDMFFile(dolfin.MPI.comm_world, str(filename))
+            open_files[(name, index.backend)] = (filename, fieldfile)
+
+        if index.backend == "hdf5":
+            fieldfile.read(function, dataset)
+            return
+        try:
+            fieldfile.read_checkpoint(function, name, counter=dataset)
+        except RuntimeError as e:
+            LOGGER.info(f"Could not read timestep: {e}")
+
+    def _close_field_file(self, name: str, backend: str) -> None:
+        """Close the file of `name` kept open by `_read_frame`, if any. It is reopened on demand."""
+        if backend == "hdf5_series":
+            reader = self._series_readers.pop(name, None)
+            if reader is not None:
+                reader.close()
+            return
+        _, fieldfile = self._open_files.pop((name, backend), (None, None))
+        if fieldfile is not None:
+            fieldfile.close()
+
+    def _series_reader(self, name: str) -> HDF5SeriesReader:
+        """Return the open reader of a field saved as "hdf5_series"."""
+        if name not in self._series_readers:
+            self._series_readers[name] = self._open_series_reader(name)
+        return self._series_readers[name]
+
+    def _open_series_reader(self, name: str) -> HDF5SeriesReader:
+        """Open a new reader of a field saved as "hdf5_series"."""
+        filenames = get_part_filenames(self._casedir / name, f"{name}_series", ".hdf5")
+        if self._in_shared_file(name):
+            filenames = self._casedir / SHARED_SERIES_FILENAME
+        return HDF5SeriesReader(filenames, name)
+
+    def _field_function_space(self, name: str, backend: str, vector: bool = False) -> dolfin.FunctionSpace:
+        """Return the function space checkpoints are read into, and CG1 otherwise."""
+        if backend != "checkpoint":
+            return self._function_space(vector)
+        metadata = self.load_metadata(name)
+        return self._cached_function_space(metadata["element_family"], metadata["element_degree"])
+
+    def close(self) -> None:
+        """Close the files kept open for random access."""
+        for reader in self._series_readers.values():
+            reader.close()
+        self._series_readers = {}
+        for _, fieldfile in self._open_files.values():
+            fieldfile.close()
+        self._open_files = {}
+
+    def iter_arrays(
+            self,
+            name: str,
+            timestep_iterable: Iterable[int] = None,
+            out: np.ndarray = None,
+            memmap: bool = False
+    ) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Iterate over the stored dof vectors of `name` with h5py, without dolfin functions.
+
+        The vectors are in the global dof ordering of the saving run. Use `dof_to_vertex` to
+        map them to the vertices of the mesh. The same buffer is filled and yielded for each
+        timestep, so copy it to keep the values.
+
+        Arguments:
+            name: A field saved as "hdf5" or "hdf5_series".
+            timestep_iterable: Only read these timesteps. Defaults to all.
+            out: A preallocated float64 buffer of the global size.
+            memmap: Yield read-only memory-mapped views of contiguous "hdf5" datasets rather
+                than reading into `out`. Other datasets are read into `out`.
+
+        Yields the timestep, time and values.
+        """
+        index = self.field_index(name)
+        requested_timesteps = None
+        if timestep_iterable is not None:
+            requested_timesteps = set(map(int, timestep_iterable))
+
+        if index.backend == "hdf5_series":
+            reader = self._series_reader(name)
+            if out is None:
+                out = np.empty(reader.global_size)
+            for position, (timestep, time) in enumerate(zip(index.timesteps, index.times)):
+                if requested_timesteps is not None and timestep not in requested_timesteps:
                     continue
-                fieldfile.read(v_func, f"{name}/vector_{h5_timestep_list[saved_h5_index]}")
-                saved_h5_index += 1
-                # fieldfile.read(v_func, f"{name}/vector_{timestep}")
-                yield time_iterable[savad_timestep_index], v_func
+                yield int(timestep), float(time), reader.read_into(index.locators[position], out)
+            return
 
-    def load_checkpoint(
-        self,
-        name: str,
-        timestep_iterable: Iterable[int] = None,
-    ) -> Iterator[Tuple[int, float, dolfin.Function]]:
-        """yield tuple(float, function)."""
+        h5file, current_filename = None, None
+        try:
+            for timestep, time, (filename, dataset_path) in zip(index.timesteps, index.times, index.locators):
+                if requested_timesteps is not None and timestep not in requested_timesteps:
+                    continue
+                if filename != current_filename:
+                    if h5file is not None:
+                        h5file.close()
+                    h5file = h5py.File(str(filename), "r")
+                    current_filename = filename
+                dataset = h5file[dataset_path]
+                offset = dataset.id.get_offset()
+                if memmap and dataset.chunks is None and offset is not None:
+                    values = np.memmap(filename, dtype=dataset.dtype, mode="r", offset=offset, shape=dataset.shape)
+                else:
+                    if out is None:
+                        out = np.empty(dataset.shape)
+                    dataset.read_direct(out)
+                    values = out
+                yield int(timestep), float(time), values
+        finally:
+            if h5file is not None:
+                h5file.close()
+
+    def dof_to_vertex(self, name: str) -> np.ndarray:
+        """Return the vertex of each dof in the vectors of `iter_arrays`.
+
+        The vertices index the coordinates of the stored mesh. For vector fields the entries
+        are the vertex times the block size plus the component, as in
+        `dolfin.dof_to_vertex_map`, so that `vertex_values[dof_to_vertex] = values`.
+        Only CG1 fields are supported.
+        """
         metadata = self.load_metadata(name)
+        if metadata["element_family"] != "Lagrange" or int(metadata["element_degree"]) != 1:
+            raise ValueError(f"Field {name} is not CG1, it has no dof to vertex map")
+
+        index = self.field_index(name)
+        if index.backend == "hdf5_series":
+            dof_to_vertex = self._series_reader(name).dof_to_vertex
+            if dof_to_vertex is None:
+                raise RuntimeError(f"Field {name} was saved without a dof to vertex map")
+            return dof_to_vertex
+
+        filename = index.locators[0][0]
+        with h5py.File(str(filename), "r") as h5file:
+            group = h5file[name]
+            cells = group["cells"][()]
+            cell_dofs = group["cell_dofs"][()]
+            num_cell_dofs = group["x_cell_dofs"][1] - group["x_cell_dofs"][0]
+            global_size = group[index.locators[0][1]].shape[0]
+
+        cell_vertices = self._mesh_topology()[cells]
+        num_cell_vertices = cell_vertices.shape[1]
+        block_size = num_cell_dofs//num_cell_vertices
+        # The local dofs of a cell are ordered by component, then by the vertices of the cell
+        local_dofs = np.arange(num_cell_dofs)
+        dof_vertices = cell_vertices[:, local_dofs % num_cell_vertices]*block_size + local_dofs//num_cell_vertices
+
+        dof_to_vertex = np.empty(global_size, dtype="i8")
+        dof_to_vertex[cell_dofs] = dof_vertices.ravel()
+        return dof_to_vertex
+
+    def _mesh_topology(self) -> np.ndarray:
+        """Read the cell vertices of the mesh with h5py, following the hdf5 path in the xdmf file."""
+        reference = load_mesh_reference(self._casedir)
+        if reference is not None:
+            xdmf_filename = MeshStore.from_reference(reference, self._casedir).mesh_filename(reference["mesh"])
+        else:
+            xdmf_filename = self._casedir / "mesh.xdmf"
+
+        topology_item = ElementTree.parse(str(xdmf_filename)).find(".//Topology/DataItem")
+        if topology_item is None or topology_item.get("Format") != "HDF":
+            raise RuntimeError(f"Could not find the hdf5 topology in {xdmf_filename}")
+        h5_filename, dataset_path = topology_item.text.strip().split(":")
+        with h5py.File(str(xdmf_filename.parent / h5_filename), "r") as h5file:
+            return h5file[dataset_path][()]
+
+    def _hdf5_frames(self, name: str) -> List[Tuple[Path, str]]:
+        """Return the file and dataset path of each frame of `name` saved as "hdf5".
+
+        The frames of all parts are returned in order.
+        """
+        frames = []
+        for filename in get_part_filenames(self._casedir / name, name, ".hdf5"):
+            with h5py.File(str(filename), "r") as h5file:
+                h5_timestep_list = sorted(list(
+                    map(lambda x: int(x.split("_")[-1]), filter(lambda x: "vector_" in x, h5file[name].keys()))
+                ))
+            frames.extend((filename, f"{name}/vector_{h5_timestep}") for h5_timestep in h5_timestep_list)
+        return frames
+
+    def _checkpoint_frames(self, name: str) -> List[Tuple[Path, int]]:
+        """Return the xdmf file and counter of each checkpoint of `name`, for all parts in order."""
+        frames = []
+        for filename in get_part_filenames(self._casedir / name, f"{name}_chk", ".xdmf"):
+            if not filename.exists():
+                raise FileNotFoundError(f"Could not open {filename}")
+            with h5py.File(str(filename.with_suffix(".h5")), "r") as h5file:
+                num_checkpoints = len(h5file[name].keys())
+            frames.extend((filename, counter) for counter in range(num_checkpoints))
+        return frames
+
+    def _in_shared_file(self, name: str) -> bool:
+        """Return True if `name` is a group in the file shared by all fields."""
+        filename = self._casedir / SHARED_SERIES_FILENAME
+        if not filename.exists():
+            return False
+        with h5py.File(str(filename), "r") as h5file:
+            return name in h5file
+
+    def load_fields(
+            self,
+            names: Iterable[str],
+            timestep_iterable: Iterable[int] = None,
+            vector: bool = False,
+    ) -> Iterator[Tuple[int, float, Dict[str, dolfin.Function]]]:
+        """Iterate over several fields stored in the shared file of a `single_file` saver.
 
-        _timestep_iterable = timestep_iterable
-        timestep_iterable, time_iterable = self.load_time()
+        The file is opened once, and the fields are yielded together for each timestep they
+        were all saved at.
 
-        # from IPython import embed; embed()
-        # assert False
-        if _timestep_iterable is None:
-            _timestep_iterable = timestep_iterable
+        Arguments:
+            names: The fields to load.
+            timestep_iterable: Only load these timesteps. Defaults to all.
+            vector: Load the fields into a vector function space.
 
+        Yields the timestep, time and a dict of the functions.
+        """
+        names = list(names)
+        function_space = self._function_space(vector)
+        functions = {name: dolfin.Function(function_space) for name in names}
+        local_range = functions[names[0]].vector().local_range()
+
+        with h5py.File(str(self._casedir / SHARED_SERIES_FILENAME), "r") as h5file:
+            readers = {name: HDF5SeriesReader(h5file, name) for name in names}
+            timesteps = readers[names[0]].timesteps
+            for reader in readers.values():
+                timesteps = np.intersect1d(timesteps, reader.timesteps)
+            if timestep_iterable is not None:
+                timesteps = np.intersect1d(timesteps, np.fromiter(map(int, timestep_iterable), dtype="i8"))
+
+            for timestep in timesteps:
+                time = None
+                for name, reader in readers.items():
+                    index = int(np.searchsorted(reader.timesteps, timestep))
+                    time = float(reader.times[index])
+                    functions[name].vector().set_local(reader.read(index, local_range))
+                    functions[name].vector().apply("insert")
+                yield int(timestep), time, functions
+
+    def _function_space(self, vector: bool = False) -> dolfin.FunctionSpace:
+        """Return a CG1 function space on the loaded mesh."""
         if self.mesh is None:
             self.mesh = self.load_mesh()
+        shape = (self.mesh.geometry().dim(),) if vector else ()
+        return self._cached_function_space("CG", 1, shape)
 
+    def _cached_function_space(self, family: str, degree: int, shape: Tuple[int, ...] = ()) -> dolfin.FunctionSpace:
+        """Return the function space of the element on the loaded mesh, from the cache if possible.
+
+        Arguments:
+            family: The element family, e.g. "Lagrange".
+            degree: The element degree.
+            shape: The value shape, () for scalar and (n,) for vector elements.
+        """
+        if self.mesh is None:
+            self.mesh = self.load_mesh()
         element_tuple = (
             dolfin.interval,
             dolfin.triangle,
             dolfin.tetrahedron
         )
+        cell = element_tuple[self.mesh.geometry().dim() - 1]        # zero indexed
+        if len(shape) == 0:
+            element = dolfin.FiniteElement(family, cell, degree)
+        else:
+            element = dolfin.VectorElement(family, cell, degree, dim=shape[0])
 
-        element = dolfin.FiniteElement(
-            metadata["element_family"],
-            element_tuple[self.mesh.geometry().dim() - 1],        # zero indexed
-            metadata["element_degree"]
-        )
+        # Key on the element, as it normalises the family names, e.g. "CG" is "Lagrange"
+        if element in self._function_spaces:
+            self._function_spaces.move_to_end(element)
+            return self._function_spaces[element]
+        function_space = dolfin.FunctionSpace(self.mesh, element)
 
-        V_space = dolfin.FunctionSpace(self.mesh, element)
-        v_func = dolfin.Function(V_space)
+        self._function_spaces[element] = function_space
+        if len(self._function_spaces) > self._spec.cache_size:
+            self._function_spaces.popitem(last=False)
+        return function_space
 
-        _filename = self.casedir / Path("{name}/{name}_chk.xdmf".format(name=name))
-        if _filename.exists():
-            filename_list = [_filename]
-        else:
-            assert False, f"Could not open {_filename}"
-
-        previous_timestep = -100
-        for filename in filename_list:
-            with dolfin.XDMFFile(dolfin.MPI.comm_world, str(filename)) as fieldfile:
-                for savad_timestep_index, timestep in enumerate(_timestep_iterable):
-                    if timestep == previous_timestep:
-                        continue
-                    previous_timestep = timestep
-                    if timestep < int(metadata["start_timestep"]):
-                        continue
-                    if timestep % int(metadata["stride_timestep"]) != 0:
-                        continue
-                    try:
-                        fieldfile.read_checkpoint(v_func, name, counter=timestep)
-                    except RuntimeError as e:
-                        LOGGER.info(f"Could not read timestep: {e}")
-                    yield time_iterable[savad_timestep_index], v_func
+    def clear_cache(self) -> None:
+        """Close the open files, and drop the cached function spaces, mesh functions and field indices.
+
+        Call this if the casedir is written to after the loader has read it.
+        """
+        self.close()
+        self._function_spaces.clear()
+        self._mesh_functions.clear()
+        self._field_indices.clear()
+        self._time_index = None
+
+    def load_statistics(self, name: str, vector: bool = False) -> Dict[str, dolfin.Function]:
+        """Return the last statistics written by the `StatisticsField` `name`, keyed by statistic."""
+        filename = self._casedir / name / f"statistics_{name}.hdf5"
+        with h5py.File(str(filename), "r") as h5file:
+            statistic_names = list(h5file.keys())
+            last_vectors = {
+                statistic: max(int(key.split("_")[-1]) for key in h5file[statistic].keys() if "vector_" in key)
+                for statistic in statistic_names
+            }
+
+        function_space = self._function_space(vector)
+        statistics = {}
+        with dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), "r") as statistics_file:
+            for statistic in statistic_names:
+                statistics[statistic] = dolfin.Function(function_space)
+                statistics_file.read(statistics[statistic], f"/{statistic}/vector_{last_vectors[statistic]}")
+        return statistics
+
+    def load_activation_time(self, name: str, vector: bool = False) -> Tuple[dolfin.Function, dolfin.Function]:
+        """Return the activation and recovery time maps of the `ActivationTimeField` `name`."""
+        filename = self._casedir / name / f"activation_time_{name}.hdf5"
+        function_space = self._function_space(vector)
+        activation_time = dolfin.Function(function_space)
+        recovery_time = dolfin.Function(function_space)
+        with dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), "r") as time_file:
+            time_file.read(activation_time, "/activation_time")
+            time_file.read(recovery_time, "/recovery_time")
+        return activation_time, recovery_time
+
+    def load_checkpoint(
+        self,
+        name: str,
+        timestep_iterable: Iterable[int] = None,
+    ) -> Iterator[Tuple[int, float, dolfin.Function]]:
+        """yield tuple(float, function)."""
+        v_func = dolfin.Function(self._field_function_space(name, "checkpoint"))
+        yield from self._iterate_frames(name, "checkpoint", v_func, timestep_iterable)
+
+    def _saved_timesteps(
+            self,
+            name: str,
+            metadata: Dict[str, Any],
+            num_frames: int = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the timesteps and times at which field `name` was saved.
+
+        Fields interpolated onto a `save_interval` grid are indexed by arithmetic. Their
+        "timesteps" are the grid indices, and `num_frames` is the number of stored frames.
+
+        Casedirs without a binary time index fall back on `start_timestep` and `stride_timestep`.
+        """
+        save_interval = metadata.get("save_interval", None)
+        if save_interval is not None and metadata.get("interpolate_to_interval", False):
+            first_index = int(round(float(metadata["first_save_time"])/save_interval))
+            grid_indices = np.arange(first_index, first_index + num_frames)
+            return grid_indices, grid_indices*save_interval
+
+        time_index = self.load_time_index()
+        if time_index is not None and time_index.has_field(name):
+            saved_mask = time_index.saved(name)
+            return time_index.timesteps[saved_mask], time_index.times[saved_mask]
+
+        timesteps, times = self.load_time()
+        timesteps, unique_indices = np.unique(timesteps, return_index=True)
+        times = times[unique_indices]
+        saved_mask = timesteps >= int(metadata["start_timestep"])
+        saved_mask &= timesteps % int(metadata["stride_timestep"]) == 0
+        return timesteps[saved_mask], times[saved_mask]
 
     @property
     def casedir(self) -> Path:
@@ -231,3 +823,9 @@ class Loader(PostProcessorBaseClass):
         filename = self.casedir
         assert filename.exists(), "Cannot find {filename}".format(filename=filename)
         return load_times(filename)
+
+    def load_time_index(self) -> Optional[TimeIndex]:
+        """Return the memory mapped time index, or None for casedirs with only times.txt."""
+        if self._time_index is None and (self._casedir / TIME_INDEX_FILENAME).exists():
+            self._time_index = TimeIndex(self._casedir)
+        return self._time_index
@@ -0,0 +1,168 @@
+"""Read frames in a background thread so that disk reads overlap with the analysis."""
+
+import queue
+import logging
+import threading
+
+import numpy as np
+import dolfin as df
+
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Sequence,
+)
+
+from .async_writer import StagingPool
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PrefetchedFrame:
+    """The local dofs of one frame, held in a buffer of the prefetch pool.
+
+    The buffer is returned to the pool by `release`, or when leaving a `with` block, after
+    which the values must not be used. Frames are independent, so several can be kept.
+    """
+
+    def __init__(self, timestep: int, time: float, values: np.ndarray, pool: StagingPool) -> None:
+        self.timestep = timestep
+        self.time = time
+        self._values = values
+        self._pool = pool
+
+    @property
+    def values(self) -> np.ndarray:
+        """The local dofs, in the ordering of the loader's function space."""
+        if self._values is None:
+            raise RuntimeError(f"The frame at timestep {self.timestep} is released")
+        return self._values
+
+    def copy_to(self, function: df.Function) -> df.Function:
+        """Set the local dofs of `function` to the frame, and return it."""
+        function.vector().set_local(self.values)
+        function.vector().apply("insert")
+        return function
+
+    def release(self) -> None:
+        """Return the buffer to the pool."""
+        if self._values is not None:
+            self._pool.release(self._values)
+            self._values = None
+
+    def __enter__(self) -> "PrefetchedFrame":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+class FramePrefetcher:
+    """Read the next frames in a background thread into a pool of buffers.
+
+    At most `read_ahead` frames wait in the queue, and the buffers of the queued and the
+    unreleased frames use at most `max_bytes`. The reader thread blocks when either limit is
+    reached, so the consumer must release the frames it is done with. It is serial only, as
+    the reads in parallel are collective.
+    """
+
+    def __init__(
+            self,
+            read_frame: Callable[[int, df.Function], None],
+            function: df.Function,
+            positions: Sequence[int],
+            timesteps: Sequence[int],
+            times: Sequence[float],
+            read_ahead: int = 4,
+            max_bytes: int = 2**30,
+            close_files: Callable[[], None] = None
+    ) -> None:
+        """Start the reader thread.
+
+        Arguments:
+            read_frame: Read the frame at a position into a function.
+            function: Scratch function the reader thread reads into.
+            positions: The positions of the frames to read, in order.
+            timesteps: The timestep of each position.
+            times: The time of each position.
+            read_ahead: The maximum number of frames read ahead of the consumer.
+            max_bytes: The maximum memory used for the frame buffers.
+            close_files: Close the files opened by `read_frame`. Called by the reader thread
+                when it stops.
+        """
+        self._read_frame = read_frame
+        self._close_files = close_files
+        self._function = function
+        self._frames = [(int(position), int(timesteps[position]), float(times[position])) for position in positions]
+        self._queue: queue.Queue = queue.Queue(maxsize=read_ahead)
+        self._pool = StagingPool(max_bytes)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="xalpost-reader", daemon=True)
+        self._thread.start()
+
+    def __iter__(self) -> Iterator[PrefetchedFrame]:
+        """Yield the frames in order. Errors in the reader thread are raised here."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        """Stop the reader thread and release the frames it has read ahead.
+
+        The frames held by the consumer stay valid until they are released.
+        """
+        self._stop.set()
+        while self._thread.is_alive() or not self._queue.empty():
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if isinstance(item, PrefetchedFrame):
+                item.release()
+        self._thread.join()
+
+    def __enter__(self) -> "FramePrefetcher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        """Read the frames into pool buffers. Exceptions are passed on to the consumer."""
+        try:
+            local_size = self._function.vector().local_size()
+            for position, timestep, time in self._frames:
+                if self._stop.is_set():
+                    break
+                self._read_frame(position, self._function)
+                buffer = self._pool.acquire(local_size, self._stop)
+                if buffer is None:      # Closed while waiting for the consumer's frames
+                    break
+                np.copyto(buffer, self._function.vector().get_local())
+                self._put(PrefetchedFrame(timestep, time, buffer, self._pool))
+        except Exception as e:
+            LOGGER.error(f"Could not read frame: {e}")
+            self._put(e)
+        if self._close_files is not None:
+            try:
+                self._close_files()
+            except Exception as e:
+                LOGGER.error(f"Could not close the prefetched files: {e}")
+        self._put(None)
+
+    def _put(self, item: Any) -> None:
+        """Put `item` in the queue unless the prefetcher is closed while waiting."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        if isinstance(item, PrefetchedFrame):
+            item.release()
@@ -1,5 +1,6 @@
 """An interface for saving a `Field` as hdf5."""
 
+import h5py
 import dolfin
 import logging
 import shutil
@@ -17,6 +18,13 @@ from postfields import (
     Field,
 )
 
+from postfields.hdf5_series import SHARED_SERIES_FILENAME
+
+from postutils import (
+    MeshStore,
+    store_mesh_reference,
+)
+
 from pathlib import Path
 
 from typing import (
@@ -28,17 +36,26 @@ from typing import (
 )
 
 from .baseclass import PostProcessorBaseClass
+from .async_writer import AsyncWriter
+from .time_index import TimeIndexWriter
+from .snapshot import SnapshotWriter
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+MESH_FUNCTIONS_FILENAME = "mesh_functions.hdf5"
+
+
 class Saver(PostProcessorBaseClass):
     """Class for saving stuff."""
 
     def __init__(self, spec: LoaderSpec) -> None:
         """Store saver specifications."""
         super().__init__(spec)
+        if self._spec.async_write and df.MPI.size(df.MPI.comm_world) > 1:
+            # The writer thread's collectives would run concurrently with the solver's
+            raise ValueError("async_write is only supported in serial")
         self._time_list = []            # Keep track of time points
         self._first_compute = True      # Perform special action after before first save
 
@@ -46,30 +63,70 @@ class Saver(PostProcessorBaseClass):
             self._casedir.mkdir(parents=True, exist_ok=self._spec.overwrite_casedir)
         df.MPI.barrier(df.MPI.comm_world)
 
+        self._time_index = None
+        if df.MPI.rank(df.MPI.comm_world) == 0:
+            self._time_index = TimeIndexWriter(self._casedir)
+
+        mesh_store = self._spec.mesh_store
+        if mesh_store is None:
+            mesh_store = self._casedir / "meshes"
+        self._mesh_store = MeshStore(mesh_store)
+
+        self._snapshot_writer = None
+        if self._spec.snapshot_interval_steps is not None or self._spec.snapshot_interval_seconds is not None:
+            self._snapshot_writer = SnapshotWriter(
+                self._casedir,
+                interval_steps=self._spec.snapshot_interval_steps,
+                interval_seconds=self._spec.snapshot_interval_seconds,
+                num_snapshots=self._spec.num_snapshots,
+            )
+
+        self._shared_file = None
+        if self._spec.single_file:
+            # Append, so that a restart keeps the fields saved before
+            filename = str(self._casedir / SHARED_SERIES_FILENAME)
+            if df.MPI.size(df.MPI.comm_world) > 1:
+                self._shared_file = h5py.File(filename, "a", driver="mpio", comm=df.MPI.comm_world)
+            else:
+                self._shared_file = h5py.File(filename, "a")
+
+        self._async_writer = None
+        if self._spec.async_write:
+            self._async_writer = AsyncWriter(
+                queue_depth=self._spec.async_queue_depth,
+                staging_bytes=self._spec.async_staging_bytes,
+            )
+
     def store_mesh(
             self,
             mesh: dolfin.Mesh,
             cell_domains: dolfin.MeshFunction = None,
             facet_domains: dolfin.MeshFunction = None
     ) -> None:
-        """Save the mesh, and cellfunction and facet function if provided."""
-        with dolfin.XDMFFile(mesh.mpi_comm(), str(self._casedir / "mesh.xdmf")) as meshfile:
-            meshfile.write(mesh)
+        """Save the mesh, and cellfunction and facet function if provided.
+
+        The mesh is written to the mesh store, unless it is already there, and referenced
+        from `mesh_reference.yaml`. The mesh functions are stored without the geometry in
+        `mesh_functions.hdf5`.
+        """
+        mesh_hash = self._mesh_store.store(mesh)
+        reference = self._mesh_store.reference(mesh_hash, self._casedir)
+
+        mesh_functions = {"cell_function": cell_domains, "facet_function": facet_domains}
+        mesh_functions = {name: mf for name, mf in mesh_functions.items() if mf is not None}
+        if len(mesh_functions) > 0:
+            filename = self._casedir / MESH_FUNCTIONS_FILENAME
+            with df.HDF5File(mesh.mpi_comm(), str(filename), "w") as mf_file:
+                for name, mesh_function in mesh_functions.items():
+                    mf_file.write(mesh_function, f"/{name}")
+            reference["mesh_functions"] = {
+                name: {"filename": MESH_FUNCTIONS_FILENAME, "dim": mf.dim()}
+                for name, mf in mesh_functions.items()
+            }
 
-            # if cell_domains is not None:
-            #     meshfile.write(cell_domains, "cell_domains")
-            # if facet_domains is not None:
-            #     meshfile.write(facet_domains, "facet_domains")
-
-        if cell_domains is not None:
-            with df.XDMFFile(mesh.mpi_comm(), str(self._casedir / "cell_function.xdmf")) as cf_file:
-                cf_file.write(mesh)
-                cf_file.write(cell_domains)
-
-        if facet_domains is not None:
-            with df.XDMFFile(mesh.mpi_comm(), str(self._casedir / "facet_function.xdmf")) as ff_file:
-                ff_file.write(mesh)
-                ff_file.write(facet_domains)
+        if df.MPI.rank(df.MPI.comm_world) == 0:
+            store_mesh_reference(self._casedir, reference)
+        df.MPI.barrier(df.MPI.comm_world)
 
     def add_field(self, field: Field) -> None:
         """Add a field to the postprocessor."""
@@ -77,7 +134,11 @@ class Saver(PostProcessorBaseClass):
         msg = "A field with name {name} already exists.".format(name=field.name)
         assert field.name not in self._fields, msg      # TODO: Issue warning, not abort
         field.path = self._casedir
+        field.mesh_store = self._mesh_store
+        field.shared_file = self._shared_file
         self._fields[field.name] = field
+        if self._time_index is not None:
+            self._time_index.add_field(field.name)
 
     def update(
             self,
@@ -87,27 +148,78 @@ class Saver(PostProcessorBaseClass):
     ) -> None:
         """Store solutions and perform computations for new timestep."""
         self._time_list.append(float(time))    # This time array has to be sent to each field
-        for name, data in data_dict.items():
-            self._fields[name].update(timestep, time, data)
+        saved_names = self._update_fields(timestep, time, data_dict)
+        if self._time_index is not None:
+            self._time_index.append(int(timestep), float(time), saved_names)
 
-        filename = self._casedir / Path("times.txt")
-        with open(filename, "a") as of_handle:
-            of_handle.write("{} {}\n".format(timestep, float(time)))
+        if self._snapshot_writer is not None and self._snapshot_writer.snapshot_this_timestep(timestep):
+            self.snapshot(timestep, time, data_dict)
+
+    def snapshot(
+            self,
+            timestep: Union[int, dolfin.Constant],
+            time: float,
+            data_dict: Dict[str, dolfin.Function]
+    ) -> None:
+        """Write a snapshot of the registered fields in `data_dict` for a fast restart."""
+        if self._snapshot_writer is None:
+            self._snapshot_writer = SnapshotWriter(self._casedir, num_snapshots=self._spec.num_snapshots)
+        fields = {name: data for name, data in data_dict.items() if name in self._fields}
+        self._snapshot_writer.write(int(timestep), float(time), fields)
 
     def update_this_timestep(self, *, field_names: Iterable[str], timestep: int, time: float) -> bool:
+        """Return True if any of the fields may be saved. `save_threshold` is not evaluated."""
         return any([self._fields[name].save_this_timestep(timestep, time) for name in field_names])
 
     def store_initial_condition(self, data_dict) -> None:
         time = 0.0
         timestep = 0
         self._time_list.append(time)
-        for name, data in data_dict.items():
-            self._fields[name].update(timestep, time, data)
+        saved_names = self._update_fields(timestep, time, data_dict)
+        if self._time_index is not None:
+            self._time_index.append(timestep, time, saved_names)
 
-        with (self._casedir / Path("times.txt")).open("a") as of_handle:
-            of_handle.write("{} {}\n".format(timestep, float(time)))
+    def _update_fields(
+            self,
+            timestep: Union[int, dolfin.Constant],
+            time: float,
+            data_dict: Dict[str, dolfin.Function]
+    ) -> List[str]:
+        """Update each field, or hand the data to the writer thread if `async_write`.
+
+        Return the names of the saved fields.
+        """
+        saved_names = []
+        for name, data in data_dict.items():
+            field = self._fields[name]
+            if self._async_writer is None:
+                saved = field.update(timestep, time, data)
+            else:
+                saved = False
+                for frame_time, frame_data in field.frames_to_store(timestep, time, data):
+                    self._async_writer.submit(field, timestep, frame_time, frame_data)
+                    saved = True
+            if saved:
+                saved_names.append(name)
+        return saved_names
+
+    def flush(self) -> None:
+        """Block until all pending asynchronous writes are done, and flush the shared file."""
+        if self._async_writer is not None:
+            self._async_writer.flush()
+        if self._shared_file is not None:
+            self._shared_file.flush()
 
     def close(self) -> None:
         """Store the times."""
+        if self._async_writer is not None:
+            self._async_writer.close()
+            self._async_writer = None
+        if self._time_index is not None:
+            self._time_index.close()
+            self._time_index = None
         for _, field in self._fields.items():
             field.close()
+        if self._shared_file is not None:
+            self._shared_file.close()
+            self._shared_file = None
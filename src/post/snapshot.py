@@ -0,0 +1,167 @@
+"""Rotating snapshots of the raw local dofs for fast restarts on the same number of processes.
+
+A snapshot is a directory `snapshots/snapshot_<timestep>` with one `rank_<rank>.npz` per
+process and a `meta.yaml`. `meta.yaml` is written last, so a snapshot without it is incomplete.
+"""
+
+import shutil
+import logging
+
+import yaml
+import numpy as np
+import dolfin as df
+
+from mpi4py import MPI
+from pathlib import Path
+from time import monotonic
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+SNAPSHOT_DIRECTORY = "snapshots"
+SNAPSHOT_META_FILENAME = "meta.yaml"
+
+
+def _rank_filename(directory: Path, rank: int) -> Path:
+    return directory / f"rank_{rank:05d}.npz"
+
+
+def list_snapshots(casedir: Path) -> List[Path]:
+    """Return the complete snapshots in `casedir`, oldest first."""
+    snapshot_root = Path(casedir) / SNAPSHOT_DIRECTORY
+    if not snapshot_root.exists():
+        return []
+    snapshots = [
+        path for path in snapshot_root.glob("snapshot_*") if (path / SNAPSHOT_META_FILENAME).exists()
+    ]
+    return sorted(snapshots, key=lambda path: int(path.name.split("_")[-1]))
+
+
+class SnapshotWriter:
+    """Write a snapshot every `interval_steps` timesteps or `interval_seconds` wall clock seconds."""
+
+    def __init__(
+            self,
+            casedir: Path,
+            interval_steps: Optional[int] = None,
+            interval_seconds: Optional[float] = None,
+            num_snapshots: int = 2
+    ) -> None:
+        """Store the snapshot cadence.
+
+        Arguments:
+            casedir: The snapshots are stored in `casedir/snapshots`.
+            interval_steps: The number of timesteps between snapshots.
+            interval_seconds: The wall clock time between snapshots.
+            num_snapshots: The number of snapshots kept. Older snapshots are deleted.
+        """
+        if num_snapshots < 1:
+            raise ValueError(f"num_snapshots must be at least 1, got {num_snapshots}")
+        self._directory = Path(casedir) / SNAPSHOT_DIRECTORY
+        self._interval_steps = interval_steps
+        self._interval_seconds = interval_seconds
+        self._num_snapshots = num_snapshots
+        self._last_timestep: Optional[int] = None
+        self._last_wall_time = monotonic()
+
+    def snapshot_this_timestep(self, timestep: int) -> bool:
+        """Return True if a snapshot is due. Rank 0 decides, so all processes agree."""
+        comm = df.MPI.comm_world
+        due = None
+        if comm.Get_rank() == 0:
+            due = False
+            if self._interval_steps is not None:
+                last_timestep = 0 if self._last_timestep is None else self._last_timestep
+                due = int(timestep) - last_timestep >= self._interval_steps
+            if self._interval_seconds is not None:
+                due |= monotonic() - self._last_wall_time >= self._interval_seconds
+        return comm.bcast(due, root=0)
+
+    def write(self, timestep: int, time: float, data_dict: Dict[str, df.Function]) -> Path:
+        """Write the local dofs and dof layout of every function in `data_dict`."""
+        comm = df.MPI.comm_world
+        rank = comm.Get_rank()
+        snapshot_path = self._directory / f"snapshot_{int(timestep):012d}"
+        if rank == 0:
+            if snapshot_path.exists():
+                shutil.rmtree(snapshot_path)
+            snapshot_path.mkdir(parents=True)
+        comm.barrier()
+
+        arrays: Dict[str, np.ndarray] = {}
+        for name, data in data_dict.items():
+            vector = data.vector()
+            arrays[f"{name}/values"] = vector.get_local()
+            arrays[f"{name}/local_range"] = np.array(vector.local_range(), dtype="i8")
+        np.savez(_rank_filename(snapshot_path, rank), **arrays)
+        comm.barrier()
+
+        if rank == 0:
+            meta = {
+                "timestep": int(timestep),
+                "time": float(time),
+                "num_processes": comm.Get_size(),
+                "fields": {name: int(data.vector().size()) for name, data in data_dict.items()},
+            }
+            with (snapshot_path / SNAPSHOT_META_FILENAME).open("w") as out_handle:
+                yaml.dump(meta, out_handle, default_flow_style=False)
+            self._rotate(snapshot_path)
+        comm.barrier()
+
+        self._last_timestep = int(timestep)
+        self._last_wall_time = monotonic()
+        return snapshot_path
+
+    def _rotate(self, current_path: Path) -> None:
+        """Delete all but the newest `num_snapshots`, and incomplete snapshots."""
+        for path in self._directory.glob("snapshot_*"):
+            if path != current_path and not (path / SNAPSHOT_META_FILENAME).exists():
+                shutil.rmtree(path)
+        for path in list_snapshots(self._directory.parent)[:-self._num_snapshots]:
+            shutil.rmtree(path)
+
+
+def read_snapshot(snapshot_path: Path, data_dict: Dict[str, df.Function]) -> Tuple[int, float]:
+    """Assign the snapshot values to the functions in `data_dict`, and return timestep and time.
+
+    The snapshot must be read with the same number of processes and the same dof layout as
+    it was written with.
+    """
+    snapshot_path = Path(snapshot_path)
+    with (snapshot_path / SNAPSHOT_META_FILENAME).open("r") as in_handle:
+        meta: Dict[str, Any] = yaml.safe_load(in_handle)
+
+    comm = df.MPI.comm_world
+    if meta["num_processes"] != comm.Get_size():
+        msg = f"Snapshot {snapshot_path} was written with {meta['num_processes']} processes"
+        raise RuntimeError(f"{msg}, but is read with {comm.Get_size()}")
+
+    for name in data_dict:
+        if name not in meta["fields"]:
+            raise KeyError(f"Field {name} is not in snapshot {snapshot_path}")
+
+    with np.load(_rank_filename(snapshot_path, comm.Get_rank())) as arrays:
+        # Check every field on every process before the collective `apply`
+        mismatched = [
+            name for name, data in data_dict.items()
+            if data.vector().size() != meta["fields"][name]
+            or tuple(data.vector().local_range()) != tuple(arrays[f"{name}/local_range"])
+        ]
+        if not comm.allreduce(not mismatched, op=MPI.LAND):
+            msg = f"The dof layout differs from snapshot {snapshot_path}"
+            raise RuntimeError(f"{msg}, mismatched fields on process {comm.Get_rank()}: {mismatched}")
+
+        for name, data in data_dict.items():
+            vector = data.vector()
+            vector.set_local(arrays[f"{name}/values"])
+            vector.apply("insert")
+    return meta["timestep"], meta["time"]
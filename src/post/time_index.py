@@ -0,0 +1,188 @@
+"""A binary, append-only index of the saved timesteps.
+
+Each record holds the timestep, the time and a bit mask of the fields saved at that timestep.
+The bit of each field is given by its position in the field list in `times.yaml`.
+"""
+
+import logging
+
+import yaml
+import numpy as np
+
+from pathlib import Path
+
+from typing import (
+    Iterable,
+    List,
+    Optional,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+TIME_INDEX_DTYPE = np.dtype([("timestep", "<i8"), ("time", "<f8"), ("saved", "<u8")])
+TIME_INDEX_FILENAME = "times.bin"
+TIME_INDEX_FIELDS_FILENAME = "times.yaml"
+MAX_NUM_FIELDS = 64
+
+
+def _read_field_names(filename: Path) -> List[str]:
+    with filename.open("r") as in_handle:
+        return list(yaml.safe_load(in_handle)["fields"])
+
+
+class TimeIndexWriter:
+    """Buffer and append records to the time index.
+
+    Repeated consecutive timesteps are merged into one record.
+    """
+
+    def __init__(self, casedir: Path, buffer_size: int = 1024) -> None:
+        """Open the index for appending.
+
+        Arguments:
+            casedir: The directory of the index.
+            buffer_size: Number of records kept in memory before they are written.
+        """
+        self._casedir = Path(casedir)
+        self._buffer = np.zeros(buffer_size, dtype=TIME_INDEX_DTYPE)
+        self._num_buffered = 0
+        self._pending: Optional[np.void] = None       # The last record, kept for deduplication
+
+        fields_path = self._casedir / TIME_INDEX_FIELDS_FILENAME
+        self._field_names: List[str] = []
+        if fields_path.exists():
+            self._field_names = _read_field_names(fields_path)
+
+        self._filename = self._casedir / TIME_INDEX_FILENAME
+        self._last_written_timestep = None
+        if self._filename.exists() and self._filename.stat().st_size >= TIME_INDEX_DTYPE.itemsize:
+            last_record = np.fromfile(
+                self._filename,
+                dtype=TIME_INDEX_DTYPE,
+                offset=self._filename.stat().st_size - TIME_INDEX_DTYPE.itemsize
+            )
+            self._last_written_timestep = int(last_record["timestep"][0])
+        self._file = open(self._filename, "ab")
+
+    def add_field(self, name: str) -> None:
+        """Assign a bit in the saved mask to field `name`."""
+        if name in self._field_names:
+            return
+        if len(self._field_names) >= MAX_NUM_FIELDS:
+            raise ValueError(f"The time index supports at most {MAX_NUM_FIELDS} fields")
+        self._field_names.append(name)
+        with (self._casedir / TIME_INDEX_FIELDS_FILENAME).open("w") as out_handle:
+            yaml.dump({"fields": self._field_names}, out_handle, default_flow_style=False)
+
+    def append(self, timestep: int, time: float, saved_fields: Iterable[str]) -> None:
+        """Add a record, or merge the saved fields if `timestep` is the same as the last."""
+        saved = 0
+        for name in saved_fields:
+            saved |= 1 << self._field_names.index(name)
+
+        if self._pending is not None and self._pending["timestep"] == int(timestep):
+            self._pending["saved"] |= saved
+            return
+        if self._pending is None and self._last_written_timestep == int(timestep):
+            self._merge_last_written(saved)
+            return
+
+        if self._pending is not None:
+            self._buffer[self._num_buffered] = self._pending
+            self._num_buffered += 1
+            if self._num_buffered == self._buffer.size:
+                self.flush()
+        self._pending = np.array((timestep, time, saved), dtype=TIME_INDEX_DTYPE)[()]
+
+    def _merge_last_written(self, saved: int) -> None:
+        """Add the `saved` bits to the last record in the file, e.g. after a restart."""
+        self._file.flush()
+        with open(self._filename, "r+b") as index_file:
+            index_file.seek(-TIME_INDEX_DTYPE.itemsize, 2)
+            record = np.frombuffer(index_file.read(TIME_INDEX_DTYPE.itemsize), dtype=TIME_INDEX_DTYPE).copy()
+            record["saved"] |= np.uint64(saved)
+            index_file.seek(-TIME_INDEX_DTYPE.itemsize, 2)
+            index_file.write(record.tobytes())
+
+    def flush(self) -> None:
+        """Write the buffered records. The last record is kept back for deduplication."""
+        if self._num_buffered == 0:
+            return
+        self._file.write(self._buffer[:self._num_buffered].tobytes())
+        self._file.flush()
+        self._last_written_timestep = int(self._buffer["timestep"][self._num_buffered - 1])
+        self._num_buffered = 0
+
+    def close(self) -> None:
+        """Write all records and close the file."""
+        if self._pending is not None:
+            self._buffer[self._num_buffered] = self._pending
+            self._num_buffered += 1
+            self._pending = None
+        self.flush()
+        self._file.close()
+
+
+class TimeIndex:
+    """Memory map the time index for fast lookup of timesteps and times."""
+
+    def __init__(self, casedir: Path) -> None:
+        """Map the index. Raises `FileNotFoundError` if there is no index."""
+        casedir = Path(casedir)
+        filename = casedir / TIME_INDEX_FILENAME
+        if filename.stat().st_size == 0:
+            records = np.zeros(0, dtype=TIME_INDEX_DTYPE)
+        else:
+            records = np.memmap(filename, dtype=TIME_INDEX_DTYPE, mode="r")
+
+        # Restarted runs may append timesteps out of order. Keep the last occurrence.
+        timesteps = records["timestep"]
+        if timesteps.size > 1 and not np.all(timesteps[1:] > timesteps[:-1]):
+            _, last_indices = np.unique(timesteps[::-1], return_index=True)
+            records = np.asarray(records)[timesteps.size - 1 - last_indices]
+        self._records = records
+
+        self._field_names: List[str] = []
+        fields_path = casedir / TIME_INDEX_FIELDS_FILENAME
+        if fields_path.exists():
+            self._field_names = _read_field_names(fields_path)
+
+    def __len__(self) -> int:
+        return self._records.size
+
+    @property
+    def timesteps(self) -> np.ndarray:
+        """The sorted timesteps."""
+        return self._records["timestep"]
+
+    @property
+    def times(self) -> np.ndarray:
+        """The time of each timestep."""
+        return self._records["time"]
+
+    def has_field(self, name: str) -> bool:
+        """Return True if the index records when `name` was saved."""
+        return name in self._field_names
+
+    def saved(self, name: str) -> np.ndarray:
+        """Return a mask of the records where field `name` was saved."""
+        bit = np.uint64(1 << self._field_names.index(name))
+        return (self._records["saved"] & bit) != 0
+
+    def find_timestep(self, timestep: int) -> int:
+        """Return the record index of `timestep`. Raises `KeyError` if it is not found."""
+        index = int(np.searchsorted(self.timesteps, timestep))
+        if index == len(self) or self.timesteps[index] != timestep:
+            raise KeyError(f"Timestep {timestep} is not in the time index")
+        return index
+
+    def find_time(self, time: float) -> int:
+        """Return the record index of the timestep closest to `time`."""
+        index = int(np.searchsorted(self.times, time))
+        if index == len(self):
+            return index - 1
+        if index > 0 and time - self.times[index - 1] <= self.times[index] - time:
+            return index - 1
+        return index
@@ -5,4 +5,11 @@ They are wrappers around `dolfin.Function`.
 
 from .field import Field
 from .point_field import PointField
+from .slice_field import (
+    SliceField,
+    LineField,
+)
 from .boundary_field import BoundaryField
+from .reduction_field import ReductionField
+from .statistics_field import StatisticsField
+from .activation_time_field import ActivationTimeField
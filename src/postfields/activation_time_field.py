@@ -0,0 +1,132 @@
+"""Activation and recovery time of each dof, tracked during the run."""
+
+import logging
+
+import numpy as np
+import dolfin as df
+
+from typing import (
+    Optional,
+)
+
+from postspec import FieldSpec
+
+from postutils import store_metadata
+
+from .field_base import FieldBaseClass
+from .sub_function import SubFunctionExtractor
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ActivationTimeField(FieldBaseClass):
+    """Store the time of the first upward and the following downward threshold crossing.
+
+    The activation time of a dof is the first time its value crosses `threshold` from below,
+    and the recovery time is the first time after the activation it crosses
+    `recovery_threshold` from above. The crossing times are linearly interpolated between
+    the two timesteps around the crossing, so `stride_timestep` should be 1. Dofs that never
+    activate or recover are NaN.
+
+    The maps are written to `activation_time_{name}.hdf5` as "/activation_time" and
+    "/recovery_time" when the field is closed.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            spec: FieldSpec,
+            threshold: float = 0.0,
+            recovery_threshold: Optional[float] = None
+    ) -> None:
+        """Store name, spec and the thresholds.
+
+        Arguments:
+            name: Name of field. See `FieldBaseClass` for more info.
+            spec: Specifications related to field I/O. See `postspec.FieldSpec`.
+            threshold: The activation threshold, e.g. 0 mV for the transmembrane potential.
+            recovery_threshold: The recovery threshold. Defaults to `threshold`.
+        """
+        super().__init__(name, spec)
+        self._threshold = threshold
+        self._recovery_threshold = threshold if recovery_threshold is None else recovery_threshold
+        self._extractor: SubFunctionExtractor = None
+        self._previous_values: np.ndarray = None
+        self._previous_time: float = None
+        self.activation_time: np.ndarray = None     # Of the owned dofs
+        self.recovery_time: np.ndarray = None
+
+    def before_first_compute(self, data: df.Function) -> None:
+        """Allocate the time maps on the owned dofs of the (sub) function space."""
+        self._extractor = SubFunctionExtractor(data.function_space(), self._spec.sub_field_index)
+        local_size = self._extractor.function.vector().local_size()
+        self.activation_time = np.full(local_size, np.nan)
+        self.recovery_time = np.full(local_size, np.nan)
+
+    def compute(self, time: float, data: df.Function) -> None:
+        """Record the crossings between the previous and the current timestep."""
+        values = self._extractor.local_values(data)
+        time = float(time)
+        if self._previous_values is None:
+            self._previous_values = values
+            self._previous_time = time
+            return
+        previous = self._previous_values
+
+        not_active = np.isnan(self.activation_time)
+        activated = not_active & (previous < self._threshold) & (values >= self._threshold)
+        self.activation_time[activated] = self._crossing_time(
+            previous[activated], values[activated], self._threshold, time
+        )
+
+        not_recovered = ~not_active & np.isnan(self.recovery_time)
+        recovered = not_recovered & (previous >= self._recovery_threshold) & (values < self._recovery_threshold)
+        self.recovery_time[recovered] = self._crossing_time(
+            previous[recovered], values[recovered], self._recovery_threshold, time
+        )
+
+        self._previous_values = values
+        self._previous_time = time
+
+    def _crossing_time(
+            self,
+            previous: np.ndarray,
+            current: np.ndarray,
+            threshold: float,
+            time: float
+    ) -> np.ndarray:
+        """Linearly interpolate the time `threshold` is crossed between the two timesteps."""
+        return self._previous_time + (threshold - previous)/(current - previous)*(time - self._previous_time)
+
+    def store(self, timestep: int, time: float, data: df.Function) -> None:
+        """Update the crossing times."""
+        if self.first_compute:
+            self.first_compute = False
+            self.before_first_compute(data)
+
+            spec_dict = self.spec._asdict()
+            element = self._extractor.function.function_space().ufl_element()
+            spec_dict["element_family"] = str(element.family())  # e.g. Lagrange
+            spec_dict["element_degree"] = element.degree()
+            spec_dict["threshold"] = float(self._threshold)
+            spec_dict["recovery_threshold"] = float(self._recovery_threshold)
+
+            if df.MPI.rank(df.MPI.comm_world) == 0:
+                self._path.mkdir(parents=False, exist_ok=True)
+                store_metadata(self.path / "metadata_{name}.yaml".format(name=self.name), spec_dict)
+            df.MPI.barrier(df.MPI.comm_world)
+
+        self.compute(time, data)
+
+    def close(self) -> None:
+        """Write the activation and recovery time maps."""
+        if self._extractor is None:
+            return
+        filename = self.path / "activation_time_{name}.hdf5".format(name=self.name)
+        function = self._extractor.function
+        with df.HDF5File(df.MPI.comm_world, str(filename), "w") as time_file:
+            for name, time_map in (("activation_time", self.activation_time), ("recovery_time", self.recovery_time)):
+                function.vector().set_local(time_map)
+                function.vector().apply("insert")
+                time_file.write(function, f"/{name}")
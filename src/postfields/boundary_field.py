@@ -1,15 +1,32 @@
+import numpy as np
 import dolfin as df
+
 from .field import Field
 
 from postspec import FieldSpec
 
 from postutils import (
     store_metadata,
+    store_mesh_reference,
+)
+
+from typing import (
+    Optional,
+    Tuple,
 )
 
 
 class BoundaryField(Field):
+    """Store the restriction of a function to the exterior boundary of the mesh.
+
+    For functions in a scalar CG1 space on `mesh`, the boundary values are gathered with a
+    dof map computed on the first update. Other functions are interpolated.
+    """
+
     def __init__(self, name: str, spec: FieldSpec, mesh: df.Mesh):
+        self._mesh = mesh
+        self._restriction_map: Optional[Tuple[np.ndarray, ...]] = None
+        self._restriction_space_id: Optional[int] = None
 
         self._boundary_mesh = df.BoundaryMesh(mesh, "exterior")
         self._boundary_function_space = df.FunctionSpace(
@@ -21,15 +38,23 @@ class BoundaryField(Field):
         super().__init__(name, spec)
 
     def _save_bmesh(self):
-        mesh_path = self.path / "boundary_mesh.xdmf"
-        with df.XDMFFile(str(mesh_path)) as mesh_file:
-            mesh_file.write(self._boundary_mesh)
+        """Store the boundary mesh in the mesh store, or as xdmf if there is no store.
 
-    def update(self, timestep: int, time: float, data: df.Function) -> None:
-        """Update the data."""
-        if not self.save_this_timestep(timestep, time):
+        Boundary fields on the same mesh share the stored boundary mesh.
+        """
+        if self.mesh_store is None:
+            mesh_path = self.path / "boundary_mesh.xdmf"
+            with df.XDMFFile(str(mesh_path)) as mesh_file:
+                mesh_file.write(self._boundary_mesh)
             return
 
+        mesh_hash = self.mesh_store.store(self._boundary_mesh)
+        if df.MPI.rank(df.MPI.comm_world) == 0:
+            store_mesh_reference(self.path, self.mesh_store.reference(mesh_hash, self.path))
+        df.MPI.barrier(df.MPI.comm_world)
+
+    def store(self, timestep: int, time: float, data: df.Function) -> None:
+        """Restrict the data to the boundary and write it."""
         if self._first_compute:
             self._first_compute = False
             if df.MPI.rank(df.MPI.comm_world) == 0:
@@ -41,18 +66,75 @@ class BoundaryField(Field):
             element = data.function_space().ufl_element()
             spec_dict["element_family"] = str(element.family())  # e.g. Lagrange
             spec_dict["element_degree"] = element.degree()
+            spec_dict["first_save_time"] = float(time)
 
             self._save_bmesh()
             store_metadata(self.path / "metadata_{name}.yaml".format(name=self.name), spec_dict)
 
-        df.LagrangeInterpolator.interpolate(self._data, data)
-        # _data = df.interpolate(data, self._boundary_function_space)
+        self.restrict(data)
 
         if "hdf5" in self.spec.save_as:
             self._store_field_hdf5(timestep, time, self._data)
 
+        if "hdf5_series" in self.spec.save_as:
+            self._store_field_hdf5_series(timestep, time, self._data)
+
         if "xdmf" in self.spec.save_as:
             self._store_field_xdmf(timestep, time, self._data)
 
         if "checkpoint" in self.spec.save_as:
             self._checkpoint(timestep, time, self._data)
+
+    def restrict(self, data: df.Function) -> df.Function:
+        """Return the restriction of `data` to the boundary mesh."""
+        function_space = data.function_space()
+        if self._restriction_space_id != function_space.id():
+            self._restriction_map = self._compute_restriction_map(function_space)
+            self._restriction_space_id = function_space.id()
+
+        if self._restriction_map is None:
+            df.LagrangeInterpolator.interpolate(self._data, data)
+            return self._data
+
+        owned_positions, owned_dofs, ghost_positions, ghost_global_dofs = self._restriction_map
+        vector = data.vector()
+        boundary_values = np.empty(self._data.vector().local_size())
+        boundary_values[owned_positions] = vector.get_local()[owned_dofs]
+        if df.MPI.size(df.MPI.comm_world) > 1:
+            boundary_values[ghost_positions] = vector.gather(ghost_global_dofs)     # Collective
+        self._data.vector().set_local(boundary_values)
+        self._data.vector().apply("insert")
+        return self._data
+
+    def _compute_restriction_map(self, function_space: df.FunctionSpace) -> Optional[Tuple[np.ndarray, ...]]:
+        """Map the owned boundary dofs to the dofs of `function_space`.
+
+        Returns the positions in the boundary vector and local dofs of the parent dofs owned
+        by this process, and the positions and global dofs of the ghosted parent dofs. Returns
+        None if `function_space` is not a scalar CG1 space on the parent mesh.
+        """
+        element = function_space.ufl_element()
+        if (
+                function_space.mesh().id() != self._mesh.id() or
+                element.family() != "Lagrange" or
+                element.degree() != 1 or
+                element.value_shape() != ()
+        ):
+            return None
+
+        boundary_space = self._boundary_function_space
+        num_owned_boundary_dofs = self._data.vector().local_size()
+        boundary_vertices = df.dof_to_vertex_map(boundary_space)[:num_owned_boundary_dofs]
+        parent_vertices = self._boundary_mesh.entity_map(0).array()[boundary_vertices]
+        parent_dofs = df.vertex_to_dof_map(function_space)[parent_vertices]
+
+        dofmap = function_space.dofmap()
+        num_owned_dofs = dofmap.ownership_range()[1] - dofmap.ownership_range()[0]
+        is_owned = parent_dofs < num_owned_dofs
+        ghost_global_dofs = dofmap.tabulate_local_to_global_dofs()[parent_dofs[~is_owned]]
+        return (
+            np.flatnonzero(is_owned),
+            parent_dofs[is_owned],
+            np.flatnonzero(~is_owned),
+            ghost_global_dofs.astype(np.intc),
+        )
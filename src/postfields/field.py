@@ -3,20 +3,33 @@
 import logging
 import dolfin
 
+import numpy as np
+
 from postspec import FieldSpec
 
 from postutils import (
     store_metadata,
     get_part_number,
+    get_part_filenames,
+    coarse_box_mesh,
 )
 
 from pathlib import Path
 
 from typing import (
+    Any,
+    Callable,
     List,
     Iterable,
+    Optional,
 )
 from .field_base import FieldBaseClass
+from .hdf5_series import (
+    HDF5SeriesWriter,
+    write_virtual_series,
+)
+from .storage_policy import StoragePolicy
+from .probe_engine import ProbeEngine
 
 import dolfin as df
 
@@ -78,14 +91,54 @@ class _HDF5Link:
 hdf5_link = _HDF5Link()
 
 
+def _cells_inside(mesh: dolfin.Mesh, function_space: dolfin.FunctionSpace) -> dolfin.Mesh:
+    """Return the submesh of the cells of `mesh` inside the domain of `function_space`.
+
+    A cell is inside if its vertices and its midpoint are, which also drops the cells spanning
+    a reentrant corner.
+
+    Arguments:
+        mesh: A serial mesh, identical on all processes.
+        function_space: A function space on the distributed mesh.
+    """
+    midpoints = mesh.coordinates()[mesh.cells()].mean(axis=1)
+    points = np.concatenate((mesh.coordinates(), midpoints))
+    lost = np.zeros(points.shape[0], dtype=bool)
+    lost[ProbeEngine(function_space, points).lost_probes] = True      # Collective
+
+    inside = ~lost[mesh.cells()].any(axis=1) & ~lost[mesh.num_vertices():]
+    if not inside.any():
+        raise ValueError("No cell of the preview mesh is inside the domain. Increase preview_resolution.")
+    cell_function = dolfin.MeshFunction("size_t", mesh, mesh.topology().dim(), 0)
+    cell_function.set_values(inside.astype(np.uintp))
+    return dolfin.SubMesh(mesh, cell_function, 1)
+
+
 class Field(FieldBaseClass):
     """Store a time series of `dolfin.Function` as xdmf and or hdf5."""
 
-    def update(self, timestep: int, time: float, data: dolfin.Function) -> None:
-        """Update the data."""
-        if not self.save_this_timestep(timestep, time):
-            return
+    def __init__(self, name: str, spec: FieldSpec, preview_mesh: dolfin.Mesh = None) -> None:
+        """Store name and spec.
 
+        Arguments:
+            name: Name of the field.
+            spec: Specifications for the field.
+            preview_mesh: A coarse serial mesh (on `MPI.comm_self`, identical on all processes)
+                on which rank 0 writes a preview. If None and `spec.preview_resolution` is set,
+                a box mesh over the bounding box of the mesh is generated, and only its cells
+                inside the domain are kept.
+        """
+        super().__init__(name, spec)
+        if spec.keyframe_interval is not None and spec.quantisation_error is None:
+            raise ValueError(f"keyframe_interval of {name} requires quantisation_error")
+        self._preview_mesh = preview_mesh
+        self._preview_engine: ProbeEngine = None
+        self._preview_function: dolfin.Function = None      # Only on rank 0
+        self._preview_dofs: np.ndarray = None               # Vertex to dof map of the preview
+        self._preview_file: dolfin.XDMFFile = None          # Only on rank 0
+
+    def store(self, timestep: int, time: float, data: dolfin.Function) -> None:
+        """Write the data to all backends in `save_as`."""
         if self._first_compute:
             self._first_compute = False
             if df.MPI.rank(df.MPI.comm_world) == 0:
@@ -97,18 +150,61 @@ class Field(FieldBaseClass):
             element = data.function_space().ufl_element()
             spec_dict["element_family"] = str(element.family())  # e.g. Lagrange
             spec_dict["element_degree"] = element.degree()
+            spec_dict["first_save_time"] = float(time)
 
             store_metadata(self.path / "metadata_{name}.yaml".format(name=self.name), spec_dict)
 
+            policy = StoragePolicy.from_spec(self.spec)
+            default_policy = policy.is_lossless and policy.compression is None
+            if not default_policy and "hdf5_series" not in self.spec.save_as:
+                LOGGER.warning(f"The storage policy of {self.name} only applies to 'hdf5_series'")
+
         if "hdf5" in self.spec.save_as:
             self._store_field_hdf5(timestep, time, data)
 
+        if "hdf5_series" in self.spec.save_as:
+            self._store_field_hdf5_series(timestep, time, data)
+
         if "xdmf" in self.spec.save_as:
             self._store_field_xdmf(timestep, time, data)
 
         if "checkpoint" in self.spec.save_as:
             self._checkpoint(timestep, time, data)
 
+        if self._preview_mesh is not None or self.spec.preview_resolution is not None:
+            self._store_preview(timestep, time, data)
+
+    def _cached_datafile(
+            self,
+            key: str,
+            timestep: int,
+            open_datafile: Callable[[str], Any]
+    ) -> Any:
+        """Return the open datafile of backend `key` for the part containing `timestep`.
+
+        When `timestep` moves into the next part, the current datafile is closed and
+        `open_datafile` is called with the new part annotation.
+        """
+        part_annotation = get_part_number(int(timestep), self._spec.num_steps_in_part)
+        if key in self._datafile_cache:
+            if self._datafile_parts[key] == part_annotation:
+                return self._datafile_cache[key]
+            self._close_datafile(key)
+
+        datafile = open_datafile(part_annotation)
+        self._datafile_cache[key] = datafile
+        self._datafile_parts[key] = part_annotation
+        return datafile
+
+    def _close_datafile(self, key: str) -> None:
+        """Close and forget the datafile of backend `key`."""
+        self._datafile_cache.pop(key).close()
+        self._datafile_parts.pop(key)
+        if key == "hdf5_series" and self._spec.num_steps_in_part is not None and self.shared_file is None:
+            if df.MPI.rank(df.MPI.comm_world) == 0:
+                part_filenames = get_part_filenames(self.path, f"{self.name}_series", ".hdf5")
+                write_virtual_series(self.path / f"{self.name}_series.hdf5", self.name, part_filenames)
+
     def _store_field_hdf5(
             self,
             timestep: int,
@@ -116,15 +212,72 @@ class Field(FieldBaseClass):
             data: dolfin.Function
     ) -> None:
         """Save as hdf5."""
-        _key = "hdf5"
-        filename = self.path / f"{self.name}.hdf5"
-        if filename.exists():
-            fieldfile = dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), "a")
-        else:
-            fieldfile = dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), "w")
+        def open_datafile(part_annotation: str) -> dolfin.HDF5File:
+            filename = self.path / f"{self.name}{part_annotation}.hdf5"
+            mode = "a" if filename.exists() else "w"
+            return dolfin.HDF5File(dolfin.MPI.comm_world, str(filename), mode)
 
+        fieldfile = self._cached_datafile("hdf5", timestep, open_datafile)
         fieldfile.write(data, self.name, time)
-        fieldfile.close()
+
+    def _store_field_hdf5_series(
+            self,
+            timestep: int,
+            time: float,
+            data: dolfin.Function
+    ) -> None:
+        """Append the local dofs to a single extendable hdf5 dataset.
+
+        The file is kept open until `close` is called or the next part is started. With parts,
+        `{name}_series.hdf5` is a virtual dataset joining the completed parts. If the saver
+        uses a single file, the field is a group in the shared file and is not split in parts.
+        """
+        vector = data.vector()
+
+        def open_datafile(part_annotation: str) -> HDF5SeriesWriter:
+            filename = self.shared_file
+            if filename is None:
+                filename = self.path / f"{self.name}_series{part_annotation}.hdf5"
+            writer = HDF5SeriesWriter(
+                filename,
+                self.name,
+                vector.size(),
+                vector.local_range(),
+                comm=dolfin.MPI.comm_world,
+                policy=StoragePolicy.from_spec(self.spec),
+                keyframe_interval=self.spec.keyframe_interval,
+            )
+            local_dof_to_vertex = self._local_dof_to_vertex(data)
+            if local_dof_to_vertex is not None:
+                writer.write_dof_to_vertex(local_dof_to_vertex)
+            return writer
+
+        if self.shared_file is None:
+            writer = self._cached_datafile("hdf5_series", timestep, open_datafile)
+        elif "hdf5_series" in self._datafile_cache:
+            writer = self._datafile_cache["hdf5_series"]
+        else:
+            writer = open_datafile("")
+            self._datafile_cache["hdf5_series"] = writer
+            self._datafile_parts["hdf5_series"] = ""
+        writer.write(timestep, time, vector.get_local())
+
+    def _local_dof_to_vertex(self, data: dolfin.Function) -> Optional[np.ndarray]:
+        """Return the vertex of each owned dof, or None if `data` is not in a CG1 space.
+
+        The vertices are global indices times the block size plus the component, as in
+        `dolfin.dof_to_vertex_map`.
+        """
+        function_space = data.function_space()
+        element = function_space.ufl_element()
+        if element.family() != "Lagrange" or element.degree() != 1:
+            return None
+        block_size = function_space.dofmap().block_size()
+        local_size = data.vector().local_size()
+        local_dof_to_vertex = dolfin.dof_to_vertex_map(function_space)[:local_size]
+        global_vertices = function_space.mesh().topology().global_indices(0)
+        local_vertices, components = np.divmod(local_dof_to_vertex, block_size)
+        return global_vertices[local_vertices]*block_size + components
 
     def _store_field_xdmf(
             self,
@@ -136,19 +289,16 @@ class Field(FieldBaseClass):
             share_mesh: bool = True
     ) -> None:
         """Save the function as xdmf per timemstep."""
-        key = "xdmf"        # Key to access datafile cache
-        if key in self._datafile_cache:
-            fieldfile = self._datafile_cache[key]
-        else:
-            part_annotation = get_part_number(timestep, self._spec.num_steps_in_part)
+        def open_datafile(part_annotation: str) -> dolfin.XDMFFile:
             filename = self.path / f"{self.name}{part_annotation}.xdmf"
             fieldfile = dolfin.XDMFFile(dolfin.MPI.comm_world, str(filename))
             fieldfile.parameters["rewrite_function_mesh"] = rewrite_mesh
             fieldfile.parameters["functions_share_mesh"] = share_mesh
             fieldfile.parameters["flush_output"] = flush_output
+            return fieldfile
 
+        fieldfile = self._cached_datafile("xdmf", timestep, open_datafile)
         fieldfile.write(data, float(time))
-        self._datafile_cache[key] = fieldfile
 
     def _checkpoint(
             self,
@@ -159,25 +309,75 @@ class Field(FieldBaseClass):
             rewrite_mesh: bool = False,
             share_mesh: bool = True,
     ) -> None:
-        key = "checkpoint"
-        if key in self._datafile_cache:
-            fieldfile = self._datafile_cache[key]
-        else:
-            part_annotation = get_part_number(timestep, self._spec.num_steps_in_part)
-            # filename = self.path / f"{self.name}_chk{part_annotation}.xdmf"
-            filename = self.path / f"{self.name}_chk.xdmf"
+        def open_datafile(part_annotation: str) -> dolfin.XDMFFile:
+            filename = self.path / f"{self.name}_chk{part_annotation}.xdmf"
             fieldfile = dolfin.XDMFFile(dolfin.MPI.comm_world, str(filename))
             # fieldfile.parameters["rewrite_function_mesh"] = rewrite_mesh
             # fieldfile.parameters["functions_share_mesh"] = share_mesh
             # fieldfile.parameters["flush_output"] = flush_output
+            return fieldfile
 
+        fieldfile = self._cached_datafile("checkpoint", timestep, open_datafile)
         fieldfile.write_checkpoint(data, self.name, int(timestep), append=True)
-        self._datafile_cache[key] = fieldfile
+
+    def _store_preview(
+            self,
+            timestep: int,
+            time: float,
+            data: dolfin.Function
+    ) -> None:
+        """Interpolate to the preview mesh and write `{name}_preview.xdmf` on rank 0.
+
+        The interpolation is a sparse mat-vec with a matrix computed on the first call.
+        """
+        if self._preview_engine is None:
+            self._setup_preview(data)
+
+        values = self._preview_engine.evaluate(data.vector())       # Collective
+        if values is None:
+            return
+        self._preview_function.vector().set_local(values.ravel()[self._preview_dofs])
+        self._preview_function.vector().apply("insert")
+        self._preview_file.write(self._preview_function, float(time))
+
+    def _setup_preview(self, data: dolfin.Function) -> None:
+        """Create the preview mesh, function and probe engine."""
+        if self._preview_mesh is None:
+            box_mesh = coarse_box_mesh(data.function_space().mesh(), self.spec.preview_resolution)
+            self._preview_mesh = _cells_inside(box_mesh, data.function_space())
+
+        self._preview_engine = ProbeEngine(
+            data.function_space(),
+            self._preview_mesh.coordinates(),
+            self.spec.sub_field_index
+        )
+        if dolfin.MPI.rank(dolfin.MPI.comm_world) != 0:
+            return
+
+        value_size = self._preview_engine.value_size
+        if value_size == 1:
+            preview_space = dolfin.FunctionSpace(self._preview_mesh, "CG", 1)
+        else:
+            preview_space = dolfin.VectorFunctionSpace(self._preview_mesh, "CG", 1, dim=value_size)
+        self._preview_function = dolfin.Function(preview_space)
+        self._preview_function.rename(self.name, self.name)
+
+        # The engine returns the values vertex by vertex, component by component
+        self._preview_dofs = np.argsort(dolfin.vertex_to_dof_map(preview_space))
+
+        filename = self.path / f"{self.name}_preview.xdmf"
+        self._preview_file = dolfin.XDMFFile(dolfin.MPI.comm_self, str(filename))
+        self._preview_file.parameters["rewrite_function_mesh"] = False
+        self._preview_file.parameters["functions_share_mesh"] = True
+        self._preview_file.parameters["flush_output"] = True
 
     def load(self):
         return
 
     def close(self) -> None:
         """Finalise all computations and close file readers/writers."""
-        for _, datafile in self._datafile_cache.items():
-            datafile.close()
+        for key in list(self._datafile_cache):
+            self._close_datafile(key)
+        if self._preview_file is not None:
+            self._preview_file.close()
+            self._preview_file = None
@@ -2,21 +2,32 @@
 
 from pathlib import Path
 
+import abc
+import math
+import h5py
 import logging
 import dolfin
 
 from postspec import FieldSpec
+from postutils import MeshStore
 
 from typing import (
     Dict,
     Any,
+    Optional,
+    Iterator,
+    Tuple,
 )
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-class FieldBaseClass:
+SAVE_THRESHOLD_NORMS = ("max_abs", "relative_l2")
+SAVE_INTERVAL_TOLERANCE = 1e-9      # Relative to `save_interval`
+
+
+class FieldBaseClass(abc.ABC):
     """A wrapper around dolfin Functions used for the `PostProcessor`."""
 
     def  __init__(self, name: str, spec: FieldSpec) -> None:
@@ -34,13 +45,150 @@ class FieldBaseClass:
         self._path: Path = ""       # Is this a sensible default?
         self._first_compute: bool = True
         self._datafile_cache: Dict[str, Any] = {}
-
-    def save_this_timestep(self, timestep: int, time: float) -> bool:
+        self._datafile_parts: Dict[str, str] = {}       # The part annotation of each datafile
+        self.mesh_store: Optional[MeshStore] = None     # Set by `Saver.add_field`
+        self.shared_file: Optional[h5py.File] = None    # Set by `Saver.add_field` if `single_file`
+
+        if spec.save_threshold_norm not in SAVE_THRESHOLD_NORMS:
+            msg = f"save_threshold_norm must be one of {SAVE_THRESHOLD_NORMS}"
+            raise ValueError(f"{msg}, got {spec.save_threshold_norm}")
+        self._last_saved_timestep: Optional[int] = None
+        self._last_saved_vector: dolfin.GenericVector = None    # Only kept for `save_threshold`
+        self._work_vector: dolfin.GenericVector = None
+
+        self._next_save_index: Optional[int] = None     # The next point on the `save_interval` grid
+        self._previous_time: Optional[float] = None     # Only kept for `interpolate_to_interval`
+        self._previous_vector: dolfin.GenericVector = None
+        self._interpolated_data: dolfin.Function = None
+
+    def save_this_timestep(self, timestep: int, time: float, data: dolfin.Function = None) -> bool:
+        """Return True if the field should be saved.
+
+        If `spec.save_interval` is set, the field is saved at the first timestep at or after
+        each point on the grid of multiples of `save_interval`, and `stride_timestep` is ignored.
+
+        If `spec.save_threshold` is set and `data` is given, the field is only saved if it has
+        changed by more than the threshold since it was last saved, or if `spec.max_save_gap`
+        timesteps have passed.
+        """
         if timestep < self.spec.start_timestep:
             return False
-        if int(timestep) % int(self.spec.stride_timestep) == 0:
+        if self.spec.save_interval is not None:
+            if self._next_save_index is not None and float(time) < self._next_save_time():
+                return False
+        elif int(timestep) % int(self.spec.stride_timestep) != 0:
+            return False
+        if self.spec.save_threshold is None or data is None or self._last_saved_vector is None:
+            return True
+
+        max_save_gap = self.spec.max_save_gap
+        if max_save_gap is not None and int(timestep) - self._last_saved_timestep >= max_save_gap:
             return True
-        return False
+        return self._change_norm(data) > self.spec.save_threshold
+
+    def _change_norm(self, data: dolfin.Function) -> float:
+        """Return the norm of the change in `data` since it was last saved."""
+        if self._work_vector is None:
+            self._work_vector = data.vector().copy()
+        else:
+            self._work_vector.zero()
+            self._work_vector.axpy(1.0, data.vector())
+        self._work_vector.axpy(-1.0, self._last_saved_vector)
+
+        if self.spec.save_threshold_norm == "max_abs":
+            return self._work_vector.norm("linf")
+
+        reference_norm = self._last_saved_vector.norm("l2")
+        if reference_norm == 0:
+            return float("inf")
+        return self._work_vector.norm("l2")/reference_norm
+
+    def mark_saved(self, timestep: int, time: float, data: dolfin.Function) -> None:
+        """Record that `data` is saved at `timestep`. Called on each save before `store`."""
+        self._last_saved_timestep = int(timestep)
+        if self.spec.save_interval is not None:
+            grid_index = float(time)/self.spec.save_interval + SAVE_INTERVAL_TOLERANCE
+            self._next_save_index = math.floor(grid_index) + 1
+        if self.spec.save_threshold is None:
+            return
+        if self._last_saved_vector is None:
+            self._last_saved_vector = data.vector().copy()
+        else:
+            self._last_saved_vector.zero()
+            self._last_saved_vector.axpy(1.0, data.vector())
+
+    def _next_save_time(self) -> float:
+        """Return the next point on the `save_interval` grid, less the tolerance."""
+        return (self._next_save_index - SAVE_INTERVAL_TOLERANCE)*self.spec.save_interval
+
+    def frames_to_store(
+            self,
+            timestep: int,
+            time: float,
+            data: dolfin.Function
+    ) -> Iterator[Tuple[float, dolfin.Function]]:
+        """Yield the (time, data) to store at `timestep`, and mark them as saved.
+
+        This is `(time, data)` on save timesteps. With `interpolate_to_interval`, it is the
+        linear interpolation between the previous and current timestep to each grid point in
+        between, and `save_threshold` is not used. The yielded function is reused, so each frame
+        must be stored before the next is requested, and the iterator must be exhausted.
+        """
+        if self.spec.save_interval is not None and self.spec.interpolate_to_interval:
+            yield from self._interpolated_frames(timestep, time, data)
+        elif self.save_this_timestep(timestep, time, data):
+            self.mark_saved(timestep, time, data)
+            yield time, data
+
+    def _interpolated_frames(
+            self,
+            timestep: int,
+            time: float,
+            data: dolfin.Function
+    ) -> Iterator[Tuple[float, dolfin.Function]]:
+        """Yield the interpolated frames on the `save_interval` grid up to `time`."""
+        time = float(time)
+        save_interval = self.spec.save_interval
+
+        if timestep >= self.spec.start_timestep:
+            if self._next_save_index is None:
+                self._next_save_index = math.ceil(time/save_interval - SAVE_INTERVAL_TOLERANCE)
+
+            while time >= self._next_save_time():
+                frame_time = self._next_save_index*save_interval
+                on_grid = abs(time - frame_time) <= SAVE_INTERVAL_TOLERANCE*save_interval
+                if self._previous_vector is None or on_grid:
+                    frame_data = data
+                else:
+                    if self._interpolated_data is None:
+                        self._interpolated_data = data.copy(deepcopy=True)
+                    weight = (frame_time - self._previous_time)/(time - self._previous_time)
+                    interpolated_vector = self._interpolated_data.vector()
+                    interpolated_vector.zero()
+                    interpolated_vector.axpy(1 - weight, self._previous_vector)
+                    interpolated_vector.axpy(weight, data.vector())
+                    frame_data = self._interpolated_data
+                self.mark_saved(timestep, frame_time, frame_data)
+                yield frame_time, frame_data
+
+        self._previous_time = time
+        if self._previous_vector is None:
+            self._previous_vector = data.vector().copy()
+        else:
+            self._previous_vector.zero()
+            self._previous_vector.axpy(1.0, data.vector())
+
+    def update(self, timestep: int, time: float, data: dolfin.Function) -> bool:
+        """Store `data` if `timestep` is a save timestep. Return True if `data` was stored."""
+        saved = False
+        for frame_time, frame_data in self.frames_to_store(timestep, time, data):
+            self.store(timestep, frame_time, frame_data)
+            saved = True
+        return saved
+
+    @abc.abstractmethod
+    def store(self, timestep: int, time: float, data: dolfin.Function) -> None:
+        """Write `data` unconditionally. Implemented by the specific fields."""
 
     @property
     def name(self) -> str:
@@ -0,0 +1,391 @@
+"""Store a time series of dof vectors in a single extendable hdf5 dataset.
+
+The file holds one group per field with the datasets
+
+    values:     (timesteps, global dofs), chunked one timestep by the local dofs.
+    timestep:   (timesteps,)
+    time:       (timesteps,)
+    keyframe:   (timesteps,), only with delta encoding.
+    dof_to_vertex:  (global dofs,), only for CG1 spaces. The global vertex index of each dof,
+                times the block size plus the component.
+
+The values are stored according to a `StoragePolicy`, whose parameters are attributes of
+`values`. With delta encoding, every `keyframe_interval`th row holds the full vector and the
+rows in between the difference from the previous reconstructed vector. The groups of several
+fields can share one file. This module only depends on h5py and numpy, so the files can be
+read without dolfin.
+"""
+
+import logging
+
+import h5py
+
+import numpy as np
+
+from pathlib import Path
+
+from typing import (
+    Any,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .storage_policy import StoragePolicy
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+SHARED_SERIES_FILENAME = "fields.hdf5"      # The file shared by all fields with `single_file`
+PER_DOF_DATASETS = ("dof_to_vertex",)        # Datasets without a timestep axis
+
+
+class HDF5SeriesWriter:
+    """Keep an hdf5 file open and append one row per saved timestep.
+
+    Each process writes the ownership range of the vector. In parallel the file is opened
+    with the mpio driver, which requires h5py built with MPI support.
+    """
+
+    def __init__(
+            self,
+            filename: Union[Path, h5py.Group],
+            name: str,
+            global_size: int,
+            local_range: Tuple[int, int],
+            comm: Any = None,
+            growth_steps: int = 64,
+            policy: StoragePolicy = None,
+            keyframe_interval: int = None,
+    ) -> None:
+        """Create the file and the extendable datasets.
+
+        If `filename` is an open group which already holds `name`, the rows are appended to
+        the existing datasets, and the first new row is a keyframe. Stored rows from the first
+        new timestep on are overwritten, e.g. when restarting from an earlier snapshot.
+
+        Arguments:
+            filename: Name of the hdf5 file, or an open group in which to create the field
+                group. An open file is not closed by `close`.
+            name: Name of the group holding the datasets.
+            global_size: Total number of dofs.
+            local_range: The dofs owned by this process.
+            comm: An mpi4py communicator. Defaults to serial.
+            growth_steps: The number of rows to allocate each time `values` is full.
+            policy: Precision and compression of the stored values. Defaults to float64.
+            keyframe_interval: Store the full vector every `keyframe_interval` rows and the
+                differences in between. Defaults to no delta encoding. Requires a policy with
+                `quantisation_error`, so that the deltas are packed into fewer bits.
+        """
+        if policy is None:
+            policy = StoragePolicy()
+        if keyframe_interval is not None and policy.quantisation_error is None:
+            # Float deltas are as wide as the rows, and adding them back is not bitwise exact
+            raise ValueError("keyframe_interval requires a policy with quantisation_error")
+        self._policy = policy
+        self._keyframe_interval = keyframe_interval
+        self._reconstructed: np.ndarray = None     # The vector as read back by the reader
+        self._name = name
+        self._local_range = tuple(map(int, local_range))
+        self._growth_steps = growth_steps
+        self._num_steps = 0
+
+        self._rank = 0
+        max_local_size = self._local_range[1] - self._local_range[0]
+        if comm is not None and comm.size > 1:
+            from mpi4py import MPI
+            self._rank = comm.rank
+            max_local_size = comm.allreduce(max_local_size, op=MPI.MAX)
+
+        self._owns_file = not isinstance(filename, h5py.Group)
+        if not self._owns_file:
+            self._file = filename.file
+            parent = filename
+        elif comm is not None and comm.size > 1:
+            self._file = h5py.File(str(filename), "w", driver="mpio", comm=comm)
+            parent = self._file
+        else:
+            self._file = h5py.File(str(filename), "w")
+            parent = self._file
+
+        self._force_keyframe = False
+        self._resuming = False
+        if name in parent:
+            self._open_existing(parent[name], global_size, policy, keyframe_interval)
+            return
+
+        # One timestep per chunk, so that a write never has to read back a partial chunk
+        chunk_shape = (1, max(1, min(max_local_size, global_size)))
+        group = parent.create_group(name)
+        self._values = group.create_dataset(
+            "values",
+            shape=(growth_steps, global_size),
+            maxshape=(None, global_size),
+            chunks=chunk_shape,
+            **policy.dataset_kwargs()
+        )
+        self._values.attrs.update(policy.attributes())
+        self._timesteps = group.create_dataset(
+            "timestep", shape=(0,), maxshape=(None,), chunks=(1024,), dtype="i8"
+        )
+        self._times = group.create_dataset(
+            "time", shape=(0,), maxshape=(None,), chunks=(1024,), dtype="f8"
+        )
+        self._keyframes = None
+        if keyframe_interval is not None:
+            self._values.attrs["keyframe_interval"] = keyframe_interval
+            self._keyframes = group.create_dataset(
+                "keyframe", shape=(0,), maxshape=(None,), chunks=(1024,), dtype="u1"
+            )
+
+    def _open_existing(
+            self,
+            group: h5py.Group,
+            global_size: int,
+            policy: StoragePolicy,
+            keyframe_interval: int = None
+    ) -> None:
+        """Append to the datasets of an existing group, e.g. in a shared file after a restart."""
+        self._values = group["values"]
+        if self._values.shape[1] != global_size:
+            msg = f"Series {self._name} has {self._values.shape[1]} dofs"
+            raise ValueError(f"{msg}, but {global_size} are written")
+        stored_policy = StoragePolicy.from_attributes(self._values.attrs)
+        if (stored_policy.storage_dtype, stored_policy.quantisation_error) != (
+                policy.storage_dtype, policy.quantisation_error):
+            raise ValueError(f"The storage policy of series {self._name} differs from the stored one")
+        if ("keyframe" in group) != (keyframe_interval is not None):
+            raise ValueError(f"The delta encoding of series {self._name} differs from the stored one")
+
+        self._timesteps = group["timestep"]
+        self._times = group["time"]
+        self._keyframes = group.get("keyframe", None)
+        self._num_steps = self._timesteps.shape[0]
+        self._force_keyframe = True     # The previous reconstructed vector is not known
+        self._resuming = True           # Truncated at the first write
+
+    @property
+    def num_steps(self) -> int:
+        """The number of stored timesteps."""
+        return self._num_steps
+
+    def write_dof_to_vertex(self, local_dof_to_vertex: np.ndarray) -> None:
+        """Store the vertex of each owned dof, so that the values can be read without dolfin.
+
+        Every process must call this, as creating the dataset is collective in parallel.
+        """
+        group = self._values.parent
+        dof_to_vertex = group.require_dataset("dof_to_vertex", shape=self._values.shape[1:], dtype="i8")
+        dof_to_vertex[self._local_range[0]:self._local_range[1]] = local_dof_to_vertex
+
+    def write(self, timestep: int, time: float, local_values: np.ndarray) -> None:
+        """Append the locally owned values for a new timestep."""
+        if self._resuming:
+            # Drop the rows from `timestep` on, so that the timesteps stay sorted and unique
+            self._resuming = False
+            self._num_steps = int(np.searchsorted(self._timesteps[:self._num_steps], int(timestep)))
+        row = self._num_steps
+        if row >= self._values.shape[0]:
+            self._values.resize(row + self._growth_steps, axis=0)
+        is_keyframe = self._keyframe_interval is None or self._force_keyframe or row % self._keyframe_interval == 0
+        self._force_keyframe = False
+        if is_keyframe:
+            stored_values = self._policy.encode(local_values)
+        else:
+            stored_values = self._policy.encode(local_values - self._reconstructed)
+        self._values[row, self._local_range[0]:self._local_range[1]] = stored_values
+
+        # Track the vector exactly as the reader reconstructs it, so errors do not accumulate
+        if self._keyframe_interval is not None:
+            if is_keyframe:
+                self._reconstructed = np.array(self._policy.decode(stored_values))
+            else:
+                self._reconstructed = self._reconstructed + self._policy.decode(stored_values)
+
+        self._timesteps.resize(row + 1, axis=0)
+        self._times.resize(row + 1, axis=0)
+        if self._keyframes is not None:
+            self._keyframes.resize(row + 1, axis=0)
+        if self._rank == 0:
+            self._timesteps[row] = int(timestep)
+            self._times[row] = float(time)
+            if self._keyframes is not None:
+                self._keyframes[row] = is_keyframe
+        self._num_steps += 1
+
+    def flush(self) -> None:
+        """Flush buffers to disk."""
+        self._file.flush()
+
+    def close(self) -> None:
+        """Trim the over-allocated rows and close the file, unless it is shared."""
+        if not self._file:
+            return
+        self._values.resize(self._num_steps, axis=0)
+        if self._owns_file:
+            self._file.close()
+
+
+class HDF5SeriesReader:
+    """Read the time series written by `HDF5SeriesWriter`, optionally stitching several parts."""
+
+    def __init__(self, filenames: Union[Path, Sequence[Path], h5py.File], name: str) -> None:
+        """Open the file, or the parts in order, for reading.
+
+        An open file is used as is, and is not closed by `close`.
+        """
+        if isinstance(filenames, (str, Path, h5py.File)):
+            filenames = [filenames]
+
+        self._files = []
+        self._values = []
+        self._policies = []
+        self.dof_to_vertex: np.ndarray = None      # Only for CG1 spaces
+        timesteps = []
+        times = []
+        keyframe_indices = []
+        delta_encoded = False
+        num_rows = 0
+        for filename in filenames:
+            if isinstance(filename, h5py.File):
+                group = filename[name]
+            else:
+                h5file = h5py.File(str(filename), "r")
+                group = h5file[name]
+                self._files.append(h5file)
+            self._values.append(group["values"])
+            self._policies.append(StoragePolicy.from_attributes(group["values"].attrs))
+            timesteps.append(group["timestep"][()])
+            times.append(group["time"][()])
+            if self.dof_to_vertex is None and "dof_to_vertex" in group:
+                self.dof_to_vertex = group["dof_to_vertex"][()]
+
+            if "keyframe" in group:
+                delta_encoded = True
+                keyframe_indices.append(num_rows + np.flatnonzero(group["keyframe"][()]))
+            else:
+                keyframe_indices.append(num_rows + np.arange(timesteps[-1].size))
+            num_rows += timesteps[-1].size
+
+        self.timesteps = np.concatenate(timesteps)
+        self.times = np.concatenate(times)
+        self._part_offsets = np.cumsum([0] + [part.size for part in timesteps[:-1]])
+
+        self._keyframe_indices = None
+        if delta_encoded:
+            self._keyframe_indices = np.concatenate(keyframe_indices)
+        self._cache_key: Tuple[int, Tuple[int, int]] = None     # Last reconstructed row
+        self._cache_values: np.ndarray = None
+
+    def __len__(self) -> int:
+        """Return the number of stored timesteps."""
+        return self.timesteps.size
+
+    @property
+    def global_size(self) -> int:
+        """The number of dofs in each timestep."""
+        return self._values[0].shape[1]
+
+    def read(self, index: int, local_range: Tuple[int, int] = None) -> np.ndarray:
+        """Return the values of the `index`th stored timestep, optionally only `local_range`.
+
+        Delta encoded rows are reconstructed from the closest preceding keyframe, or from the
+        previous row if that was the last one read.
+        """
+        index = int(index) % len(self)
+        if self._keyframe_indices is None:
+            return self._read_stored(index, local_range)
+
+        if local_range is not None:
+            local_range = tuple(map(int, local_range))
+
+        keyframe = self._keyframe_indices[np.searchsorted(self._keyframe_indices, index, "right") - 1]
+        if keyframe < index and self._cache_key == (index - 1, local_range):
+            values = self._cache_values
+            first_index = index
+        else:
+            values = self._read_stored(keyframe, local_range)
+            first_index = keyframe + 1
+
+        for delta_index in range(first_index, index + 1):
+            values = values + self._read_stored(delta_index, local_range)
+        self._cache_key = (index, local_range)
+        self._cache_values = values
+        return values
+
+    def read_into(self, index: int, out: np.ndarray) -> np.ndarray:
+        """Read all values of the `index`th stored timestep into `out`, and return it.
+
+        Lossless rows without delta encoding are read directly into `out` without a copy.
+        """
+        index = int(index) % len(self)
+        part = int(np.searchsorted(self._part_offsets, index, "right")) - 1
+        if self._keyframe_indices is None and self._policies[part].is_lossless:
+            row = index - self._part_offsets[part]
+            self._values[part].read_direct(out, np.s_[row, :], np.s_[:])
+        else:
+            out[:] = self.read(index)
+        return out
+
+    def _read_stored(self, index: int, local_range: Tuple[int, int] = None) -> np.ndarray:
+        """Return the decoded row `index` without undoing the delta encoding."""
+        part = int(np.searchsorted(self._part_offsets, index, "right")) - 1
+        row = index - self._part_offsets[part]
+        values, policy = self._values[part], self._policies[part]
+        if local_range is None:
+            return policy.decode(values[row])
+        return policy.decode(values[row, local_range[0]:local_range[1]])
+
+    def close(self) -> None:
+        """Close the files."""
+        for h5file in self._files:
+            h5file.close()
+
+    def __enter__(self) -> "HDF5SeriesReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def write_virtual_series(filename: Path, name: str, part_filenames: Sequence[Path]) -> None:
+    """Join the parts written by `HDF5SeriesWriter` into a file of virtual datasets.
+
+    The parts are referenced by their names relative to `filename`, so they must be in the
+    same directory.
+    """
+    sources = {}
+    attributes = {}
+    for part_filename in part_filenames:
+        with h5py.File(str(part_filename), "r") as h5file:
+            group = h5file[name]
+            attributes = dict(group["values"].attrs)
+            for key, dataset in group.items():
+                if key in PER_DOF_DATASETS and key in sources:
+                    continue        # The same in every part
+                source = h5py.VirtualSource(
+                    Path(part_filename).name,
+                    f"{name}/{key}",
+                    shape=dataset.shape,
+                    dtype=dataset.dtype
+                )
+                sources.setdefault(key, []).append(source)
+
+    with h5py.File(str(filename), "w") as h5file:
+        group = h5file.create_group(name)
+        for key, key_sources in sources.items():
+            if key in PER_DOF_DATASETS:
+                layout = h5py.VirtualLayout(shape=key_sources[0].shape, dtype=key_sources[0].dtype)
+                layout[...] = key_sources[0]
+                group.create_virtual_dataset(key, layout)
+                continue
+            num_rows = sum(source.shape[0] for source in key_sources)
+            shape = (num_rows,) + key_sources[0].shape[1:]
+            layout = h5py.VirtualLayout(shape=shape, dtype=key_sources[0].dtype)
+            offset = 0
+            for source in key_sources:
+                layout[offset:offset + source.shape[0]] = source
+                offset += source.shape[0]
+            group.create_virtual_dataset(key, layout)
+        group["values"].attrs.update(attributes)
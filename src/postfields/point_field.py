@@ -1,6 +1,7 @@
 u"""Point eval field.
 
-Point eval relies on fenicstools.Probe
+The probes are evaluated by a `ProbeEngine` as a sparse mat-vec with the local dofs, and the
+values are gathered on rank 0 in the order of the points.
 
 Thanks to Øyvind Evju and cbcpost (bitbucket.org/simula_cbc/cbcpost).
 """
@@ -14,16 +15,21 @@ import dolfin
 import numpy as np
 import dolfin as df
 
-from typing import List
+from typing import (
+    Any,
+    Dict,
+    List,
+)
 
 from postspec import FieldSpec
 
 from postutils import (
     store_metadata,
-    import_fenicstools,
 )
 
 from .field_base import FieldBaseClass
+from .probe_file import ProbeFileWriter
+from .probe_engine import ProbeEngine
 
 
 LOGGER = logging.getLogger(__name__)
@@ -45,12 +51,12 @@ class PointField(FieldBaseClass):
         self._points = np.asarray(points)
         if len(self._points.shape) != 2:    # If we have a single point
             self._points.shape = (1, self._points.shape[0])
-        self._ft = import_fenicstools()     # Delayed import of fenicstools
-        self._probes = None                 # Defined in `compute`
+        self._engine: ProbeEngine = None                # Defined in `before_first_compute`
+        self._probe_file: ProbeFileWriter = None        # Only on rank 0
         # self._results: List[np.ndarray] = []                  # Append probe evaluations
 
     def before_first_compute(self, data: dolfin.Function) -> None:
-        """Create probes."""
+        """Locate the probes and build the probe engine."""
         function_space = data.function_space()
         fs_dim = function_space.mesh().geometry().dim()
         point_dim = self._points.shape[-1]
@@ -60,34 +66,29 @@ class PointField(FieldBaseClass):
         )
         assert fs_dim == point_dim, msg
 
-        if self._spec.sub_field_index is not None:
-            function_space = data.function_space().sub(self._spec.sub_field_index)
-        else:
-            function_space = data.function_space()
-        self._probes = self._ft.Probes(self._points.flatten(), function_space)
+        self._engine = ProbeEngine(function_space, self._points, self._spec.sub_field_index)
+        if self._engine.num_lost > 0 and df.MPI.rank(df.MPI.comm_world) == 0:
+            LOGGER.warning(f"{self._engine.num_lost} probes of {self.name} are outside the mesh. They are NaN.")
+
+    def sampling_metadata(self) -> Dict[str, Any]:
+        """Return the description of the points stored in the metadata."""
+        plist = [tuple(map(float, p)) for p in self._points]      # TODO: Untested
+        return {"point": plist}
 
     def compute(self, data) -> np.ndarray:
-        """Return the value of all probes."""
-        # FIXME: This probably does not work in parallel
+        """Return the values of all probes on rank 0, shape (probes, components).
 
+        Other processes return None.
+        """
         # Make sure that `before_first_compute` is called first
-        if self._spec.sub_field_index is not None:
-            self._probes(data.sub(self._spec.sub_field_index))
-        else:
-            self._probes(data)
-        results = self._probes.array()
-        self._probes.clear()        # Clear or bad things happen!
-        return results
+        return self._engine.evaluate(data.vector())
 
-    def update(self, timestep: int, time: float, data: dolfin.Function) -> None:
-        """Update the data."""
+    def store(self, timestep: int, time: float, data: dolfin.Function) -> None:
+        """Evaluate the probes and append the values."""
 
         comm = df.MPI.comm_world
         rank = df.MPI.rank(comm)
 
-        if not self.save_this_timestep(timestep, time):
-            return
-
         if self.first_compute:              # Setup everything
             self.first_compute = False      # Do not do this again
             self.before_first_compute(data)
@@ -99,19 +100,25 @@ class PointField(FieldBaseClass):
             spec_dict["element_family"] = str(element.family())  # e.g. Lagrange
             spec_dict["element_degree"] = element.degree()
 
-            plist = [tuple(map(float, p)) for p in self._points]      # TODO: Untested
-            spec_dict["point"] = plist
+            spec_dict.update(self.sampling_metadata())
 
             if rank == 0:
                 self._path.mkdir(parents=False, exist_ok=True)
                 store_metadata(self.path / "metadata_{name}.yaml".format(name=self.name), spec_dict)
 
+                self._probe_file = ProbeFileWriter(
+                    self.path / "probes_{name}.bin".format(name=self.name),
+                    self._points.shape[0],
+                    self._engine.value_size,
+                    buffer_steps=self._spec.probe_buffer_steps
+                )
+
         _data = self.compute(data)
 
         if rank == 0:
-            with open(self.path / "probes_{name}.txt".format(name=self.name), "a") as of_handle:
-                if self._points.shape[0] == 1:
-                    _data = (_data,)
-                _data_format_str = ", ".join(("{}",)*(len(_data) + 1))
-                of_handle.write(_data_format_str.format(float(time), *_data))
-                of_handle.write("\n")
+            self._probe_file.write(float(time), _data)
+
+    def close(self) -> None:
+        """Write the buffered probe values and close the probe file."""
+        if self._probe_file is not None:
+            self._probe_file.close()
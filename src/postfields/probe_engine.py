@@ -0,0 +1,156 @@
+"""Evaluate a function at a fixed set of points with a precomputed sparse matrix.
+
+On construction, each point is located in a cell, the process that evaluates it is chosen,
+and the basis functions of the cell are evaluated at the point. The coefficients form a
+sparse (owned probes * components) x (local dofs) matrix, so evaluating the probes is a
+single sparse mat-vec with the local dofs.
+"""
+
+import logging
+
+import numpy as np
+import dolfin as df
+import scipy.sparse as sp
+
+from mpi4py import MPI
+
+from typing import (
+    Optional,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ProbeEngine:
+    """Evaluate all components of a function at the probes in one sparse product.
+
+    A probe on a process boundary is owned by the lowest rank whose cells contain it. Probes
+    outside the mesh evaluate to NaN.
+    """
+
+    def __init__(
+            self,
+            function_space: df.FunctionSpace,
+            points: np.ndarray,
+            sub_field_index: Optional[int] = None
+    ) -> None:
+        """Locate the points and build the interpolation matrix.
+
+        Arguments:
+            function_space: The function space of the evaluated functions.
+            points: The probe coordinates, shape (probes, geometric dimension).
+            sub_field_index: Only evaluate this sub space of `function_space`.
+        """
+        self._points = np.atleast_2d(points)
+        mesh = function_space.mesh()
+        self._comm = mesh.mpi_comm()
+        rank, size = self._comm.Get_rank(), self._comm.Get_size()
+
+        parent_dofmap = function_space.dofmap()
+        if sub_field_index is not None:
+            function_space = function_space.sub(sub_field_index)
+        element = function_space.element()
+        dofmap = function_space.dofmap()
+        self._value_size = function_space.ufl_element().value_size()
+
+        # Choose the owner of each probe
+        num_owned_cells = mesh.topology().ghost_offset(mesh.topology().dim())
+        tree = mesh.bounding_box_tree()
+        cell_indices = np.array([
+            tree.compute_first_entity_collision(df.Point(*point)) for point in self._points
+        ], dtype="i8")
+        candidate_ranks = np.where(cell_indices < num_owned_cells, rank, size).astype("i8")
+        owner_ranks = np.empty_like(candidate_ranks)
+        self._comm.Allreduce(candidate_ranks, owner_ranks, op=MPI.MIN)
+        self._owned_probes = np.flatnonzero(owner_ranks == rank)
+        self._lost_probes = np.flatnonzero(owner_ranks == size)
+
+        # Evaluate the basis functions of each owned probe's cell
+        is_manifold = mesh.geometry().dim() != mesh.topology().dim()
+        rows, columns, coefficients = [], [], []
+        for i, probe in enumerate(self._owned_probes):
+            cell = df.Cell(mesh, int(cell_indices[probe]))
+            basis_values = element.evaluate_basis_all(
+                self._points[probe],
+                cell.get_vertex_coordinates(),
+                cell.orientation() if is_manifold else 0     # Only used on manifolds
+            ).reshape(element.space_dimension(), self._value_size)
+            cell_dofs = dofmap.cell_dofs(cell.index())
+            for component in range(self._value_size):
+                rows.append(np.full(cell_dofs.size, i*self._value_size + component))
+                columns.append(cell_dofs)
+                coefficients.append(basis_values[:, component])
+
+        # Dofs owned by other processes are appended to the local vector
+        first_dof, last_dof = parent_dofmap.ownership_range()
+        self._num_owned_dofs = last_dof - first_dof
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype="i8")
+        ghost_dofs, ghost_columns = np.unique(
+            columns[columns >= self._num_owned_dofs], return_inverse=True
+        )
+        columns[columns >= self._num_owned_dofs] = self._num_owned_dofs + ghost_columns
+        self._ghost_global_dofs = parent_dofmap.tabulate_local_to_global_dofs()[ghost_dofs].astype(np.intc)
+
+        self._matrix = sp.csr_matrix(
+            (
+                np.concatenate(coefficients) if coefficients else np.zeros(0),
+                (np.concatenate(rows) if rows else np.zeros(0, dtype="i8"), columns)
+            ),
+            shape=(self._owned_probes.size*self._value_size, self._num_owned_dofs + ghost_dofs.size)
+        )
+
+        counts = self._comm.gather(self._owned_probes.size, root=0)
+        owned_probes = self._comm.gather(self._owned_probes, root=0)
+        self._gather_counts: np.ndarray = None      # Only on rank 0
+        self._gather_order: np.ndarray = None
+        self._gathered: np.ndarray = None           # Receive buffer of `evaluate`
+        if rank == 0:
+            self._gather_counts = np.asarray(counts, dtype="i8")*self._value_size
+            self._gather_order = np.concatenate(owned_probes)
+            self._gathered = np.empty((self._gather_order.size, self._value_size))
+
+    @property
+    def num_lost(self) -> int:
+        """The number of probes outside the mesh."""
+        return self._lost_probes.size
+
+    @property
+    def lost_probes(self) -> np.ndarray:
+        """The indices of the probes outside the mesh, the same on all processes."""
+        return self._lost_probes
+
+    @property
+    def value_size(self) -> int:
+        """The number of components of each probe."""
+        return self._value_size
+
+    @property
+    def owned_probes(self) -> np.ndarray:
+        """The indices of the probes evaluated by this process."""
+        return self._owned_probes
+
+    def evaluate_local(self, vector: df.GenericVector) -> np.ndarray:
+        """Return the values of the owned probes, shape (owned probes, components).
+
+        Collective in parallel, since the ghosted dofs are gathered.
+        """
+        local_values = vector.get_local()
+        if self._comm.Get_size() > 1:
+            local_values = np.concatenate((local_values, vector.gather(self._ghost_global_dofs)))
+        return (self._matrix @ local_values).reshape(-1, self._value_size)
+
+    def evaluate(self, vector: df.GenericVector) -> Optional[np.ndarray]:
+        """Return the values of all probes on rank 0, shape (probes, components).
+
+        Other processes return None.
+        """
+        local_values = self.evaluate_local(vector)
+        if self._comm.Get_rank() != 0:
+            self._comm.Gatherv(local_values, None, root=0)
+            return None
+
+        self._comm.Gatherv(local_values, [self._gathered, self._gather_counts], root=0)
+        values = np.full((self._points.shape[0], self._value_size), np.nan)
+        values[self._gather_order] = self._gathered
+        return values
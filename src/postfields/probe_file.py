@@ -0,0 +1,122 @@
+"""A binary, append-only file of probe values.
+
+The file is a 32 byte header followed by one float64 record per saved timestep:
+
+    time, probe 0 component 0, probe 0 component 1, ..., probe 1 component 0, ...
+
+The header holds the magic bytes, the format version, the number of probes and the number of
+components. The records can be memory mapped without parsing.
+"""
+
+import logging
+
+import numpy as np
+
+from pathlib import Path
+
+from typing import (
+    Tuple,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+PROBE_FILE_MAGIC = b"XALPROBE"
+PROBE_FILE_VERSION = 1
+PROBE_FILE_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("num_probes", "<u4"),
+    ("num_components", "<u4"),
+    ("padding", "V12"),
+])
+
+
+def read_probe_header(filename: Path) -> Tuple[int, int]:
+    """Return the number of probes and components of a probe file."""
+    header = np.fromfile(str(filename), dtype=PROBE_FILE_HEADER_DTYPE, count=1)
+    if header.size == 0 or header["magic"][0] != PROBE_FILE_MAGIC:
+        raise ValueError(f"{filename} is not a probe file")
+    if header["version"][0] != PROBE_FILE_VERSION:
+        raise ValueError(f"Unsupported probe file version {header['version'][0]} in {filename}")
+    return int(header["num_probes"][0]), int(header["num_components"][0])
+
+
+def read_probe_file(filename: Path) -> np.ndarray:
+    """Memory map the records of a probe file as a (timesteps, 1 + probes*components) array.
+
+    A partially written last record is ignored.
+    """
+    num_probes, num_components = read_probe_header(filename)
+    num_columns = 1 + num_probes*num_components
+    record_size = 8*num_columns
+    num_records = (Path(filename).stat().st_size - PROBE_FILE_HEADER_DTYPE.itemsize)//record_size
+    if num_records == 0:
+        return np.zeros((0, num_columns))
+    return np.memmap(
+        str(filename),
+        dtype="<f8",
+        mode="r",
+        offset=PROBE_FILE_HEADER_DTYPE.itemsize,
+        shape=(num_records, num_columns)
+    )
+
+
+class ProbeFileWriter:
+    """Buffer the probe values in memory and append them to the file every `buffer_steps`."""
+
+    def __init__(
+            self,
+            filename: Path,
+            num_probes: int,
+            num_components: int,
+            buffer_steps: int = 64
+    ) -> None:
+        """Create the file, or append to it if it has the same layout.
+
+        Arguments:
+            filename: Name of the probe file.
+            num_probes: The number of probes.
+            num_components: The number of values of each probe.
+            buffer_steps: The number of timesteps kept in memory before they are written.
+        """
+        self._filename = Path(filename)
+        self._buffer = np.zeros((max(1, buffer_steps), 1 + num_probes*num_components), dtype="<f8")
+        self._num_buffered = 0
+
+        append = self._filename.exists()
+        if append and read_probe_header(self._filename) != (num_probes, num_components):
+            raise ValueError(f"The probes in {self._filename} differ from the probes of the field")
+
+        self._file = self._filename.open("ab" if append else "wb")
+        if not append:
+            header = np.zeros(1, dtype=PROBE_FILE_HEADER_DTYPE)
+            header["magic"] = PROBE_FILE_MAGIC
+            header["version"] = PROBE_FILE_VERSION
+            header["num_probes"] = num_probes
+            header["num_components"] = num_components
+            self._file.write(header.tobytes())
+
+    def write(self, time: float, values: np.ndarray) -> None:
+        """Buffer the values of all probes at `time`."""
+        self._buffer[self._num_buffered, 0] = time
+        self._buffer[self._num_buffered, 1:] = np.ravel(values)
+        self._num_buffered += 1
+        if self._num_buffered == self._buffer.shape[0]:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records."""
+        if self._num_buffered == 0:
+            return
+        self._file.write(self._buffer[:self._num_buffered].tobytes())
+        self._file.flush()
+        self._num_buffered = 0
+
+    def close(self) -> None:
+        """Write the buffered records and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
@@ -0,0 +1,159 @@
+"""Reduce a function to the integral, average, minimum and maximum per cell domain tag.
+
+The weight vectors and dof masks of each tag are computed once. Each update is a dot
+product per tag with the local dofs, and two MPI reductions to rank 0.
+"""
+
+import logging
+
+import numpy as np
+import dolfin as df
+
+from mpi4py import MPI
+
+from typing import (
+    List,
+    Optional,
+    Sequence,
+)
+
+from postspec import FieldSpec
+
+from postutils import store_metadata
+
+from .field_base import FieldBaseClass
+from .probe_file import ProbeFileWriter
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+REDUCTION_QUANTITIES = ("integral", "average", "min", "max")
+
+
+class ReductionField(FieldBaseClass):
+    """Store the integral, average, min and max of a function over each tag of a cell function.
+
+    The values are appended to `reductions_{name}.bin`, a probe file with one "probe" per tag
+    and the quantities in `REDUCTION_QUANTITIES` as components. See `post.read_point_values`.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            spec: FieldSpec,
+            cell_function: df.MeshFunction,
+            tags: Optional[Sequence[int]] = None
+    ) -> None:
+        """Store the cell function and the tags.
+
+        Arguments:
+            name: Name of field. See `FieldBaseClass` for more info.
+            spec: Specifications related to field I/O. See `postspec.FieldSpec`.
+            cell_function: The cell domains.
+            tags: The tags to reduce over. Defaults to all tags in `cell_function`.
+        """
+        super().__init__(name, spec)
+        self._cell_function = cell_function
+        if tags is None:
+            comm = cell_function.mesh().mpi_comm()
+            local_tags = np.unique(cell_function.array())
+            tags = np.unique(np.concatenate(comm.allgather(local_tags)))
+        self._tags: List[int] = list(map(int, tags))
+
+        self._weights: np.ndarray = None        # Local weight vector of each tag
+        self._masks: List[np.ndarray] = None    # Local owned dofs of each tag
+        self._volumes: np.ndarray = None
+        self._table: ProbeFileWriter = None     # Only on rank 0
+
+    @property
+    def tags(self) -> List[int]:
+        return self._tags
+
+    def before_first_compute(self, data: df.Function) -> None:
+        """Assemble the weight vector, volume and dof mask of each tag."""
+        function_space = data.function_space()
+        mesh = function_space.mesh()
+        dx = df.Measure("dx", domain=mesh, subdomain_data=self._cell_function)
+
+        test_function = df.TestFunction(function_space)
+        dofmap = function_space.dofmap()
+        if self._spec.sub_field_index is not None:
+            test_function = df.split(test_function)[self._spec.sub_field_index]
+            dofmap = function_space.sub(self._spec.sub_field_index).dofmap()
+        if test_function.ufl_shape != ():
+            raise ValueError(f"ReductionField {self.name} needs a scalar function or sub function")
+
+        first_dof, last_dof = function_space.dofmap().ownership_range()
+        num_owned_dofs = last_dof - first_dof
+        cell_tags = self._cell_function.array()
+
+        weights, masks, volumes = [], [], []
+        for tag in self._tags:
+            weights.append(df.assemble(test_function*dx(tag)).get_local())
+            volumes.append(df.assemble(df.Constant(1)*dx(tag)))
+            cell_dofs = [dofmap.cell_dofs(cell) for cell in np.flatnonzero(cell_tags == tag)]
+            dofs = np.unique(np.concatenate(cell_dofs)) if cell_dofs else np.zeros(0, dtype="i8")
+            masks.append(dofs[dofs < num_owned_dofs])
+        self._weights = np.array(weights).reshape(len(self._tags), num_owned_dofs)
+        self._masks = masks
+        self._volumes = np.array(volumes)
+
+    def compute(self, data: df.Function) -> Optional[np.ndarray]:
+        """Return the reductions on rank 0, shape (tags, quantities). Other processes return None."""
+        local_values = data.vector().get_local()
+        num_tags = len(self._tags)
+        local_integrals = self._weights @ local_values
+        local_extrema = np.empty(2*num_tags)       # [minima, -maxima], reduced with MPI.MIN
+        for i, mask in enumerate(self._masks):
+            tag_values = local_values[mask]
+            local_extrema[i] = tag_values.min() if tag_values.size else np.inf
+            local_extrema[num_tags + i] = -tag_values.max() if tag_values.size else np.inf
+
+        comm = data.function_space().mesh().mpi_comm()
+        is_root = comm.Get_rank() == 0
+        integrals = np.empty_like(local_integrals) if is_root else None
+        extrema = np.empty_like(local_extrema) if is_root else None
+        comm.Reduce(local_integrals, integrals, op=MPI.SUM, root=0)
+        comm.Reduce(local_extrema, extrema, op=MPI.MIN, root=0)
+        if not is_root:
+            return None
+
+        minima, maxima = extrema[:num_tags], -extrema[num_tags:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            averages = integrals/self._volumes
+        return np.column_stack((integrals, averages, minima, maxima))
+
+    def store(self, timestep: int, time: float, data: df.Function) -> None:
+        """Compute the reductions and append them to the table."""
+        rank = df.MPI.rank(df.MPI.comm_world)
+        if self.first_compute:
+            self.first_compute = False
+            self.before_first_compute(data)
+
+            spec_dict = self.spec._asdict()
+            element = data.function_space().ufl_element()
+            spec_dict["element_family"] = str(element.family())  # e.g. Lagrange
+            spec_dict["element_degree"] = element.degree()
+            spec_dict["tags"] = self._tags
+            spec_dict["quantities"] = list(REDUCTION_QUANTITIES)
+            spec_dict["volumes"] = self._volumes.tolist()
+
+            if rank == 0:
+                self._path.mkdir(parents=False, exist_ok=True)
+                store_metadata(self.path / "metadata_{name}.yaml".format(name=self.name), spec_dict)
+                self._table = ProbeFileWriter(
+                    self.path / "reductions_{name}.bin".format(name=self.name),
+                    len(self._tags),
+                    len(REDUCTION_QUANTITIES),
+                    buffer_steps=self._spec.probe_buffer_steps
+                )
+
+        reductions = self.compute(data)
+        if rank == 0:
+            self._table.write(float(time), reductions)
+
+    def close(self) -> None:
+        """Write the buffered reductions and close the table."""
+        if self._table is not None:
+            self._table.close()
@@ -0,0 +1,111 @@
+"""Sample a function on a regular grid in a plane, or along a polyline.
+
+The samples are evaluated as probes by `PointField`, so the interpolation is computed once
+and each update only writes the sampled values to `probes_{name}.bin`.
+"""
+
+import numpy as np
+
+from typing import (
+    Any,
+    Dict,
+    Sequence,
+)
+
+from postspec import FieldSpec
+
+from .point_field import PointField
+
+
+class SliceField(PointField):
+    """Sample a function on a regular grid in a rectangle in a plane.
+
+    The grid is `origin + i/(n0 - 1)*axis0 + j/(n1 - 1)*axis1` for `i < n0` and `j < n1`.
+    The stored values have shape (timesteps, n0*n1*components) in row major order.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            spec: FieldSpec,
+            origin: Sequence[float],
+            axes: Sequence[Sequence[float]],
+            resolution: Sequence[int]
+    ) -> None:
+        """Create the sample points.
+
+        Arguments:
+            name: Name of field. See `FieldBaseClass` for more info.
+            spec: Specifications related to field I/O. See `postspec.FieldSpec`.
+            origin: A corner of the rectangle.
+            axes: The two edges of the rectangle from `origin`.
+            resolution: The number of samples along each axis.
+        """
+        self._origin = np.asarray(origin, dtype="f8")
+        self._axes = np.asarray(axes, dtype="f8")
+        self._resolution = tuple(map(int, resolution))
+        if self._axes.shape != (2, self._origin.size) or len(self._resolution) != 2:
+            raise ValueError("A slice is defined by an origin, two axes and two resolutions")
+        if min(self._resolution) < 2:
+            raise ValueError(f"The resolution must be at least 2, got {self._resolution}")
+
+        s, t = np.meshgrid(
+            np.linspace(0, 1, self._resolution[0]),
+            np.linspace(0, 1, self._resolution[1]),
+            indexing="ij"
+        )
+        points = self._origin + np.outer(s.ravel(), self._axes[0]) + np.outer(t.ravel(), self._axes[1])
+        super().__init__(name, spec, points)
+
+    def sampling_metadata(self) -> Dict[str, Any]:
+        """Return the slice definition and the shape of the sample grid."""
+        return {
+            "origin": self._origin.tolist(),
+            "axes": self._axes.tolist(),
+            "sample_shape": list(self._resolution),
+        }
+
+
+class LineField(PointField):
+    """Sample a function at equidistant points along a polyline.
+
+    The stored values have shape (timesteps, resolution*components).
+    """
+
+    def __init__(
+            self,
+            name: str,
+            spec: FieldSpec,
+            vertices: Sequence[Sequence[float]],
+            resolution: int
+    ) -> None:
+        """Create the sample points.
+
+        Arguments:
+            name: Name of field. See `FieldBaseClass` for more info.
+            spec: Specifications related to field I/O. See `postspec.FieldSpec`.
+            vertices: The vertices of the polyline, shape (vertices, geometric dimension).
+            resolution: The number of samples, including both end points.
+        """
+        self._vertices = np.asarray(vertices, dtype="f8")
+        self._resolution = int(resolution)
+        if self._vertices.ndim != 2 or self._vertices.shape[0] < 2:
+            raise ValueError("A line needs at least two vertices")
+        if self._resolution < 2:
+            raise ValueError(f"The resolution must be at least 2, got {self._resolution}")
+
+        # Interpolate each coordinate in the arc length of the polyline
+        segment_lengths = np.linalg.norm(np.diff(self._vertices, axis=0), axis=1)
+        arc_length = np.concatenate(([0], np.cumsum(segment_lengths)))
+        samples = np.linspace(0, arc_length[-1], self._resolution)
+        points = np.column_stack([
+            np.interp(samples, arc_length, self._vertices[:, i]) for i in range(self._vertices.shape[1])
+        ])
+        super().__init__(name, spec, points)
+
+    def sampling_metadata(self) -> Dict[str, Any]:
+        """Return the polyline and the number of samples."""
+        return {
+            "vertices": self._vertices.tolist(),
+            "sample_shape": [self._resolution],
+        }
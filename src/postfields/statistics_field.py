@@ -0,0 +1,131 @@
+"""Running per-dof statistics of a function over the saved timesteps."""
+
+import logging
+
+import numpy as np
+import dolfin as df
+
+from typing import (
+    Dict,
+    Optional,
+)
+
+from postspec import FieldSpec
+
+from postutils import store_metadata
+
+from .field_base import FieldBaseClass
+from .sub_function import SubFunctionExtractor
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+STATISTICS = ("mean", "variance", "min", "max", "argmax_time")
+
+
+class StatisticsField(FieldBaseClass):
+    """Keep the running mean, variance, min, max and time of the max of each dof.
+
+    The mean and variance are updated with Welford's algorithm, and the variance is the
+    sample variance. The statistics are written to `statistics_{name}.hdf5`, one dataset per
+    statistic, every `write_interval` updates and when the field is closed. `start_timestep`
+    and `stride_timestep` select the timesteps included in the statistics.
+    """
+
+    def __init__(self, name: str, spec: FieldSpec, write_interval: Optional[int] = None) -> None:
+        """Store name, spec and how often to write the statistics.
+
+        Arguments:
+            name: Name of field. See `FieldBaseClass` for more info.
+            spec: Specifications related to field I/O. See `postspec.FieldSpec`.
+            write_interval: Write the statistics every `write_interval` updates. Defaults to
+                only writing when the field is closed.
+        """
+        super().__init__(name, spec)
+        self._write_interval = write_interval
+        self._count = 0
+        self._written_count = 0     # The count when the statistics were last written
+        self._last_time: float = None
+        self._statistics: Dict[str, np.ndarray] = {}
+        self._m2: np.ndarray = None                 # Sum of squared differences from the mean
+        self._extractor: SubFunctionExtractor = None
+
+    @property
+    def count(self) -> int:
+        """The number of timesteps in the statistics."""
+        return self._count
+
+    def before_first_compute(self, data: df.Function) -> None:
+        """Allocate the statistics on the owned dofs of the (sub) function space."""
+        self._extractor = SubFunctionExtractor(data.function_space(), self._spec.sub_field_index)
+        local_size = self._extractor.function.vector().local_size()
+        self._statistics = {
+            "mean": np.zeros(local_size),
+            "variance": np.zeros(local_size),
+            "min": np.full(local_size, np.inf),
+            "max": np.full(local_size, -np.inf),
+            "argmax_time": np.zeros(local_size),
+        }
+        self._m2 = np.zeros(local_size)
+
+    def compute(self, time: float, data: df.Function) -> None:
+        """Add the local dofs of `data` to the statistics."""
+        values = self._extractor.local_values(data)
+        self._count += 1
+        self._last_time = float(time)
+        mean = self._statistics["mean"]
+        delta = values - mean
+        mean += delta/self._count
+        self._m2 += delta*(values - mean)
+
+        np.minimum(self._statistics["min"], values, out=self._statistics["min"])
+        is_new_max = values > self._statistics["max"]
+        self._statistics["max"][is_new_max] = values[is_new_max]
+        self._statistics["argmax_time"][is_new_max] = time
+
+    def store(self, timestep: int, time: float, data: df.Function) -> None:
+        """Update the statistics, and write them every `write_interval` updates."""
+        if self.first_compute:
+            self.first_compute = False
+            self.before_first_compute(data)
+
+            spec_dict = self.spec._asdict()
+            element = self._extractor.function.function_space().ufl_element()
+            spec_dict["element_family"] = str(element.family())  # e.g. Lagrange
+            spec_dict["element_degree"] = element.degree()
+            spec_dict["statistics"] = list(STATISTICS)
+
+            if df.MPI.rank(df.MPI.comm_world) == 0:
+                self._path.mkdir(parents=False, exist_ok=True)
+                store_metadata(self.path / "metadata_{name}.yaml".format(name=self.name), spec_dict)
+            df.MPI.barrier(df.MPI.comm_world)
+
+        self.compute(time, data)
+        if self._write_interval is not None and self._count % self._write_interval == 0:
+            self.write()
+
+    @property
+    def statistics(self) -> Dict[str, np.ndarray]:
+        """The statistics of the owned dofs, keyed by the names in `STATISTICS`."""
+        if self._count > 1:
+            self._statistics["variance"][:] = self._m2/(self._count - 1)
+        return self._statistics
+
+    def write(self) -> None:
+        """Append the current statistics to `statistics_{name}.hdf5`."""
+        statistics = self.statistics
+        filename = self.path / "statistics_{name}.hdf5".format(name=self.name)
+        mode = "a" if filename.exists() else "w"
+        function = self._extractor.function
+        with df.HDF5File(df.MPI.comm_world, str(filename), mode) as statistics_file:
+            for name in STATISTICS:
+                function.vector().set_local(statistics[name])
+                function.vector().apply("insert")
+                statistics_file.write(function, f"/{name}", self._last_time)
+        self._written_count = self._count
+
+    def close(self) -> None:
+        """Write the final statistics."""
+        if self._count > self._written_count:
+            self.write()
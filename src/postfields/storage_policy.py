@@ -0,0 +1,118 @@
+"""Precision and compression policy for fields stored with h5py."""
+
+import logging
+
+import numpy as np
+
+from typing import (
+    Any,
+    Dict,
+    Mapping,
+    Optional,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+STORAGE_DTYPES = ("float64", "float32", "float16")
+COMPRESSION_FILTERS = ("gzip", "lzf")
+
+
+class StoragePolicy:
+    """Convert float64 dof vectors to the stored representation and back.
+
+    The values are either cast to `storage_dtype`, or, if `quantisation_error` is given,
+    rounded to integer multiples of 2*`quantisation_error` and bit packed by the hdf5
+    scale-offset filter. The lossless filter `compression` is applied on top.
+    """
+
+    def __init__(
+            self,
+            storage_dtype: str = "float64",
+            quantisation_error: Optional[float] = None,
+            compression: Optional[str] = None,
+            compression_level: Optional[int] = None
+    ) -> None:
+        """Validate and store the policy.
+
+        Arguments:
+            storage_dtype: One of "float64", "float32" or "float16".
+            quantisation_error: The maximum absolute error of the stored values.
+            compression: One of "gzip" or "lzf".
+            compression_level: The gzip level, 0 - 9.
+        """
+        if storage_dtype not in STORAGE_DTYPES:
+            raise ValueError(f"storage_dtype must be one of {STORAGE_DTYPES}, got {storage_dtype}")
+        if compression is not None and compression not in COMPRESSION_FILTERS:
+            raise ValueError(f"compression must be one of {COMPRESSION_FILTERS}, got {compression}")
+        if quantisation_error is not None and quantisation_error <= 0:
+            raise ValueError(f"quantisation_error must be positive, got {quantisation_error}")
+
+        self.storage_dtype = storage_dtype
+        self.quantisation_error = quantisation_error
+        self.compression = compression
+        self.compression_level = compression_level
+
+    @classmethod
+    def from_spec(cls, spec: Any) -> "StoragePolicy":
+        """Create the policy from a `FieldSpec`."""
+        return cls(
+            storage_dtype=spec.storage_dtype,
+            quantisation_error=spec.quantisation_error,
+            compression=spec.compression,
+            compression_level=spec.compression_level,
+        )
+
+    @classmethod
+    def from_attributes(cls, attributes: Mapping[str, Any]) -> "StoragePolicy":
+        """Create the policy from the attributes written by `attributes`."""
+        quantisation_error = attributes.get("quantisation_error", None)
+        return cls(
+            storage_dtype=str(attributes.get("storage_dtype", "float64")),
+            quantisation_error=None if quantisation_error is None else float(quantisation_error),
+        )
+
+    @property
+    def is_lossless(self) -> bool:
+        """Return True if the stored values are bitwise equal to the input."""
+        return self.storage_dtype == "float64" and self.quantisation_error is None
+
+    @property
+    def step(self) -> Optional[float]:
+        """The quantisation step."""
+        if self.quantisation_error is None:
+            return None
+        return 2*self.quantisation_error
+
+    def attributes(self) -> Dict[str, Any]:
+        """Return the hdf5 attributes needed to decode the stored values."""
+        attributes: Dict[str, Any] = {"storage_dtype": self.storage_dtype}
+        if self.quantisation_error is not None:
+            attributes["quantisation_error"] = self.quantisation_error
+        return attributes
+
+    def dataset_kwargs(self) -> Dict[str, Any]:
+        """Return the keyword arguments for `h5py.Group.create_dataset`."""
+        kwargs: Dict[str, Any] = {"dtype": self.storage_dtype}
+        if self.quantisation_error is not None:
+            kwargs["dtype"] = "i8"
+            kwargs["scaleoffset"] = 0       # Store the minimum number of bits
+        if self.compression is not None:
+            kwargs["compression"] = self.compression
+            kwargs["shuffle"] = True
+            if self.compression == "gzip" and self.compression_level is not None:
+                kwargs["compression_opts"] = self.compression_level
+        return kwargs
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """Return `values` in the stored representation."""
+        if self.quantisation_error is not None:
+            return np.rint(values/self.step).astype("i8")
+        return values.astype(self.storage_dtype, copy=False)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        """Return the float64 values of `stored`."""
+        if self.quantisation_error is not None:
+            return stored*self.step
+        return stored.astype("f8", copy=False)
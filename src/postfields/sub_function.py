@@ -0,0 +1,41 @@
+"""Extract the local dofs of a (sub) function."""
+
+import numpy as np
+import dolfin as df
+
+from typing import Optional
+
+
+class SubFunctionExtractor:
+    """Copy the sub function `sub_field_index` into a function on the collapsed sub space.
+
+    Without `sub_field_index`, the dofs are read directly from the function.
+    """
+
+    def __init__(self, function_space: df.FunctionSpace, sub_field_index: Optional[int] = None) -> None:
+        """Create the collapsed space and the assigner.
+
+        Arguments:
+            function_space: The function space of the data.
+            sub_field_index: The index of the sub space. Defaults to the whole space.
+        """
+        self._sub_field_index = sub_field_index
+        self._assigner: df.FunctionAssigner = None
+        if sub_field_index is not None:
+            sub_space = function_space.sub(sub_field_index)
+            self._function = df.Function(sub_space.collapse())
+            self._assigner = df.FunctionAssigner(self._function.function_space(), sub_space)
+        else:
+            self._function = df.Function(function_space)
+
+    @property
+    def function(self) -> df.Function:
+        """A function on the (collapsed sub) space. Its values are overwritten by `local_values`."""
+        return self._function
+
+    def local_values(self, data: df.Function) -> np.ndarray:
+        """Return the owned dofs of the (sub) function of `data`."""
+        if self._assigner is None:
+            return data.vector().get_local()
+        self._assigner.assign(self._function, data.sub(self._sub_field_index))
+        return self._function.vector().get_local()
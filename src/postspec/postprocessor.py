@@ -10,14 +10,46 @@ import typing as tp
 
 class SaverSpec(NamedTuple):
     """Specifications for `post.Saver`.
+
+    If `async_write` is True, `Saver.update` copies the data into staging buffers and a
+    background thread writes them. `async_queue_depth` bounds the number of pending writes
+    and `async_staging_bytes` the memory used for the staging buffers. Asynchronous writing is
+    serial only.
+
+    Meshes are written once to the content-addressed `mesh_store`, `casedir/meshes` by
+    default. Point several casedirs to the same `mesh_store` to share the meshes between them.
+
+    A snapshot of the local dofs of all fields is written every `snapshot_interval_steps`
+    timesteps or `snapshot_interval_seconds` wall clock seconds, and the last `num_snapshots`
+    are kept. See `Loader.load_snapshot`.
+
+    If `single_file` is True, all fields saved as "hdf5_series" are groups in one shared hdf5
+    file, `fields.hdf5`, which is kept open for the whole run.
     """
     casedir: Path
     overwrite_casedir: bool = False
+    mesh_store: tp.Optional[Path] = None
+    snapshot_interval_steps: tp.Optional[int] = None
+    snapshot_interval_seconds: tp.Optional[float] = None
+    num_snapshots: int = 2
+    single_file: bool = False
+    async_write: bool = False
+    async_queue_depth: int = 4
+    async_staging_bytes: int = 2**30
 
 
 class LoaderSpec(NamedTuple):
-    """Specifications for `post.Saver`."""
+    """Specifications for `post.Loader`.
+
+    `cache_size` is the number of function spaces, and separately of mesh functions, the
+    loader keeps. The least recently used are dropped first.
+
+    If `use_mesh_cache` is True, serial meshes are read from a binary cache, see
+    `postutils.MeshCache`.
+    """
     casedir: Path
+    cache_size: int = 8
+    use_mesh_cache: bool = True
 
 
 class PostProcessorSpec(NamedTuple):
@@ -27,7 +59,30 @@ class PostProcessorSpec(NamedTuple):
 
 class FieldSpec(NamedTuple):
     """
+    `save_as` is any of "hdf5", "hdf5_series", "xdmf" and "checkpoint". "hdf5_series" keeps one
+    file open and appends every timestep to a single extendable dataset.
+
     `num_steps_in_part` is the number of timesteps store before a output file is broken into parts.
+
+    `storage_dtype`, `quantisation_error`, `compression` and `compression_level` control how
+    "hdf5_series" stores the values, see `postfields.storage_policy.StoragePolicy`.
+
+    If `keyframe_interval` is set, "hdf5_series" stores the full vector every `keyframe_interval`
+    saved timesteps and the difference from the previous timestep in between. It requires
+    `quantisation_error`, as unquantised deltas take as many bytes as the full vector and do
+    not add back bitwise exactly.
+
+    If `save_threshold` is set, a field is only saved when the `save_threshold_norm` ("max_abs"
+    or "relative_l2") of the change since it was last saved exceeds the threshold, but at
+    least every `max_save_gap` timesteps. `start_timestep` and `stride_timestep` still apply.
+
+    If `save_interval` is set, a field is saved on the grid of multiples of `save_interval` in
+    simulation time rather than every `stride_timestep`. With `interpolate_to_interval`, each
+    frame is linearly interpolated between the two solver timesteps around the grid point.
+
+    If `preview_resolution` is set, `Field` also writes `{name}_preview.xdmf` on the cells inside
+    the domain of a box mesh with `preview_resolution` cells along the longest side, see
+    `postfields.Field`.
     """
     save: bool = True
     save_as: Tuple[str] = ("checkpoint",)
@@ -38,3 +93,15 @@ class FieldSpec(NamedTuple):
     element_degree: tp.Optional[int] = 1
     sub_field_index: tp.Optional[int] = None     # The index of the subfunction space
     num_steps_in_part: tp.Optional[int] = None
+    storage_dtype: str = "float64"      # "float64", "float32" or "float16"
+    quantisation_error: tp.Optional[float] = None   # Absolute error bound of scale-offset
+    compression: tp.Optional[str] = None            # "gzip" or "lzf"
+    compression_level: tp.Optional[int] = None
+    keyframe_interval: tp.Optional[int] = None      # Delta encoding between keyframes
+    save_threshold: tp.Optional[float] = None       # Adaptive saving based on change
+    save_threshold_norm: str = "max_abs"            # "max_abs" or "relative_l2"
+    max_save_gap: tp.Optional[int] = None           # Save at least every `max_save_gap` timesteps
+    save_interval: tp.Optional[float] = None        # Save in simulation time, not timesteps
+    interpolate_to_interval: bool = False           # Interpolate frames onto the grid
+    probe_buffer_steps: int = 64                    # `PointField` writes every n timesteps
+    preview_resolution: tp.Optional[int] = None     # Cells along the longest side of the preview
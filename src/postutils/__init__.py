@@ -8,6 +8,8 @@ from .utils import ( store_metadata,
     save_function,
     read_function,
     get_part_number,
+    get_part_filenames,
+    coarse_box_mesh,
     check_bounds
 )
 
@@ -28,6 +30,18 @@ from .assigner import (
 from .store_sourcefiles import store_sourcefiles
 from .identifier import simulation_directory
 
+from .mesh_store import (
+    MeshStore,
+    mesh_hash,
+    store_mesh_reference,
+    load_mesh_reference,
+)
+
+from .mesh_cache import (
+    MeshCache,
+    default_mesh_cache_directory,
+)
+
 from .probe_points import (
     circle_points,
     grid_points,
@@ -0,0 +1,254 @@
+"""A local binary cache of meshes and markers read from xdmf.
+
+Each entry is a directory `<cache>/<key>/` of `.npy` files: the vertex coordinates, the cell
+topology, the cell markers, and the facet markers with the sorted vertices of each facet.
+The key is a hash of the content of the xdmf files and the hdf5 files they point to, so
+an entry is not used once any of them changes. The hash is remembered in `<cache>/.stat_keys`
+by the path, size and modification time of the files, and only recomputed when one of those
+changes. The arrays are memory-mapped and the mesh is built with `dolfin.MeshEditor`. Only
+serial meshes are cached.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+
+import yaml
+import numpy as np
+import dolfin as df
+
+from xml.etree import ElementTree
+
+from pathlib import Path
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+MESH_CACHE_ENVIRONMENT_VARIABLE = "XALPOST_MESH_CACHE"
+
+STAT_KEYS_DIRECTORY = ".stat_keys"
+
+
+def default_mesh_cache_directory() -> Path:
+    """Return `$XALPOST_MESH_CACHE`, or `~/.cache/xalpost/meshes` if it is not set."""
+    directory = os.environ.get(MESH_CACHE_ENVIRONMENT_VARIABLE, None)
+    if directory is None:
+        return Path.home() / ".cache" / "xalpost" / "meshes"
+    return Path(directory)
+
+
+def _hdf5_sources(xdmf_filename: Path) -> List[Path]:
+    """Return the hdf5 files referenced by the data items of an xdmf file."""
+    filenames = set()
+    for item in ElementTree.parse(str(xdmf_filename)).iter("DataItem"):
+        if item.get("Format") == "HDF" and item.text is not None:
+            filenames.add(item.text.strip().split(":")[0])
+    return [Path(xdmf_filename).parent / filename for filename in sorted(filenames)]
+
+
+def _facet_keys(facet_vertices: np.ndarray) -> np.ndarray:
+    """Return a comparable key of each facet, independent of the order of its vertices."""
+    sorted_vertices = np.ascontiguousarray(np.sort(facet_vertices, axis=1), dtype="i8")
+    return sorted_vertices.view(np.dtype((np.void, sorted_vertices.itemsize*sorted_vertices.shape[1]))).ravel()
+
+
+def read_xdmf_mesh(
+        mesh_filename: Path,
+        cell_function_filename: Optional[Path] = None,
+        facet_function_filename: Optional[Path] = None
+) -> Tuple[df.Mesh, Optional[df.MeshFunction], Optional[df.MeshFunction]]:
+    """Read a mesh, and optionally its cell and facet markers, from xdmf."""
+    mesh = df.Mesh()
+    with df.XDMFFile(str(mesh_filename)) as infile:
+        infile.read(mesh)
+
+    mesh_functions = []
+    for dim, filename in ((mesh.topology().dim(), cell_function_filename),
+                          (mesh.topology().dim() - 1, facet_function_filename)):
+        if filename is None:
+            mesh_functions.append(None)
+            continue
+        mvc = df.MeshValueCollection("size_t", mesh, dim)
+        with df.XDMFFile(str(filename)) as infile:
+            infile.read(mvc)
+        mesh_functions.append(df.MeshFunction("size_t", mesh, mvc))
+    return mesh, mesh_functions[0], mesh_functions[1]
+
+
+class MeshCache:
+    """Read meshes from xdmf once, and from memory-mapped binary arrays afterwards."""
+
+    def __init__(self, directory: Path = None) -> None:
+        """Store the path of the cache.
+
+        Arguments:
+            directory: The directory of the cache. Defaults to `default_mesh_cache_directory()`.
+        """
+        if directory is None:
+            directory = default_mesh_cache_directory()
+        self._directory = Path(directory)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def key(self, *filenames: Optional[Path]) -> str:
+        """Return the hash of the content of the xdmf files and their hdf5 files.
+
+        The content is only hashed if the path, size or modification time of a file changed
+        since the last call.
+        """
+        sources = [
+            None if filename is None else [Path(filename)] + _hdf5_sources(filename)
+            for filename in filenames
+        ]
+        signature = []
+        for file_sources in sources:
+            for source in file_sources or []:
+                stat = source.stat()
+                signature.append((str(source.resolve()), stat.st_size, stat.st_mtime_ns))
+            signature.append(None)      # Separate the mesh, cell and facet files
+        stat_key_path = self._directory / STAT_KEYS_DIRECTORY / hashlib.sha256(repr(signature).encode()).hexdigest()
+        try:
+            return stat_key_path.read_text().strip()
+        except OSError:
+            pass
+
+        sha = hashlib.sha256()
+        for file_sources in sources:
+            sha.update(b"\0")       # Separate the mesh, cell and facet files
+            for source in file_sources or []:
+                with source.open("rb") as in_handle:
+                    for block in iter(lambda: in_handle.read(2**20), b""):
+                        sha.update(block)
+        key = sha.hexdigest()[:32]
+
+        try:
+            stat_key_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = stat_key_path.with_name(f".{stat_key_path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(key)
+            os.replace(tmp_path, stat_key_path)
+        except OSError as e:
+            LOGGER.info(f"Could not remember the mesh cache key in {stat_key_path}: {e}")
+        return key
+
+    def load(
+            self,
+            mesh_filename: Path,
+            cell_function_filename: Optional[Path] = None,
+            facet_function_filename: Optional[Path] = None
+    ) -> Tuple[df.Mesh, Optional[df.MeshFunction], Optional[df.MeshFunction]]:
+        """Return the mesh and the markers of the xdmf files, from the cache if possible.
+
+        The xdmf files are read and cached if they are not in the cache. In parallel, the
+        xdmf files are always read.
+        """
+        if df.MPI.size(df.MPI.comm_world) > 1:
+            return read_xdmf_mesh(mesh_filename, cell_function_filename, facet_function_filename)
+
+        key = self.key(mesh_filename, cell_function_filename, facet_function_filename)
+        entry = self._directory / key
+        if entry.exists():
+            try:
+                return self._read_entry(entry)
+            except (OSError, ValueError, KeyError, TypeError, RuntimeError, yaml.YAMLError) as e:
+                # Remove the corrupt entry, so that it is replaced below
+                LOGGER.warning(f"Could not read cached mesh {entry}, replacing it: {e}")
+                shutil.rmtree(entry, ignore_errors=True)
+
+        mesh, cell_function, facet_function = read_xdmf_mesh(
+            mesh_filename,
+            cell_function_filename,
+            facet_function_filename
+        )
+        try:
+            self._write_entry(entry, mesh, cell_function, facet_function)
+        except OSError as e:
+            LOGGER.warning(f"Could not cache mesh {mesh_filename} in {self._directory}: {e}")
+        return mesh, cell_function, facet_function
+
+    def _write_entry(
+            self,
+            entry: Path,
+            mesh: df.Mesh,
+            cell_function: Optional[df.MeshFunction],
+            facet_function: Optional[df.MeshFunction]
+    ) -> None:
+        """Write the arrays of a cache entry.
+
+        The entry is written to a temporary directory and renamed, so that readers never see
+        a partial entry.
+        """
+        tmp_entry = self._directory / f".{entry.name}.{os.getpid()}.tmp"
+        tmp_entry.mkdir(parents=True, exist_ok=True)
+        np.save(tmp_entry / "coordinates.npy", mesh.coordinates())
+        np.save(tmp_entry / "topology.npy", mesh.cells())
+        if cell_function is not None:
+            np.save(tmp_entry / "cell_markers.npy", cell_function.array())
+        if facet_function is not None:
+            facet_dim = mesh.topology().dim() - 1
+            mesh.init(facet_dim, 0)
+            facet_vertices = mesh.topology()(facet_dim, 0)().reshape(mesh.num_facets(), -1)
+            np.save(tmp_entry / "facet_vertices.npy", np.sort(facet_vertices, axis=1))
+            np.save(tmp_entry / "facet_markers.npy", facet_function.array())
+
+        meta = {
+            "cell_type": mesh.ufl_cell().cellname(),
+            "tdim": mesh.topology().dim(),
+            "gdim": mesh.geometry().dim(),
+        }
+        with (tmp_entry / "meta.yaml").open("w") as out_handle:
+            yaml.dump(meta, out_handle, default_flow_style=False)
+
+        try:
+            tmp_entry.rename(entry)
+        except OSError:
+            LOGGER.info(f"Mesh cache entry {entry} was written concurrently")
+            shutil.rmtree(tmp_entry)
+
+    def _read_entry(self, entry: Path) -> Tuple[df.Mesh, Optional[df.MeshFunction], Optional[df.MeshFunction]]:
+        """Build the mesh and the markers from the arrays of a cache entry."""
+        with (entry / "meta.yaml").open("r") as in_handle:
+            meta: Dict[str, Any] = yaml.safe_load(in_handle)
+        coordinates = np.load(entry / "coordinates.npy", mmap_mode="r")
+        topology = np.load(entry / "topology.npy", mmap_mode="r")
+
+        mesh = df.Mesh(df.MPI.comm_self)
+        editor = df.MeshEditor()
+        editor.open(mesh, meta["cell_type"], meta["tdim"], meta["gdim"])
+        editor.init_vertices(coordinates.shape[0])
+        editor.init_cells(topology.shape[0])
+        # The editor has no bulk insertion of cells. Convert once, rather than per cell
+        for cell, cell_vertices in enumerate(np.asarray(topology, dtype=np.uintp)):
+            editor.add_cell(cell, cell_vertices)
+        editor.close()
+        mesh.coordinates()[:] = coordinates     # The geometry in bulk, a writable view
+
+        cell_function = None
+        if (entry / "cell_markers.npy").exists():
+            cell_function = df.MeshFunction("size_t", mesh, meta["tdim"])
+            cell_function.set_values(np.load(entry / "cell_markers.npy", mmap_mode="r"))
+
+        facet_function = None
+        if (entry / "facet_markers.npy").exists():
+            # The facet numbering of the new mesh may differ, so match the facets by vertices
+            facet_dim = meta["tdim"] - 1
+            mesh.init(facet_dim, 0)
+            facet_vertices = mesh.topology()(facet_dim, 0)().reshape(mesh.num_facets(), -1)
+            cached_keys = _facet_keys(np.load(entry / "facet_vertices.npy", mmap_mode="r"))
+            cached_markers = np.load(entry / "facet_markers.npy", mmap_mode="r")
+            order = np.argsort(cached_keys)
+            positions = order[np.searchsorted(cached_keys, _facet_keys(facet_vertices), sorter=order)]
+            facet_function = df.MeshFunction("size_t", mesh, facet_dim)
+            facet_function.set_values(cached_markers[positions])
+        return mesh, cell_function, facet_function
@@ -0,0 +1,165 @@
+"""A content-addressed store of meshes, shared by casedirs and fields.
+
+Each mesh is written once, to `<store>/<hash>/mesh.xdmf`, where the hash is computed from the
+cell type, the global sizes and the vertex coordinates of each cell. The hash does not depend
+on the number of processes or the partitioning.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+
+import yaml
+import numpy as np
+import dolfin as df
+
+from mpi4py import MPI
+
+from pathlib import Path
+
+from typing import (
+    Any,
+    Dict,
+    Optional,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+MESH_REFERENCE_FILENAME = "mesh_reference.yaml"
+
+
+def _mix(words: np.ndarray) -> np.ndarray:
+    """The splitmix64 finaliser, vectorised over `words`."""
+    words = words + np.uint64(0x9E3779B97F4A7C15)
+    words = (words ^ (words >> np.uint64(30)))*np.uint64(0xBF58476D1CE4E5B9)
+    words = (words ^ (words >> np.uint64(27)))*np.uint64(0x94D049BB133111EB)
+    return words ^ (words >> np.uint64(31))
+
+
+def mesh_hash(mesh: df.Mesh) -> str:
+    """Return a hex digest of the geometry and topology of `mesh`.
+
+    Each owned cell is hashed from the coordinates of its vertices, and the cell hashes are
+    summed, so that the result is independent of the cell order and the partitioning.
+    """
+    tdim = mesh.topology().dim()
+    num_owned_cells = mesh.topology().ghost_offset(tdim)
+    cell_coordinates = mesh.coordinates()[mesh.cells()[:num_owned_cells]]
+    words = np.ascontiguousarray(cell_coordinates.reshape(num_owned_cells, -1)).view("u8")
+
+    lanes = np.zeros(2, dtype="u8")
+    with np.errstate(over="ignore"):
+        for lane, seed in enumerate((0x243F6A8885A308D3, 0x13198A2E03707344)):
+            cell_hashes = np.full(num_owned_cells, seed, dtype="u8")
+            for column in words.T:
+                cell_hashes = _mix(cell_hashes ^ column)
+            lanes[lane] = np.sum(cell_hashes, dtype="u8")
+
+    global_lanes = np.zeros_like(lanes)
+    mesh.mpi_comm().Allreduce(lanes, global_lanes, op=MPI.SUM)
+
+    digest = hashlib.sha256()
+    digest.update(mesh.ufl_cell().cellname().encode())
+    digest.update(np.array([
+        mesh.geometry().dim(),
+        mesh.num_entities_global(0),
+        mesh.num_entities_global(tdim)
+    ], dtype="u8").tobytes())
+    digest.update(global_lanes.tobytes())
+    return digest.hexdigest()[:32]
+
+
+def store_mesh_reference(directory: Path, reference: Dict[str, Any]) -> None:
+    """Write `reference` to `directory/mesh_reference.yaml`."""
+    with (Path(directory) / MESH_REFERENCE_FILENAME).open("w") as out_handle:
+        yaml.dump(reference, out_handle, default_flow_style=False)
+
+
+def load_mesh_reference(directory: Path) -> Optional[Dict[str, Any]]:
+    """Return the mesh reference in `directory`, or None if there is none."""
+    filename = Path(directory) / MESH_REFERENCE_FILENAME
+    if not filename.exists():
+        return None
+    with filename.open("r") as in_handle:
+        return yaml.safe_load(in_handle)
+
+
+class MeshStore:
+    """Write each distinct mesh once, and read it back by its hash."""
+
+    def __init__(self, directory: Path) -> None:
+        """Store the path of the store.
+
+        Arguments:
+            directory: The directory of the store. It is created on the first `store`.
+        """
+        self._directory = Path(directory)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def mesh_filename(self, mesh_hash: str) -> Path:
+        """Return the xdmf file of the mesh with hash `mesh_hash`."""
+        return self._directory / mesh_hash / "mesh.xdmf"
+
+    def store(self, mesh: df.Mesh) -> str:
+        """Write `mesh` unless it is already in the store, and return its hash."""
+        _mesh_hash = mesh_hash(mesh)
+        comm = mesh.mpi_comm()
+        rank = comm.Get_rank()
+
+        exists = None
+        if rank == 0:
+            exists = self.mesh_filename(_mesh_hash).exists()
+        if comm.bcast(exists, root=0):
+            LOGGER.debug(f"Mesh {_mesh_hash} is already in {self._directory}")
+            return _mesh_hash
+
+        # Write to a temporary directory and rename it, so that concurrent writers are safe
+        tmp_directory = self._directory / f".{_mesh_hash}.{os.getpid()}.tmp"
+        if rank == 0:
+            tmp_directory.mkdir(parents=True, exist_ok=True)
+        comm.barrier()
+        with df.XDMFFile(comm, str(tmp_directory / "mesh.xdmf")) as meshfile:
+            meshfile.write(mesh)
+        comm.barrier()
+
+        if rank == 0:
+            try:
+                tmp_directory.rename(self._directory / _mesh_hash)
+            except OSError:
+                LOGGER.info(f"Mesh {_mesh_hash} was written concurrently to {self._directory}")
+                shutil.rmtree(tmp_directory)
+        comm.barrier()
+        return _mesh_hash
+
+    def load(self, mesh_hash: str, comm: Any = None) -> df.Mesh:
+        """Read the mesh with hash `mesh_hash`."""
+        filename = self.mesh_filename(mesh_hash)
+        if not filename.exists():
+            raise FileNotFoundError(f"Mesh {mesh_hash} is not in {self._directory}")
+        if comm is None:
+            comm = df.MPI.comm_world
+        mesh = df.Mesh(comm)
+        with df.XDMFFile(comm, str(filename)) as infile:
+            infile.read(mesh)
+        return mesh
+
+    def reference(self, mesh_hash: str, directory: Path) -> Dict[str, Any]:
+        """Return the mesh reference to be stored in `directory`.
+
+        The store is given relative to `directory` so that both can be moved together.
+        """
+        return {
+            "mesh": mesh_hash,
+            "mesh_store": os.path.relpath(self._directory.resolve(), Path(directory).resolve()),
+        }
+
+    @classmethod
+    def from_reference(cls, reference: Dict[str, Any], directory: Path) -> "MeshStore":
+        """Return the store of a mesh reference in `directory`."""
+        return cls(Path(directory) / reference["mesh_store"])
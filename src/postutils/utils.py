@@ -9,6 +9,12 @@ import yaml
 
 import logging
 import os
+import re
+
+from .mesh_cache import (
+    MeshCache,
+    read_xdmf_mesh,
+)
 
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
@@ -58,12 +64,15 @@ def get_mesh(
     directory: Path,
     name: str,
     facet_function_name: str = None,
-    cell_function_name: str = None
+    cell_function_name: str = None,
+    use_cache: bool = True
 ) -> tp.Tuple[df.Mesh, df.MeshFunction, df.MeshFunction]:
-    mesh = df.Mesh()
-    mesh_name = str(directory / f"{name}.xdmf")
-    with df.XDMFFile(mesh_name) as infile:
-        infile.read(mesh)
+    """Read the mesh `{name}.xdmf` and its cell and facet functions from `directory`.
+
+    The mesh functions default to `{name}_cf.xdmf` and `{name}_ff.xdmf`, and are None if the
+    files do not exist. If `use_cache`, the mesh is read through a `MeshCache`.
+    """
+    mesh_name = directory / f"{name}.xdmf"
 
     if cell_function_name is None:
         cell_function_name = f"{name}_cf.xdmf"
@@ -71,14 +80,8 @@ def get_mesh(
     if not _cell_function_name.suffix == ".xdmf":
         _cell_function_name = Path(f"{_cell_function_name}.xdmf")
     if not _cell_function_name.exists():
-        cell_function = None
         logging.info(f"Could not read cell function, file '{_cell_function_name} does not exist")
-    else:
-        mvc = df.MeshValueCollection("size_t", mesh, mesh.geometry().dim())
-        with df.XDMFFile(str(_cell_function_name)) as infile:
-            infile.read(mvc)
-            # infile.read(mvc, "tetra")
-        cell_function = df.MeshFunction("size_t", mesh, mvc)
+        _cell_function_name = None
 
     if facet_function_name is None:
         facet_function_name = f"{name}_ff.xdmf"
@@ -86,14 +89,12 @@ def get_mesh(
     if not _facet_function_name.suffix == ".xdmf":
         _facet_function_name = Path(f"{_facet_function_name}.xdmf")
     if not _facet_function_name.exists():
-        facet_function = None
         logging.info(f"Could not read facet function, file '{_facet_function_name} does not exist")
-    else:
-        mvc = df.MeshValueCollection("size_t", mesh, mesh.geometry().dim() - 1)
-        with df.XDMFFile(str(_facet_function_name)) as infile:
-            infile.read(mvc)
-        facet_function = df.MeshFunction("size_t", mesh, mvc)
-    return mesh, cell_function, facet_function
+        _facet_function_name = None
+
+    if use_cache:
+        return MeshCache().load(mesh_name, _cell_function_name, _facet_function_name)
+    return read_xdmf_mesh(mesh_name, _cell_function_name, _facet_function_name)
 
 
 def save_mesh(
@@ -189,6 +190,46 @@ def get_part_number(timestep: int, break_time_step: tp.Optional[int]) -> str:
     return f"_part{part_number}"
 
 
+def get_part_filenames(directory: Path, stem: str, suffix: str) -> tp.List[Path]:
+    """Return the files `{stem}_part{n}{suffix}` sorted by `n`.
+
+    If there are no parts, return `[{stem}{suffix}]`.
+    """
+    directory = Path(directory)
+    pattern = re.compile(rf"{re.escape(stem)}_part(\d+){re.escape(suffix)}")
+    part_numbers = {}
+    for path in directory.glob(f"{stem}_part*{suffix}"):
+        match = pattern.fullmatch(path.name)
+        if match is not None:
+            part_numbers[path] = int(match.group(1))
+    if not part_numbers:
+        return [directory / f"{stem}{suffix}"]
+    return sorted(part_numbers, key=part_numbers.get)
+
+
+def coarse_box_mesh(mesh: df.Mesh, resolution: int) -> df.Mesh:
+    """Return a serial box mesh covering the bounding box of `mesh`.
+
+    The longest side has `resolution` cells, and the other sides proportionally fewer. The
+    mesh is created on `MPI.comm_self`, so every process has the whole coarse mesh.
+    """
+    from mpi4py import MPI
+    comm = mesh.mpi_comm()
+    coordinates = mesh.coordinates()
+    lower = np.empty(coordinates.shape[1])
+    upper = np.empty(coordinates.shape[1])
+    comm.Allreduce(coordinates.min(axis=0), lower, op=MPI.MIN)
+    comm.Allreduce(coordinates.max(axis=0), upper, op=MPI.MAX)
+
+    extent = upper - lower
+    num_cells = np.maximum(1, np.ceil(resolution*extent/extent.max())).astype(int)
+    if lower.size == 1:
+        return df.IntervalMesh(MPI.COMM_SELF, int(num_cells[0]), lower[0], upper[0])
+    if lower.size == 2:
+        return df.RectangleMesh(MPI.COMM_SELF, df.Point(*lower), df.Point(*upper), *map(int, num_cells))
+    return df.BoxMesh(MPI.COMM_SELF, df.Point(*lower), df.Point(*upper), *map(int, num_cells))
+
+
 def check_bounds(points: np.ndarray, limit: float = 100) -> bool:
     span = np.max(points, axis=0) - np.min(points, axis=0)
     max_span = np.max(span)
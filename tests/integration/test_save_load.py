@@ -1,5 +1,6 @@
 """Test that we can load the saved data, and get everything back."""
 import h5py
+import pytest
 import tempfile
 
 import numpy as np
@@ -17,6 +18,9 @@ from post import (
 from postfields import (
     Field,
 )
+from postfields.hdf5_series import HDF5SeriesReader
+
+from postutils import get_part_filenames
 
 from postspec import (
     FieldSpec,
@@ -67,6 +71,7 @@ def test_save_load():
         assert np.sum(solver.mesh.cells() - loaded_mesh.cells()) == 0
         assert np.sum(solver.cell_function.array() - loaded_cell_function.array()) == 0
         assert np.sum(solver.facet_function.array() - loaded_facet_function.array()) == 0
+        assert loader.load_mesh_function("cell_function") is loaded_cell_function
 
         # Compare functions and time checkpoint
         for timestep, (loaded_t, loaded_u) in enumerate(loader.load_checkpoint("u")):
@@ -77,7 +82,219 @@ def test_save_load():
         for timestep, (loaded_t, loaded_u) in enumerate(loader.load_field("u")):
             diff = np.sum(time_func_dict[timestep].vector().get_local() - loaded_u.vector().get_local())
             assert diff == 0, diff
+        assert not loader._open_files       # Closed when the iterator is exhausted
+
+        # Closed when the iterator is closed early
+        frames = loader.load_field("u")
+        next(frames)
+        assert loader._open_files
+        frames.close()
+        assert not loader._open_files
+
+        # The function spaces are cached
+        assert next(loader.load_field("u"))[1].function_space() == loaded_u.function_space()
+        # The checkpoint's "Lagrange" and the default "CG" are the same element and space
+        assert next(loader.load_checkpoint("u"))[1].function_space() == loaded_u.function_space()
+        assert len(loader._function_spaces) == 1
+        loader.clear_cache()
+        assert loader.load_mesh_function("cell_function") is not loaded_cell_function
+
+        # Compare prefetched checkpoints, keeping them all before releasing
+        with loader.prefetch_field("u", backend="checkpoint", read_ahead=2) as frames:
+            held_frames = list(frames)
+            for frame in held_frames:
+                diff = np.sum(time_func_dict[frame.timestep].vector().get_local() - frame.values)
+                assert diff == 0, diff
+                frame.release()
+        assert not loader._open_files       # The prefetcher used its own files
+
+        # Compare the raw arrays mapped to the vertices
+        dof_to_vertex = loader.dof_to_vertex("u")
+        vertex_values = np.empty(dof_to_vertex.size)
+        for timestep, loaded_t, values in loader.iter_arrays("u", memmap=True):
+            vertex_values[dof_to_vertex] = values
+            expected = time_func_dict[timestep].compute_vertex_values(solver.mesh)
+            assert np.allclose(vertex_values, expected)
+
+
+@pytest.mark.parametrize("async_write", [False, True])
+def test_save_load_hdf5_series(async_write):
+    """Save with `save_as="hdf5_series"` and compare the loaded functions."""
+    df.set_log_level(100)       # supress dolfin logger
+    solver = SubdomainSolver(N=32)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        casedir = Path(tmpdirname) / "test_pp_casedir"
+
+        field_spec = FieldSpec(stride_timestep=2, save_as=("hdf5_series",))
+        saver = Saver(SaverSpec(casedir=str(casedir), async_write=async_write))
+        saver.store_mesh(solver.mesh)
+        saver.add_field(Field("u", field_spec))
+
+        time_func_dict = {}
+        for timestep, (t, u) in enumerate(solver.solve(0, 20, 1.0)):
+            saver.update(t, timestep, {"u": u})
+            if timestep % 2 == 0:
+                time_func_dict[t] = u.copy(True)
+        saver.close()
+
+        loader = Loader(LoaderSpec(casedir=str(casedir)))
+        loaded_times = []
+        for loaded_t, loaded_u in loader.load_field("u"):
+            loaded_times.append(loaded_t)
+            diff = np.sum(time_func_dict[loaded_t].vector().get_local() - loaded_u.vector().get_local())
+            assert diff == 0, diff
+        assert loaded_times == list(time_func_dict.keys())
+
+        # Random access
+        loaded_t, loaded_u = loader.get_field("u", 4)
+        assert np.sum(time_func_dict[loaded_t].vector().get_local() - loaded_u.vector().get_local()) == 0
+        with pytest.raises(KeyError):
+            loader.get_field("u", 5)
+        assert loader.get_field_at_time("u", loaded_times[3] + 0.1)[0] == loaded_times[3]
+        range_times = [t for t, _ in loader.load_field_range("u", loaded_times[1], loaded_times[7], stride=2)]
+        assert range_times == loaded_times[1:7:2]
+        assert not loader._series_readers
+
+        dof_to_vertex = loader.dof_to_vertex("u")
+        vertex_values = np.empty(dof_to_vertex.size)
+        for timestep, loaded_t, values in loader.iter_arrays("u"):
+            vertex_values[dof_to_vertex] = values
+            assert np.allclose(vertex_values, time_func_dict[loaded_t].compute_vertex_values(solver.mesh))
+        loader.close()
+
+
+def test_save_load_interpolated_interval():
+    """Save on a `save_interval` grid with a variable dt, and load the frames back."""
+    df.set_log_level(100)       # supress dolfin logger
+    mesh = df.UnitSquareMesh(4, 4)
+    u = df.Function(df.FunctionSpace(mesh, "CG", 1))
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        casedir = Path(tmpdirname) / "test_pp_casedir"
+        field_spec = FieldSpec(save_as=("hdf5",), save_interval=0.5, interpolate_to_interval=True)
+        saver = Saver(SaverSpec(casedir=str(casedir)))
+        saver.store_mesh(mesh)
+        saver.add_field(Field("u", field_spec))
+
+        # The value is the time, so each frame should equal its grid time
+        for timestep, t in enumerate([0.0, 0.2, 0.7, 0.8, 1.6, 2.0]):
+            u.vector()[:] = t
+            saver.update(t, timestep, {"u": u})
+        saver.close()
+
+        loader = Loader(LoaderSpec(casedir=str(casedir)))
+        loaded = [(loaded_t, loaded_u.vector().max()) for loaded_t, loaded_u in loader.load_field("u")]
+        assert np.allclose(loaded, [(t, t) for t in (0.0, 0.5, 1.0, 1.5, 2.0)])
+        assert loader.get_field("u", 3)[0] == 1.5       # The timesteps are grid indices
+        loader.close()
+
+
+def test_save_load_parts():
+    """Save in parts, and read the parts and the virtual series back."""
+    df.set_log_level(100)       # supress dolfin logger
+    mesh = df.UnitSquareMesh(4, 4)
+    u = df.Function(df.FunctionSpace(mesh, "CG", 1))
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        casedir = Path(tmpdirname) / "test_pp_casedir"
+        field_spec = FieldSpec(save_as=("hdf5", "hdf5_series"), num_steps_in_part=3)
+        saver = Saver(SaverSpec(casedir=str(casedir)))
+        saver.store_mesh(mesh)
+        saver.add_field(Field("u", field_spec))
+        for timestep in range(8):
+            u.vector()[:] = timestep
+            saver.update(0.5*timestep, timestep, {"u": u})
+        saver.close()
+
+        field_directory = casedir / "u"
+        assert [path.name for path in get_part_filenames(field_directory, "u", ".hdf5")] == [
+            "u_part0.hdf5", "u_part1.hdf5", "u_part2.hdf5"
+        ]
+        assert len(get_part_filenames(field_directory, "u_series", ".hdf5")) == 3
+
+        loader = Loader(LoaderSpec(casedir=str(casedir)))
+        for backend in ("hdf5", "hdf5_series"):
+            loaded = [
+                (loaded_t, loaded_u.vector().max())
+                for loaded_t, loaded_u in loader.load_field_range("u", backend=backend)
+            ]
+            assert loaded == [(0.5*timestep, timestep) for timestep in range(8)]
+        loader.close()
+
+        with HDF5SeriesReader(field_directory / "u_series.hdf5", "u") as reader:
+            assert list(reader.timesteps) == list(range(8))
+            assert np.all(reader.read(4) == 4)
+            assert reader.dof_to_vertex.size == u.vector().size()
+
+
+def test_save_load_single_file():
+    """Save two fields to the shared file, restart, and load them together."""
+    df.set_log_level(100)       # supress dolfin logger
+    mesh = df.UnitSquareMesh(4, 4)
+    function_space = df.FunctionSpace(mesh, "CG", 1)
+    u, v = df.Function(function_space), df.Function(function_space)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        casedir = Path(tmpdirname) / "test_pp_casedir"
+        # The second run is a restart, and the third restarts from an earlier timestep
+        expected_values = {}
+        for run, (first_timestep, last_timestep) in enumerate(((0, 4), (4, 8), (5, 7))):
+            saver = Saver(SaverSpec(casedir=str(casedir), single_file=True, overwrite_casedir=True))
+            saver.store_mesh(mesh)
+            saver.add_field(Field("u", FieldSpec(save_as=("hdf5_series",))))
+            saver.add_field(Field("v", FieldSpec(save_as=("hdf5_series",), stride_timestep=2)))
+            for timestep in range(first_timestep, last_timestep):
+                expected_values[timestep] = timestep + 100*run
+                u.vector()[:] = expected_values[timestep]
+                v.vector()[:] = -expected_values[timestep]
+                saver.update(0.5*timestep, timestep, {"u": u, "v": v})
+            saver.close()
+
+        # The third run overwrote timestep 5 and 6, and dropped 7
+        loader = Loader(LoaderSpec(casedir=str(casedir)))
+        assert [t for t, _ in loader.load_field("u")] == [0.5*timestep for timestep in range(7)]
+        assert loader.get_field("u", 6)[1].vector().max() == expected_values[6]
+
+        loaded_timesteps = []
+        for timestep, time, functions in loader.load_fields(["u", "v"]):
+            loaded_timesteps.append(timestep)
+            assert time == 0.5*timestep
+            assert np.all(functions["u"].vector().get_local() == expected_values[timestep])
+            assert np.all(functions["v"].vector().get_local() == -expected_values[timestep])
+        assert loaded_timesteps == [0, 2, 4, 6]
+        loader.close()
+
+
+def test_clear_cache_after_append():
+    """Read the shared file between two runs appending to it."""
+    df.set_log_level(100)       # supress dolfin logger
+    mesh = df.UnitSquareMesh(4, 4)
+    u = df.Function(df.FunctionSpace(mesh, "CG", 1))
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        casedir = Path(tmpdirname) / "test_pp_casedir"
+        loader = None
+        for first_timestep, last_timestep in ((0, 4), (4, 8)):
+            saver = Saver(SaverSpec(casedir=str(casedir), single_file=True, overwrite_casedir=True))
+            saver.store_mesh(mesh)
+            saver.add_field(Field("u", FieldSpec(save_as=("hdf5_series",))))
+            for timestep in range(first_timestep, last_timestep):
+                u.vector()[:] = timestep
+                saver.update(0.5*timestep, timestep, {"u": u})
+            saver.close()
+
+            if loader is None:
+                loader = Loader(LoaderSpec(casedir=str(casedir)))
+            loaded_t, loaded_u = loader.get_field("u", last_timestep - 1)
+            assert loaded_t == 0.5*(last_timestep - 1)
+            assert np.all(loaded_u.vector().get_local() == last_timestep - 1)
+            loader.clear_cache()        # Closes the shared file before the next run appends to it
+
+        assert [t for t, _ in loader.load_field("u")] == [0.5*timestep for timestep in range(8)]
+        loader.close()
 
 
 if __name__ == "__main__":
     test_save_load()
+    test_save_load_hdf5_series(async_write=True)
@@ -0,0 +1,20 @@
+import numpy as np
+import dolfin as df
+
+from postfields import ActivationTimeField
+from postspec import FieldSpec
+
+
+def test_interpolated_crossing_times():
+    mesh = df.UnitIntervalMesh(4)
+    function = df.Function(df.FunctionSpace(mesh, "CG", 1))
+    activation_field = ActivationTimeField("test", FieldSpec(), threshold=0.0, recovery_threshold=-10.0)
+
+    # Upstroke between t = 1 and t = 2, recovery between t = 3 and t = 4
+    activation_field.before_first_compute(function)
+    for time, value in enumerate([-80.0, -60.0, 20.0, 0.0, -20.0, -80.0, 20.0]):
+        function.vector()[:] = value
+        activation_field.compute(float(time), function)
+
+    assert np.allclose(activation_field.activation_time, 1.75)
+    assert np.allclose(activation_field.recovery_time, 3.5)
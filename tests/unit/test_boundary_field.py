@@ -0,0 +1,23 @@
+import numpy as np
+import dolfin as df
+
+from postfields import BoundaryField
+from postspec import FieldSpec
+
+
+def test_boundary_restriction_matches_interpolation():
+    mesh = df.UnitCubeMesh(4, 4, 4)
+    function_space = df.FunctionSpace(mesh, "CG", 1)
+    function = df.interpolate(df.Expression("sin(x[0]) + x[1]*x[2]", degree=1), function_space)
+
+    boundary_field = BoundaryField("test", FieldSpec(), mesh)
+    restricted = boundary_field.restrict(function).copy(deepcopy=True)
+
+    expected = df.Function(restricted.function_space())
+    df.LagrangeInterpolator.interpolate(expected, function)
+    assert np.allclose(restricted.vector().get_local(), expected.vector().get_local())
+
+    # The map is reused when the values change
+    function.vector()[:] *= 2
+    restricted = boundary_field.restrict(function)
+    assert np.allclose(restricted.vector().get_local(), 2*expected.vector().get_local())
@@ -0,0 +1,55 @@
+import numpy as np
+import dolfin as df
+
+from postfields import Field
+from postspec import FieldSpec
+
+
+def _saved_timesteps(field, values, times=None):
+    """Return the timesteps `field` saves, without writing anything."""
+    mesh = df.UnitIntervalMesh(4)
+    function = df.Function(df.FunctionSpace(mesh, "CG", 1))
+    if times is None:
+        times = [float(timestep) for timestep in range(len(values))]
+
+    saved = []
+    for timestep, (time, value) in enumerate(zip(times, values)):
+        function.vector()[:] = value
+        for frame_time, _ in field.frames_to_store(timestep, time, function):
+            saved.append((timestep, frame_time))
+    return saved
+
+
+def test_save_threshold_and_max_save_gap():
+    field = Field("u", FieldSpec(save_threshold=0.5, max_save_gap=3))
+    values = [0.0, 0.1, 0.2, 0.8, 0.9, 1.0, 1.1, 1.2, 2.0]
+    saved = [timestep for timestep, _ in _saved_timesteps(field, values)]
+
+    # 0: first save, 3: change of 0.8 > 0.5, 6: forced by `max_save_gap`,
+    # 8: change of 0.9 since timestep 6
+    assert saved == [0, 3, 6, 8]
+
+
+def test_relative_l2_threshold():
+    field = Field("u", FieldSpec(save_threshold=0.1, save_threshold_norm="relative_l2"))
+    saved = [timestep for timestep, _ in _saved_timesteps(field, [1.0, 1.05, 1.15, 1.2])]
+    assert saved == [0, 2]
+
+
+def test_save_interval_with_variable_dt():
+    times = [0.0, 0.3, 1.2, 1.5, 2.0, 3.7]
+
+    field = Field("u", FieldSpec(save_interval=1.0))
+    assert _saved_timesteps(field, times, times) == [(0, 0.0), (2, 1.2), (4, 2.0), (5, 3.7)]
+
+    # The value is the time, so the interpolated frames equal their grid time
+    field = Field("u", FieldSpec(save_interval=1.0, interpolate_to_interval=True))
+    mesh = df.UnitIntervalMesh(4)
+    function = df.Function(df.FunctionSpace(mesh, "CG", 1))
+    frames = []
+    for timestep, time in enumerate(times):
+        function.vector()[:] = time
+        for frame_time, frame_data in field.frames_to_store(timestep, time, function):
+            frames.append((timestep, frame_time, frame_data.vector().max()))
+    assert [(timestep, frame_time) for timestep, frame_time, _ in frames] == [(0, 0.0), (2, 1.0), (4, 2.0), (5, 3.0)]
+    assert np.allclose([value for _, _, value in frames], [0.0, 1.0, 2.0, 3.0])
@@ -0,0 +1,33 @@
+import numpy as np
+import dolfin as df
+
+from pathlib import Path
+
+from postfields import Field
+from postspec import FieldSpec
+
+
+def test_preview_inside_domain(tmpdir):
+    """The generated preview of an L-shaped domain leaves out the missing quadrant."""
+    square = df.UnitSquareMesh(8, 8)
+    cell_function = df.MeshFunction("size_t", square, 2, 1)
+    df.CompiledSubDomain("x[0] > 0.5 && x[1] > 0.5").mark(cell_function, 0)
+    mesh = df.SubMesh(square, cell_function, 1)
+    function = df.interpolate(df.Expression("1 + x[0] - 2*x[1]", degree=1), df.FunctionSpace(mesh, "CG", 1))
+
+    field = Field("u", FieldSpec(save_as=(), preview_resolution=4))
+    field.path = Path(tmpdir)       # mimick saver behaviour
+    field.update(timestep=0, time=0.0, data=function)
+    field.close()
+    assert (Path(tmpdir) / "u" / "u_preview.xdmf").exists()
+
+    # The box has 4x4 squares of 2 cells, and the 2x2 squares of the missing quadrant are dropped
+    preview_mesh = field._preview_mesh
+    assert preview_mesh.num_cells() == 24
+    midpoints = preview_mesh.coordinates()[preview_mesh.cells()].mean(axis=1)
+    assert not np.any((midpoints[:, 0] > 0.5) & (midpoints[:, 1] > 0.5))
+
+    if df.MPI.rank(df.MPI.comm_world) == 0:
+        coordinates = preview_mesh.coordinates()
+        vertex_values = field._preview_function.compute_vertex_values(preview_mesh)
+        assert np.allclose(vertex_values, 1 + coordinates[:, 0] - 2*coordinates[:, 1])
@@ -0,0 +1,41 @@
+import pytest
+
+import numpy as np
+
+from pathlib import Path
+
+from postfields.hdf5_series import (
+    HDF5SeriesReader,
+    HDF5SeriesWriter,
+)
+from postfields.storage_policy import StoragePolicy
+
+
+def test_delta_encoding_round_trip(tmpdir):
+    filename = Path(tmpdir) / "series.hdf5"
+    quantisation_error = 1e-4
+    rows = np.cumsum(np.random.RandomState(42).normal(scale=0.1, size=(10, 50)), axis=0)
+
+    writer = HDF5SeriesWriter(
+        filename,
+        "u",
+        rows.shape[1],
+        (0, rows.shape[1]),
+        policy=StoragePolicy(quantisation_error=quantisation_error),
+        keyframe_interval=4
+    )
+    for timestep, row in enumerate(rows):
+        writer.write(timestep, 0.1*timestep, row)
+    writer.close()
+
+    with HDF5SeriesReader(filename, "u") as reader:
+        # Random access to a delta row, then sequential reads from the cache
+        assert np.all(np.abs(reader.read(6) - rows[6]) <= quantisation_error)
+        for index, row in enumerate(rows):
+            assert np.all(np.abs(reader.read(index) - row) <= quantisation_error)
+        assert np.all(np.abs(reader.read(9, (10, 20)) - rows[9, 10:20]) <= quantisation_error)
+
+
+def test_delta_encoding_requires_quantisation(tmpdir):
+    with pytest.raises(ValueError):
+        HDF5SeriesWriter(tmpdir / "series.hdf5", "u", 10, (0, 10), keyframe_interval=4)
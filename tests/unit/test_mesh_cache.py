@@ -0,0 +1,54 @@
+import numpy as np
+import dolfin as df
+
+from pathlib import Path
+
+from postutils import (
+    save_mesh,
+    get_mesh,
+    MeshCache,
+)
+
+
+def cache_entries():
+    return [path for path in MeshCache().directory.iterdir() if (path / "meta.yaml").exists()]
+
+
+def test_mesh_cache_round_trip(tmpdir, monkeypatch):
+    monkeypatch.setenv("XALPOST_MESH_CACHE", str(tmpdir / "cache"))
+    directory = Path(tmpdir)
+
+    mesh = df.UnitSquareMesh(6, 6)
+    cell_function = df.MeshFunction("size_t", mesh, 2, 0)
+    df.CompiledSubDomain("x[0] > 0.5").mark(cell_function, 3)
+    facet_function = df.MeshFunction("size_t", mesh, 1, 0)
+    df.CompiledSubDomain("near(x[1], 0) && on_boundary").mark(facet_function, 7)
+    save_mesh(directory, "square", mesh=mesh, cell_function=cell_function, facet_function=facet_function)
+
+    uncached = get_mesh(directory, "square", use_cache=False)
+    get_mesh(directory, "square")       # Fills the cache
+    assert len(cache_entries()) == 1
+    cached = get_mesh(directory, "square")
+
+    assert np.allclose(cached[0].coordinates(), uncached[0].coordinates())
+    assert np.all(cached[0].cells() == uncached[0].cells())
+    assert np.all(cached[1].array() == uncached[1].array())
+    for facet in df.facets(cached[0]):
+        vertices = set(facet.entities(0))
+        expected = [f for f in df.facets(uncached[0]) if set(f.entities(0)) == vertices][0]
+        assert cached[2][facet] == uncached[2][expected]
+
+    # Changing the markers invalidates the entry
+    facet_function.set_all(1)
+    save_mesh(directory, "square", facet_function=facet_function)
+    assert np.all(get_mesh(directory, "square")[2].array() == 1)
+    assert len(cache_entries()) == 2
+
+    # A corrupt entry is replaced
+    entry = MeshCache().directory / MeshCache().key(
+        directory / "square.xdmf", directory / "square_cf.xdmf", directory / "square_ff.xdmf"
+    )
+    (entry / "meta.yaml").write_text("cell_type: [")
+    assert np.all(get_mesh(directory, "square")[2].array() == 1)
+    assert np.all(get_mesh(directory, "square")[2].array() == 1)
+    assert "cell_type: [" not in (entry / "meta.yaml").read_text()
@@ -5,6 +5,7 @@ import numpy as np
 import dolfin as df
 
 from postfields import PointField
+from postfields.probe_engine import ProbeEngine
 from postspec import FieldSpec
 from pathlib import Path
 
@@ -29,20 +30,36 @@ def test_point_field_2(function, points):
         pf.update(timestep=1, time=0.1, data=function)
         function.vector()[:] = 2
         pf.update(timestep=2, time=0.2, data=function)
+        pf.close()
 
-        msg = (pf.path / f"probes_{point_field_name}.txt")
-        assert (pf.path / f"probes_{point_field_name}.txt").exists(), msg
+        msg = (pf.path / f"probes_{point_field_name}.bin")
+        assert (pf.path / f"probes_{point_field_name}.bin").exists(), msg
 
-        msg = (tmpdir / f"{point_field_name}" / f"probes_{point_field_name}.txt")
-        assert (tmpdir / f"{point_field_name}" / f"probes_{point_field_name}.txt").exists(), msg
-        data = read_point_values(
-            path=(tmpdir / f"{point_field_name}" / f"probes_{point_field_name}.txt")
-        )
+        msg = (tmpdir / f"{point_field_name}" / f"probes_{point_field_name}.bin")
+        assert (tmpdir / f"{point_field_name}" / f"probes_{point_field_name}.bin").exists(), msg
+        data = np.array(read_point_values(
+            path=(tmpdir / f"{point_field_name}" / f"probes_{point_field_name}.bin")
+        ))
 
     # First element is time, second is data
     assert np.allclose(data, [[0.1] + [1]*len(points), [0.2] + [2]*len(points)])
 
 
+def test_probe_engine_mixed_space():
+    mesh = df.UnitSquareMesh(4, 4)
+    element = df.FiniteElement("CG", mesh.ufl_cell(), 1)
+    function_space = df.FunctionSpace(mesh, df.MixedElement((element, element)))
+    function = df.interpolate(df.Expression(("x[0]", "2*x[1]"), degree=1), function_space)
+    points = np.array([[0.3, 0.6], [0.55, 0.1]])
+
+    values = ProbeEngine(function_space, points).evaluate(function.vector())
+    sub_values = ProbeEngine(function_space, points, sub_field_index=1).evaluate(function.vector())
+
+    if df.MPI.rank(df.MPI.comm_world) == 0:
+        assert np.allclose(values, np.column_stack((points[:, 0], 2*points[:, 1])))
+        assert np.allclose(sub_values[:, 0], 2*points[:, 1])
+
+
 @pytest.fixture
 def function():
     mesh = df.UnitSquareMesh(2, 2)
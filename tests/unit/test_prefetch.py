@@ -0,0 +1,56 @@
+import threading
+
+import numpy as np
+
+from post.prefetch import FramePrefetcher
+
+
+class FakeVector:
+    def __init__(self, size: int) -> None:
+        self.values = np.zeros(size)
+
+    def local_size(self) -> int:
+        return self.values.size
+
+    def get_local(self) -> np.ndarray:
+        return self.values.copy()
+
+
+class FakeFunction:
+    def __init__(self, size: int) -> None:
+        self._vector = FakeVector(size)
+
+    def vector(self) -> FakeVector:
+        return self._vector
+
+
+def read_frame(position: int, function: FakeFunction) -> None:
+    function.vector().values[:] = position
+
+
+def test_close_while_holding_frames():
+    """Leave the `with` block early while the reader waits for the memory of held frames."""
+    held_frames = []
+    closed_files = []
+
+    def consume() -> None:
+        # Room for two frames of 10 doubles
+        with FramePrefetcher(read_frame, FakeFunction(10), range(8), range(8), np.arange(8.0),
+                             read_ahead=4, max_bytes=160,
+                             close_files=lambda: closed_files.append(True)) as frames:
+            for frame in frames:
+                held_frames.append(frame)
+                if len(held_frames) == 2:
+                    break
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    consumer.join(timeout=10)
+    assert not consumer.is_alive()
+    assert closed_files == [True]       # The reader thread closed its files
+
+    # The held frames are still valid
+    assert [frame.timestep for frame in held_frames] == [0, 1]
+    assert np.all(held_frames[1].values == 1)
+    for frame in held_frames:
+        frame.release()
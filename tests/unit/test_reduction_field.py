@@ -0,0 +1,25 @@
+import numpy as np
+import dolfin as df
+
+from postfields import ReductionField
+from postspec import FieldSpec
+
+
+def test_reductions_per_tag():
+    mesh = df.UnitSquareMesh(8, 8)
+    cell_function = df.MeshFunction("size_t", mesh, mesh.geometry().dim())
+    cell_function.set_all(1)
+    df.CompiledSubDomain("x[0] >= 0.5 - DOLFIN_EPS").mark(cell_function, 2)
+
+    function_space = df.FunctionSpace(mesh, "CG", 1)
+    function = df.interpolate(df.Expression("x[0]", degree=1), function_space)
+
+    reduction_field = ReductionField("test", FieldSpec(), cell_function)
+    reduction_field.before_first_compute(function)
+    reductions = reduction_field.compute(function)
+
+    if df.MPI.rank(df.MPI.comm_world) == 0:
+        assert reduction_field.tags == [1, 2]
+        # integral, average, min, max
+        assert np.allclose(reductions[0], [0.125, 0.25, 0.0, 0.5])
+        assert np.allclose(reductions[1], [0.375, 0.75, 0.5, 1.0])
@@ -0,0 +1,57 @@
+import numpy as np
+import dolfin as df
+
+from pathlib import Path
+
+from postfields import (
+    SliceField,
+    LineField,
+)
+from postspec import FieldSpec
+
+from post import read_sampled_values
+
+
+def linear(points: np.ndarray) -> np.ndarray:
+    """The function interpolated exactly by CG1 in `test_slice_and_line_field`."""
+    return 1 + points[..., 0] + 2*points[..., 1] - 3*points[..., 2]
+
+
+def test_slice_and_line_field(tmpdir):
+    mesh = df.UnitCubeMesh(4, 4, 4)
+    function = df.interpolate(df.Expression("1 + x[0] + 2*x[1] - 3*x[2]", degree=1),
+                              df.FunctionSpace(mesh, "CG", 1))
+    casedir = Path(tmpdir)
+
+    origin = np.array([0.1, 0.2, 0.3])
+    axes = np.array([[0.6, 0.0, 0.2], [0.0, 0.7, 0.0]])
+    vertices = np.array([[0.1, 0.2, 0.4], [0.9, 0.2, 0.4], [0.9, 1.0, 0.4]])
+
+    fields = [
+        SliceField("slice", FieldSpec(), origin, axes, (4, 3)),
+        LineField("line", FieldSpec(), vertices, 5),
+    ]
+    for field in fields:
+        field.path = casedir        # mimick saver behaviour
+        for timestep in range(2):
+            field.update(timestep=timestep, time=0.1*timestep, data=function)
+        field.close()
+
+    if df.MPI.rank(df.MPI.comm_world) != 0:
+        return
+
+    # The slice grid is row major in the two axes
+    s, t = np.meshgrid(np.linspace(0, 1, 4), np.linspace(0, 1, 3), indexing="ij")
+    slice_points = origin + s[..., None]*axes[0] + t[..., None]*axes[1]
+    times, values = read_sampled_values(path=casedir, name="slice")
+    assert np.allclose(times, [0, 0.1])
+    assert values.shape == (2, 4, 3, 1)
+    assert np.allclose(values[..., 0], linear(slice_points))
+
+    # The two segments are equally long, so the middle sample is the kink
+    line_points = np.array([
+        [0.1, 0.2, 0.4], [0.5, 0.2, 0.4], [0.9, 0.2, 0.4], [0.9, 0.6, 0.4], [0.9, 1.0, 0.4]
+    ])
+    times, values = read_sampled_values(path=casedir, name="line")
+    assert values.shape == (2, 5, 1)
+    assert np.allclose(values[..., 0], linear(line_points))
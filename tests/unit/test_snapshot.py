@@ -0,0 +1,42 @@
+import pytest
+
+import numpy as np
+import dolfin as df
+
+from pathlib import Path
+
+from post.snapshot import (
+    SnapshotWriter,
+    list_snapshots,
+    read_snapshot,
+)
+
+
+def test_snapshot_rotation_and_restore(tmpdir):
+    casedir = Path(tmpdir)
+    function = df.Function(df.FunctionSpace(df.UnitSquareMesh(4, 4), "CG", 1))
+    writer = SnapshotWriter(casedir, interval_steps=2, num_snapshots=2)
+
+    for timestep in range(1, 9):
+        function.vector()[:] = timestep
+        if writer.snapshot_this_timestep(timestep):
+            writer.write(timestep, 0.1*timestep, {"u": function})
+
+    snapshots = list_snapshots(casedir)
+    assert [path.name for path in snapshots] == ["snapshot_000000000006", "snapshot_000000000008"]
+    assert sorted(path.name for path in (casedir / "snapshots").iterdir()) == [path.name for path in snapshots]
+
+    # An incomplete snapshot is ignored
+    (casedir / "snapshots" / "snapshot_000000000010").mkdir()
+    assert list_snapshots(casedir) == snapshots
+
+    restored = df.Function(function.function_space())
+    timestep, time = read_snapshot(snapshots[-1], {"u": restored})
+    assert (timestep, time) == (8, 0.8)
+    assert np.all(restored.vector().get_local() == 8)
+
+    # A different dof layout is rejected before any values are assigned
+    other = df.Function(df.FunctionSpace(df.UnitSquareMesh(5, 5), "CG", 1))
+    with pytest.raises(RuntimeError):
+        read_snapshot(snapshots[-1], {"u": other})
+    assert np.all(other.vector().get_local() == 0)
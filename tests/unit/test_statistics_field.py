@@ -0,0 +1,24 @@
+import numpy as np
+import dolfin as df
+
+from postfields import StatisticsField
+from postspec import FieldSpec
+
+
+def test_running_statistics():
+    mesh = df.UnitSquareMesh(2, 2)
+    function = df.Function(df.FunctionSpace(mesh, "CG", 1))
+    statistics_field = StatisticsField("test", FieldSpec())
+
+    samples = [1.0, 4.0, 2.0]
+    statistics_field.before_first_compute(function)
+    for time, value in enumerate(samples):
+        function.vector()[:] = value
+        statistics_field.compute(float(time), function)
+
+    statistics = statistics_field.statistics
+    assert np.allclose(statistics["mean"], np.mean(samples))
+    assert np.allclose(statistics["variance"], np.var(samples, ddof=1))
+    assert np.allclose(statistics["min"], 1.0)
+    assert np.allclose(statistics["max"], 4.0)
+    assert np.allclose(statistics["argmax_time"], 1.0)
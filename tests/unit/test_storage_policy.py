@@ -0,0 +1,36 @@
+import h5py
+import pytest
+
+import numpy as np
+
+from postfields.storage_policy import StoragePolicy
+
+
+@pytest.mark.parametrize("policy, bound", [
+    (StoragePolicy("float16"), lambda values: np.abs(values)*2.0**-11),
+    (StoragePolicy("float32"), lambda values: np.abs(values)*2.0**-24),
+    (StoragePolicy(quantisation_error=1e-3), lambda values: 1e-3),
+    (StoragePolicy(quantisation_error=1e-3, compression="gzip"), lambda values: 1e-3),
+])
+def test_storage_policy_error_bound(tmpdir, policy, bound):
+    values = np.random.RandomState(42).uniform(-80, 40, size=1000)
+
+    with h5py.File(str(tmpdir / "values.hdf5"), "w") as h5file:
+        dataset = h5file.create_dataset("values", data=policy.encode(values), **policy.dataset_kwargs())
+        dataset.attrs.update(policy.attributes())
+
+    with h5py.File(str(tmpdir / "values.hdf5"), "r") as h5file:
+        dataset = h5file["values"]
+        read_policy = StoragePolicy.from_attributes(dataset.attrs)
+        decoded = read_policy.decode(dataset[()])
+
+    assert read_policy.storage_dtype == policy.storage_dtype
+    assert read_policy.quantisation_error == policy.quantisation_error
+    assert np.all(np.abs(decoded - values) <= bound(values))
+
+
+def test_lossless_policy():
+    values = np.random.RandomState(42).uniform(-80, 40, size=100)
+    policy = StoragePolicy()
+    assert policy.is_lossless
+    assert np.array_equal(policy.decode(policy.encode(values)), values)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from post.time_index import (
+    TimeIndex,
+    TimeIndexWriter,
+)
+
+
+def test_restart_merges_saved_fields(tmpdir):
+    writer = TimeIndexWriter(tmpdir)
+    writer.add_field("u")
+    writer.add_field("v")
+    writer.append(0, 0.0, ["u", "v"])
+    writer.append(1, 0.5, ["u"])
+    writer.close()
+
+    # Restart at the last written timestep, saving another field
+    writer = TimeIndexWriter(tmpdir)
+    writer.append(1, 0.5, ["v"])
+    writer.append(2, 1.0, ["u"])
+    writer.close()
+
+    time_index = TimeIndex(tmpdir)
+    assert list(time_index.timesteps) == [0, 1, 2]
+    assert np.all(time_index.saved("u") == [True, True, True])
+    assert np.all(time_index.saved("v") == [True, True, False])